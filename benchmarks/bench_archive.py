@@ -0,0 +1,116 @@
+"""Per-message latency as history grows, with every month in the live workbook vs closed months archived.
+
+Each history size runs twice in fresh child processes: once against the full
+workbook ("live") and once after archive_closed_months has moved every closed
+month into local archive workbooks ("archived"). Services arrive at a steady
+20 a day ending today from a fixed pool of --customers regulars, so larger sizes
+mean more months of history but the same current month and customer base
+(Customer_Summary keeps one row per customer ever served). "cold load" is a load_business_data after the Drive revision
+changed; "log" is a service message that saves to the workbook; "report" is a
+cached all-time report. The parent checks that both modes give identical
+answers to the report, cash-flow, income-statement and period questions.
+
+Usage: python benchmarks/bench_archive.py [--sizes 1000,5000,20000] [--customers 400] [--messages 5]
+       [--drive-latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import install_fakes
+from benchmarks.measure import SUMMARY_HEADER, format_summary, run_child, summarize
+from benchmarks.synthetic import workbook_bytes
+
+SERVICES_PER_DAY = 20
+
+LOG_MESSAGE = 'Served customer Thabo Mokoena full wash R180 card'
+
+QUESTIONS = [
+    'How is the business doing?',
+    'Show me the cash flow',
+    'income statement please',
+    'How much revenue last month?',
+    'Compare this month vs last month',
+    'How did we do last week?',
+]
+
+
+def measure(args):
+    """Child process: optionally archive, then time cold loads, logged services and reports"""
+    import json
+    import cardetail
+
+    assistant = cardetail.assistant
+    start = date.today() - timedelta(days=max(1, args.services // SERVICES_PER_DAY))
+    http, anthropic, twilio = install_fakes(assistant, workbook_bytes(args.services, customers=args.customers, start=start), args.drive_latency)
+
+    archive_ms = None
+    if args.mode == 'archived':
+        started = time.perf_counter()
+        result = assistant.archive_closed_months()
+        archive_ms = (time.perf_counter() - started) * 1000
+        assert result is not None, 'archiving failed'
+
+    answers = [assistant.process_natural_message(question, 'whatsapp:+27600000001') for question in QUESTIONS]
+    timings = {'cold load': [], 'log': [], 'report': []}
+    for _ in range(args.messages):
+        assistant.invalidate_snapshot()
+        started = time.perf_counter()
+        data = assistant.load_business_data()
+        timings['cold load'].append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        reply = assistant.process_natural_message(LOG_MESSAGE, 'whatsapp:+27600000001')
+        timings['log'].append((time.perf_counter() - started) * 1000)
+        assert reply.startswith('Service logged'), reply
+
+        started = time.perf_counter()
+        assistant.process_natural_message(QUESTIONS[0], 'whatsapp:+27600000001')
+        timings['report'].append((time.perf_counter() - started) * 1000)
+
+    print(json.dumps({'timings': {name: summarize(values) for name, values in timings.items()},
+                      'live_rows': sum(data['row_counts'].values()),
+                      'summary_rows': len(data['period_summaries']) + len(data['customer_summaries']),
+                      'workbook_kb': len(http.content) / 1024, 'archive_ms': archive_ms, 'answers': answers}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,5000,20000', help='comma-separated service rows of history')
+    parser.add_argument('--customers', type=int, default=400)
+    parser.add_argument('--messages', type=int, default=5)
+    parser.add_argument('--drive-latency', type=float, default=0.05)
+    parser.add_argument('--services', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=['live', 'archived'], help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    print(f"{'services':>9} {'mode':>9} {'message':>10} {SUMMARY_HEADER}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [int(size) for size in args.sizes.split(',')]:
+            results = {}
+            for mode in ('live', 'archived'):
+                results[mode] = result = run_child(
+                    __file__, ['--mode', mode, '--services', size, '--customers', args.customers,
+                               '--messages', args.messages, '--drive-latency', args.drive_latency],
+                    env={'ARCHIVE_DIR': os.path.join(tmp, f"{size}"), 'ARCHIVE_STORAGE': 'local'})
+                for name, summary in result['timings'].items():
+                    print(f"{size:>9} {mode:>9} {name:>10} {format_summary(summary)}")
+                archive = f", archived in {result['archive_ms'] / 1000:.1f}s" if result['archive_ms'] else ''
+                print(f"{'':>9} {'':>9} {'':>10} {result['live_rows']} live rows, {result['summary_rows']} summary rows, "
+                      f"{result['workbook_kb']:.0f} KB workbook{archive}")
+            assert results['live']['answers'] == results['archived']['answers'], \
+                f"archived answers differ at {size} services"
+
+
+if __name__ == '__main__':
+    main()
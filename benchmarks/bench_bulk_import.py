@@ -0,0 +1,115 @@
+"""End-of-day logging cost per record: one WhatsApp message per record vs one multi-line message vs a CSV import.
+
+Each mode runs in a fresh child process against the fake Drive (--drive-latency
+per call) and fake Claude (--llm-latency). The same synthetic service and expense
+lines are logged in every mode; the rows that reach the workbook are counted
+afterwards and must match across modes.
+
+Usage: python benchmarks/bench_bulk_import.py [--records 12] [--rows 2000] [--drive-latency 0.05]
+       [--llm-latency 0.3]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import install_fakes
+from benchmarks.measure import run_child
+from benchmarks.synthetic import synthetic_messages, workbook_bytes
+
+MODES = ('one-at-a-time', 'message', 'csv')
+# X-Admin-Token the CSV import is posted with
+ADMIN_TOKEN = 'bench-admin-token'
+
+
+def record_lines(assistant, count):
+    """`count` complete service/expense lines drawn from the synthetic message generator"""
+    lines = []
+    for message in synthetic_messages(count * 20):
+        parsed = assistant.extractor.parse(message)
+        if parsed['route'] in ('service', 'expense') and \
+                not assistant.missing_info_questions(parsed['route'], parsed[parsed['route']]):
+            lines.append(message)
+        if len(lines) == count:
+            return lines
+    raise RuntimeError(f"only {len(lines)} complete records in the synthetic messages")
+
+
+def workbook_counts(assistant):
+    """Operations, Revenue and Expenses rows now on the fake Drive"""
+    assistant.invalidate_snapshot()
+    data = assistant.load_business_data()
+    return list(data['row_counts'].values())
+
+
+def measure(args):
+    """Child process: log the records in one mode and report wall time and service calls"""
+    import json
+    import cardetail
+
+    assistant = cardetail.assistant
+    http, anthropic, twilio = install_fakes(assistant, workbook_bytes(args.rows), args.drive_latency, args.llm_latency)
+    lines = record_lines(assistant, args.records)
+    before = workbook_counts(assistant)
+    assistant.invalidate_snapshot()
+    calls_before = dict(http.calls)
+
+    start = time.perf_counter()
+    if args.mode == 'one-at-a-time':
+        for line in lines:
+            assistant.process_natural_message(line, 'whatsapp:+27600000001')
+    elif args.mode == 'message':
+        reply = assistant.process_natural_message('\n'.join(lines), 'whatsapp:+27600000001')
+        assert reply.startswith(f"Logged {len(lines)} records"), reply
+    else:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['message'])
+        writer.writerows([line] for line in lines)
+        response = cardetail.app.test_client().post('/import', data=buffer.getvalue(), content_type='text/csv',
+                                                    headers={'X-Admin-Token': ADMIN_TOKEN})
+        assert response.status_code == 200 and len(response.json['saved']) == len(lines), response.json
+    elapsed = time.perf_counter() - start
+
+    calls = {name: count - calls_before.get(name, 0) for name, count in http.calls.items()}
+    after = workbook_counts(assistant)
+    print(json.dumps({'elapsed_ms': elapsed * 1000, 'records': len(lines), 'drive_calls': calls,
+                      'claude_calls': anthropic.calls, 'added': [b - a for a, b in zip(before, after)]}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=12)
+    parser.add_argument('--rows', type=int, default=2000, help='service rows in the synthetic workbook')
+    parser.add_argument('--drive-latency', type=float, default=0.05)
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    print(f"{'mode':>14} {'records':>8} {'total (ms)':>11} {'per record (ms)':>16} {'downloads':>10} "
+          f"{'uploads':>8} {'claude':>7}  rows added (ops/rev/exp)")
+    added = None
+    for mode in MODES:
+        result = run_child(__file__, ['--mode', mode, '--records', args.records, '--rows', args.rows,
+                                      '--drive-latency', args.drive_latency, '--llm-latency', args.llm_latency],
+                           env={'ADMIN_TOKEN': ADMIN_TOKEN})
+        calls = result['drive_calls']
+        print(f"{mode:>14} {result['records']:>8} {result['elapsed_ms']:>11.0f} "
+              f"{result['elapsed_ms'] / result['records']:>16.1f} {calls['get_media']:>10} "
+              f"{calls['update'] + calls['upload_chunk']:>8} {result['claude_calls']:>7}  "
+              f"{'/'.join(str(count) for count in result['added'])}")
+        assert added in (None, result['added']), f"{mode} wrote {result['added']} rows, expected {added}"
+        added = result['added']
+
+
+if __name__ == '__main__':
+    main()
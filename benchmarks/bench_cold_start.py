@@ -0,0 +1,148 @@
+"""Cold start (import to first request, first use of each client) and pooled vs fresh HTTP connections.
+
+Cold start runs in fresh child processes with client prewarming off, so the
+client columns show what the first message needing that client pays; before
+clients were lazy, import paid for all of them. The connection half points the
+Drive (httplib2), Twilio (requests) and Anthropic (httpx) transports at a local
+keep-alive server that sleeps --handshake seconds per new connection, standing
+in for TCP+TLS setup to a real API.
+
+Usage: python benchmarks/bench_cold_start.py [--starts 3] [--calls 20] [--handshake 0.05]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.measure import run_child
+
+CLAUDE_REPLY = json.dumps({
+    'id': 'msg_bench', 'type': 'message', 'role': 'assistant', 'model': 'claude-3-haiku-20240307',
+    'content': [{'type': 'text', 'text': 'Sure thing, Moloi.'}], 'stop_reason': 'end_turn', 'stop_sequence': None,
+    'usage': {'input_tokens': 10, 'output_tokens': 5}
+}).encode()
+
+
+def measure_start():
+    """Child process: import, first /test request, then first use of each lazily built client"""
+    started = time.perf_counter()
+    import cardetail
+    imported = time.perf_counter()
+    cardetail.app.test_client().get('/test')
+    result = {'import_s': imported - started, 'first_request_s': time.perf_counter() - imported}
+    for name in ('twilio_client', 'anthropic_client'):
+        start = time.perf_counter()
+        getattr(cardetail.assistant, name)
+        result[f"{name}_s"] = time.perf_counter() - start
+    print(json.dumps(result))
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers every request with a Claude-shaped JSON body over HTTP/1.1 keep-alive"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Without this, Nagle plus delayed ACKs add ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake)
+
+    def reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(CLAUDE_REPLY)))
+        self.end_headers()
+        self.wfile.write(CLAUDE_REPLY)
+
+    do_GET = do_POST = reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def transports(url):
+    """(name, pooled call, fresh-connection call) for each service's HTTP stack"""
+    import anthropic
+    import httplib2
+    from twilio.http.http_client import TwilioHttpClient
+
+    shared_http = httplib2.Http()
+    pooled_twilio = TwilioHttpClient(pool_connections=True)
+    fresh_twilio = TwilioHttpClient(pool_connections=False)
+    shared_anthropic = anthropic.Anthropic(api_key='bench', base_url=url, max_retries=0)
+
+    def claude(client):
+        client.messages.create(model='claude-3-haiku-20240307', max_tokens=10,
+                               messages=[{'role': 'user', 'content': 'hi'}])
+
+    def fresh_claude():
+        client = anthropic.Anthropic(api_key='bench', base_url=url, max_retries=0)
+        claude(client)
+        client.close()
+
+    return [
+        ('drive (httplib2)', lambda: shared_http.request(url + '/drive'), lambda: httplib2.Http().request(url + '/drive')),
+        ('twilio (requests)', lambda: pooled_twilio.request('POST', url + '/twilio', data={'Body': 'hi'}),
+         lambda: fresh_twilio.request('POST', url + '/twilio', data={'Body': 'hi'})),
+        ('anthropic (httpx)', lambda: claude(shared_anthropic), fresh_claude),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--starts', type=int, default=3, help='fresh interpreters to time')
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--handshake', type=float, default=0.05, help='seconds per new connection')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure_start()
+        return
+
+    starts = [run_child(__file__, [], env={'CLIENT_PREWARM': 'false'}) for _ in range(args.starts)]
+    print(f"cold start, median of {args.starts} fresh interpreters")
+    print(f"{'import (s)':>11} {'first /test (s)':>16} {'twilio first use (s)':>21} {'anthropic first use (s)':>24}")
+    print(f"{statistics.median(s['import_s'] for s in starts):>11.2f} "
+          f"{statistics.median(s['first_request_s'] for s in starts):>16.3f} "
+          f"{statistics.median(s['twilio_client_s'] for s in starts):>21.2f} "
+          f"{statistics.median(s['anthropic_client_s'] for s in starts):>24.2f}")
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.handshake = args.handshake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"\n{args.calls} calls per transport, {args.handshake * 1000:.0f} ms simulated handshake per connection")
+    print(f"{'transport':>18} {'mode':>7} {'connections':>12} {'p50 (ms)':>9} {'saved/call (ms)':>16}")
+    for name, pooled, fresh in transports(url):
+        medians = {}
+        for mode, call in (('fresh', fresh), ('pooled', pooled)):
+            before = server.connections
+            timings = []
+            for _ in range(args.calls):
+                start = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start) * 1000)
+            medians[mode] = statistics.median(timings)
+            saved = f"{medians['fresh'] - medians['pooled']:>16.1f}" if mode == 'pooled' else f"{'':>16}"
+            print(f"{name:>18} {mode:>7} {server.connections - before:>12} {medians[mode]:>9.1f} {saved}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
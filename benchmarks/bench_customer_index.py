@@ -0,0 +1,151 @@
+"""Resolving a logged customer name to an existing Customer_ID: CustomerIndex vs a linear scan.
+
+Builds a CustomerIndex over --sizes distinct synthetic full names (some with a
+double-barrelled surname) and times lookups of four kinds: "exact" (a known name
+with random case, spacing and punctuation), "prefix" (the first two words of a
+three-word name), "typo" (a known name of 8+ characters with one letter
+dropped, doubled, swapped or replaced) and "new" (names that aren't in the
+index, the slowest path since it falls through every stage). "scan" is the
+linear search over Operations rows the assistant would otherwise need, exact
+matches only. Exact and prefix lookups must return the right ID and new names
+must stay unmatched; a typo may go unmatched (one edit from two customers, or
+across the space between words) but must never be corrected to the wrong
+customer.
+
+Usage: python benchmarks/bench_customer_index.py [--sizes 10000,50000] [--queries 2000] [--scan-queries 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.measure import percentile
+
+FIRST_NAMES = ['Thabo', 'Sipho', 'Lerato', 'Zanele', 'Bongani', 'Nomsa', 'Kagiso', 'Palesa', 'Tshepo', 'Ayanda',
+               'John', 'Mary', 'Peter', 'Sarah', 'David', 'Grace', 'Pieter', 'Annelie', 'Johan', 'Riaan',
+               'Mohammed', 'Fatima', 'Priya', 'Rajesh', 'Naledi', 'Mpho', 'Lindiwe', 'Sibusiso', 'Themba', 'Karabo']
+SYLLABLES = ['ma', 'ko', 'ne', 'dla', 'mi', 'ni', 'khu', 'lo', 'se', 'tho', 'ba', 'van', 'der', 'berg', 'ndo',
+             'zu', 'ra', 'pe', 'wa', 'li', 'mo', 'ke', 'na', 'shi', 'bo', 'tsi', 'gu', 'fe', 'ri', 'ya']
+
+
+def surname(rnd):
+    """A made-up surname of two to four syllables"""
+    return ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+
+
+def synthetic_names(count, rnd):
+    """`count` distinct full names; every 20th has a double-barrelled surname"""
+    names = set()
+    while len(names) < count:
+        name = f"{rnd.choice(FIRST_NAMES)} {surname(rnd)}"
+        if len(names) % 20 == 0:
+            name = f"{name} {surname(rnd)}"
+        names.add(name)
+    return sorted(names, key=lambda name: rnd.random())
+
+
+def respell(name, rnd):
+    """The same name as an owner might type it: other case, spacing or punctuation"""
+    return rnd.choice([name.upper(), name.lower(), f"  {name} ", name.replace(' ', '  '), f"{name}.",
+                       f"customer {name}"])
+
+
+def typo(name, rnd):
+    """One dropped, doubled, swapped or replaced letter somewhere after the first"""
+    position = rnd.randrange(1, len(name) - 1)
+    kind = rnd.choice(['drop', 'double', 'swap', 'replace'])
+    if kind == 'drop':
+        return name[:position] + name[position + 1:]
+    if kind == 'double':
+        return name[:position] + name[position] + name[position:]
+    if kind == 'swap':
+        return name[:position] + name[position + 1] + name[position] + name[position + 2:]
+    return name[:position] + rnd.choice('aeioukt') + name[position + 1:]
+
+
+def timed(lookup, queries):
+    """(microseconds per query, results)"""
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(lookup(query))
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,50000', help='comma-separated customer counts')
+    parser.add_argument('--queries', type=int, default=2000, help='lookups of each kind')
+    parser.add_argument('--scan-queries', type=int, default=200, help='lookups for the linear scan')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    # Only the index is measured; don't build the SDK clients in the background
+    os.environ.setdefault('CLIENT_PREWARM', 'false')
+    import cardetail
+
+    print(f"{'customers':>9} {'lookup':>7} {'count':>6} {'p50 (us)':>9} {'p99 (us)':>9} {'max (us)':>9} "
+          f"{'matched':>8} {'wrong':>6}")
+    for size in [int(value) for value in args.sizes.split(',')]:
+        rnd = random.Random(args.seed)
+        names = synthetic_names(size, rnd)
+        ids = {name: f"CW{number:03d}" for number, name in enumerate(names, 1)}
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = cardetail.CustomerIndex()
+        for name in names:
+            index.add(ids[name], name)
+        build_seconds = time.perf_counter() - start
+        index_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        extra = cardetail.CustomerIndex()
+        for name in names[:1000]:
+            extra.add(ids[name], name)
+        add_us = (time.perf_counter() - start) * 1e6 / min(1000, len(names))
+
+        sample = [rnd.choice(names) for _ in range(args.queries)]
+        three_word = [name for name in names if name.count(' ') == 2]
+        long_names = [name for name in names if len(cardetail.CustomerIndex.key(name)) >= 8]
+        kinds = {
+            'exact': [(respell(name, rnd), ids[name]) for name in sample],
+            'prefix': [(' '.join(name.split()[:2]), ids[name])
+                       for name in (rnd.choice(three_word) for _ in range(args.queries))],
+            'typo': [(typo(name, rnd), ids[name]) for name in (rnd.choice(long_names) for _ in range(args.queries))],
+            'new': [(f"{rnd.choice(FIRST_NAMES)} Newcomer{number}", None) for number in range(args.queries)]
+        }
+        for kind, queries in kinds.items():
+            timings, results = timed(index.lookup, [query for query, _ in queries])
+            matched = sum(1 for result in results if result)
+            # A prefix or typo can spell another customer's name exactly; only the kind's own stage can be wrong
+            wrong = sum(1 for result, (_, expected) in zip(results, queries)
+                        if result and result[0] != expected and result[2] == kind)
+            print(f"{size:>9} {kind:>7} {len(queries):>6} {percentile(timings, 50):>9.1f} "
+                  f"{percentile(timings, 99):>9.1f} {max(timings):>9.1f} {matched:>8} {wrong:>6}")
+            assert wrong == 0, f"{wrong} {kind} lookups resolved to the wrong customer"
+            if kind == 'exact':
+                assert matched == len(queries), 'an exact name was not found'
+            if kind == 'new':
+                assert matched == 0, 'a new name was matched to an existing customer'
+
+        # Linear scan over Operations rows, normalizing as it goes: what the lookup replaces
+        operations = [{'Customer_ID': ids[name], 'Customer_Name': name} for name in names]
+        key = cardetail.CustomerIndex.key
+        scan_queries = [query for query, _ in kinds['exact'][:args.scan_queries]]
+        timings, results = timed(lambda query: next((op['Customer_ID'] for op in operations
+                                                     if key(op['Customer_Name']) == key(query)), None), scan_queries)
+        print(f"{size:>9} {'scan':>7} {len(scan_queries):>6} {percentile(timings, 50):>9.1f} "
+              f"{percentile(timings, 99):>9.1f} {max(timings):>9.1f} {sum(1 for result in results if result):>8}")
+        print(f"{'':>9} {'':>7} built in {build_seconds:.2f}s ({add_us:.1f} us per add), "
+              f"{index_mb:.1f} MB for {len(index)} names")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Scaling of the customer-journey join: legacy nested loop vs LedgerIndex.
+
+Usage: python benchmarks/bench_customer_journey.py [--sizes 500,1000,2000,4000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cardetail import LedgerIndex, assistant
+
+SERVICES = ['Basic Wash', 'Full Wash', 'Premium Wash', 'Interior Only']
+
+
+def synthetic_rows(n_rows, seed=7):
+    """Operations and Revenue row dicts with roughly three visits per customer"""
+    rnd = random.Random(seed)
+    operations, revenue = [], []
+    for i in range(n_rows):
+        service_date = date(2024, 1 + i % 12, 1 + i % 28)
+        customer_id = f"CW{rnd.randint(1, max(1, n_rows // 3)):03d}"
+        service = rnd.choice(SERVICES)
+        operations.append({
+            'Customer_ID': customer_id, 'Customer_Name': f"Customer {customer_id}",
+            'Service_Date': service_date, 'Week_Number': assistant.calculate_week_of_month(service_date),
+            'Month': service_date.strftime('%B'), 'Service_Completed': 'Yes', 'Service_Type': service,
+            'Notes': '', 'Status': 'Completed'
+        })
+        revenue.append({
+            'Transaction_Id': f"REV{i + 1:03d}", 'Customer_id': customer_id, 'Service_Date': service_date,
+            'Month': service_date.strftime('%B'), 'Service_Type': service,
+            'Amount': assistant.service_prices[service], 'Payment_Status': 'Paid',
+            'Payment_Method': rnd.choice(['Cash', 'Card', 'EFT']), 'Status': 'Washed',
+            'Week_Number': assistant.calculate_week_of_month(service_date)
+        })
+    return operations, revenue
+
+
+def legacy_customer_journey(operations_data, revenue_data):
+    """The pre-index join: scans every revenue row for every operations row"""
+    customer_journey = {}
+    for op in operations_data:
+        customer_id = op['Customer_ID']
+        if customer_id not in customer_journey:
+            customer_journey[customer_id] = {'services_completed': 0, 'total_spent': 0, 'payment_methods': []}
+        customer_journey[customer_id]['services_completed'] += 1
+        for rev in revenue_data:
+            if rev['Customer_id'] == customer_id:
+                customer_journey[customer_id]['total_spent'] += rev['Amount']
+                customer_journey[customer_id]['payment_methods'].append(rev['Payment_Method'])
+    return customer_journey
+
+
+def indexed_customer_journey(operations_data, revenue_data):
+    """The one-pass group-by behind load_business_data"""
+    index = LedgerIndex()
+    for op in operations_data:
+        index.add_operation(op)
+    for rev in revenue_data:
+        index.add_revenue(rev)
+    return index.customer_journey
+
+
+def best_of(func, *args, repeat=3):
+    """Fastest wall time over a few runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='500,1000,2000,4000,50000,200000',
+                        help='comma-separated row counts')
+    parser.add_argument('--legacy-limit', type=int, default=4000,
+                        help='skip the quadratic join above this many rows')
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy (ms)':>12} {'indexed (ms)':>13} {'speedup':>9}")
+    for n_rows in [int(size) for size in args.sizes.split(',')]:
+        operations, revenue = synthetic_rows(n_rows)
+        indexed = best_of(indexed_customer_journey, operations, revenue)
+        if n_rows <= args.legacy_limit:
+            legacy = best_of(legacy_customer_journey, operations, revenue, repeat=1)
+            print(f"{n_rows:>8} {legacy * 1000:>12.1f} {indexed * 1000:>13.1f} {legacy / indexed:>8.0f}x")
+        else:
+            print(f"{n_rows:>8} {'-':>12} {indexed * 1000:>13.1f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Owners asking for their report on cold tenants: full workbook load on demand vs a scheduled digest.
+
+Each mode runs in a fresh child process serving --tenants businesses from a
+TENANTS_FILE, each with its own fake Drive workbook of --rows services and its
+owner listed in DIGEST_RECIPIENTS. With TENANT_MAX_WARM below --tenants most
+tenants hold no parsed workbook, as after a busy morning on a shared process.
+"on-demand" has no digest slots, so every ask pays the download and parse.
+"digest" first runs the scheduler across a refresh and a daily slot: it builds
+every tenant's digests one after another, then pushes the daily digest to every
+owner in one batch paced by --send-rate. Each round then drops all snapshots and
+every owner asks for the report, cash flow and income statement. Replies must
+be identical in both modes, a digest must stop being served once its tenant
+logs a service, and the pushes must take at least (owners - 1) / --send-rate.
+
+Usage: python benchmarks/bench_digests.py [--tenants 8] [--rows 2000] [--rounds 3] [--max-warm 2]
+       [--send-rate 5] [--drive-latency 0.05]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import add_latency_arguments, install_fakes
+from benchmarks.measure import SUMMARY_HEADER, format_summary, run_child, summarize
+from benchmarks.synthetic import workbook_bytes
+
+MODES = ('on-demand', 'digest')
+QUESTIONS = ['show me the business report', 'how is my cash flow', 'send me the income statement']
+
+
+def owner_number(index):
+    """The WhatsApp number of tenant `index`'s owner"""
+    return f"whatsapp:+2782000{index:04d}"
+
+
+def write_tenants(path, count, scheduled):
+    """TENANTS_FILE with shop1..shopN, each with its own workbook and owner, digests on when `scheduled`"""
+    tenants = []
+    for index in range(1, count + 1):
+        tenant = {'id': f"shop{index}", 'TWILIO_WHATSAPP_NUMBER': f"whatsapp:+2710000{index:04d}",
+                  'OWNER_NAME': f"Owner{index}", 'GOOGLE_DRIVE_FILE_ID': f"workbook-shop{index}",
+                  'sender_numbers': [owner_number(index)], 'DIGEST_RECIPIENTS': owner_number(index)}
+        if scheduled:
+            tenant.update({'DIGEST_REFRESH_TIMES': '06:00', 'DIGEST_DAILY_TIME': '07:00'})
+        tenants.append(tenant)
+    with open(path, 'w', encoding='utf-8') as config_file:
+        json.dump({'tenants': tenants}, config_file)
+
+
+def measure(args):
+    """Child process: run the scheduled slots (digest mode), then time cold asks round after round"""
+    import cardetail
+
+    tenant_ids = [f"shop{index}" for index in range(1, args.tenants + 1)]
+    sa_timezone = timezone(timedelta(hours=2))
+    if args.mode == 'digest':
+        # A tick with no slot due must not build any tenant's assistant
+        cardetail.digests.last_tick = datetime(2026, 3, 10, 5, 58, tzinfo=sa_timezone)
+        assert cardetail.digests.tick(datetime(2026, 3, 10, 5, 59, tzinfo=sa_timezone)) == 0
+        assert cardetail.tenants.stats()['active'] == 1, 'an idle tick built tenant assistants'
+
+    fakes = {}
+    for index, tenant_id in enumerate(tenant_ids):
+        # Different sizes so no two tenants' reports match by accident
+        fakes[tenant_id] = install_fakes(cardetail.tenants.get(tenant_id), workbook_bytes(args.rows + index),
+                                         args.drive_latency, args.llm_latency, args.twilio_latency)
+
+    result = {}
+    if args.mode == 'digest':
+        cardetail.digests.last_tick = datetime(2026, 3, 10, 5, 59, tzinfo=sa_timezone)
+        start = time.perf_counter()
+        queued = cardetail.digests.tick(datetime(2026, 3, 10, 7, 0, tzinfo=sa_timezone))
+        tick_seconds = time.perf_counter() - start
+        assert queued == args.tenants, f"{queued} daily digests queued for {args.tenants} owners"
+        deadline = time.monotonic() + args.timeout
+        while not all(fakes[tenant_id][2].sent for tenant_id in tenant_ids):
+            assert time.monotonic() < deadline, 'timed out waiting for the daily digests'
+            time.sleep(0.005)
+        sent_at = sorted(fakes[tenant_id][2].sent[0][2] for tenant_id in tenant_ids)
+        for index, tenant_id in enumerate(tenant_ids, 1):
+            to, body, _ = fakes[tenant_id][2].sent[0]
+            assert to == owner_number(index) and body.startswith('Daily digest') and f"Owner{index}" in body
+        result['tick_seconds'] = tick_seconds
+        result['push_spread_ms'] = (sent_at[-1] - sent_at[0]) * 1000
+
+    timings, downloads, replies = [], 0, {}
+    for round_number in range(args.rounds):
+        for tenant_id in tenant_ids:
+            cardetail.tenants.get(tenant_id).invalidate_snapshot()
+        for index, tenant_id in enumerate(tenant_ids, 1):
+            tenant_assistant = cardetail.tenants.get(tenant_id)
+            http = fakes[tenant_id][0]
+            before = http.calls['get_media']
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                reply = tenant_assistant.process_natural_message(question, owner_number(index))
+                timings.append((time.perf_counter() - start) * 1000)
+                replies.setdefault(f"{tenant_id}:{question}", hashlib.md5(reply.encode()).hexdigest())
+                # The income statement is the one reply that doesn't name the owner
+                assert f"Owner{index}" in reply or reply.startswith('INCOME STATEMENT'), \
+                    f"{tenant_id} replied as someone else: {reply}"
+            downloads += http.calls['get_media'] - before
+            cardetail.tenants.touch(tenant_id)
+
+    # A write must retire the digest: the next report comes from the workbook again
+    writer = cardetail.tenants.get(tenant_ids[0])
+    writer.process_natural_message('Customer Thabo Nkosi paid R180 for a full wash, paid cash', owner_number(1))
+    assert writer.stored_digest('report') is None, 'digest still served after a write'
+
+    result.update({'asks': summarize(timings), 'downloads': downloads, 'replies': replies,
+                   'scheduler': cardetail.digests.stats()})
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=2000, help='services in each tenant workbook')
+    parser.add_argument('--rounds', type=int, default=3, help='times every owner asks after the snapshots drop')
+    parser.add_argument('--max-warm', type=int, default=2, help='TENANT_MAX_WARM')
+    parser.add_argument('--send-rate', type=float, default=5, help='DIGEST_SEND_PER_SECOND')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    add_latency_arguments(parser, drive=0.05, llm=0.0, twilio=0.0)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    print(f"{'mode':>9} {SUMMARY_HEADER} {'downloads':>10}")
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            tenants_file = os.path.join(directory, f"{mode}.json")
+            write_tenants(tenants_file, args.tenants, mode == 'digest')
+            child_args = ['--tenants', args.tenants, '--rows', args.rows, '--rounds', args.rounds,
+                          '--timeout', args.timeout, '--drive-latency', args.drive_latency,
+                          '--llm-latency', args.llm_latency, '--twilio-latency', args.twilio_latency]
+            results[mode] = result = run_child(__file__, child_args + ['--mode', mode], env={
+                'TENANTS_FILE': tenants_file, 'TENANT_MAX_WARM': str(args.max_warm),
+                'DIGEST_SCHEDULER': 'false', 'DIGEST_SEND_PER_SECOND': str(args.send_rate)})
+            print(f"{mode:>9} {format_summary(result['asks'])} {result['downloads']:>10}")
+
+    digest = results['digest']
+    print(f"{'':>9} scheduled run: built {digest['scheduler']['built']} tenants' digests and queued "
+          f"{digest['scheduler']['sent']} pushes in {digest['tick_seconds']:.2f}s, "
+          f"pushes spread over {digest['push_spread_ms']:.0f} ms")
+    assert results['on-demand']['replies'] == digest['replies'], 'digest replies differ from on-demand replies'
+    assert digest['downloads'] == 0, 'a digest-mode ask downloaded the workbook'
+    minimum_spread = (args.tenants - 1) / args.send_rate * 1000 - 50
+    assert digest['push_spread_ms'] >= minimum_spread, 'digest pushes were not paced by DIGEST_SEND_PER_SECOND'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Extraction throughput: legacy per-call keyword scans vs the precompiled MessageExtractor.
+
+Usage: python benchmarks/bench_extraction.py [--messages 20000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SERVICE_PRICES, synthetic_messages
+
+from cardetail import MessageExtractor
+
+
+def legacy_service_info(message):
+    """The pre-engine extract_service_info: dictionaries and patterns rebuilt per call"""
+    services = {
+        'Basic Wash': ['basic', 'simple', 'quick wash', 'standard', 'normal'],
+        'Full Wash': ['full', 'complete', 'comprehensive', 'thorough'],
+        'Premium Wash': ['premium', 'deluxe', 'luxury', 'detailed', 'top service'],
+        'Interior Only': ['interior', 'inside', 'cabin clean', 'inside only']
+    }
+    service_type = None
+    message_lower = message.lower()
+    for service, keywords in services.items():
+        if any(keyword in message_lower for keyword in keywords):
+            service_type = service
+            break
+    payment_methods = {
+        'Cash': ['cash', 'notes', 'money'],
+        'Card': ['card', 'swipe', 'tap'],
+        'EFT': ['eft', 'transfer', 'bank transfer', 'online']
+    }
+    payment_method = 'Cash'
+    for method, keywords in payment_methods.items():
+        if any(keyword in message_lower for keyword in keywords):
+            payment_method = method
+            break
+    customer_patterns = [
+        r'(?:customer|client|for|served)\s+([A-Za-z]+(?:\s+[A-Za-z]+)?)',
+        r'([A-Za-z]+(?:\s+[A-Za-z]+)?)(?:\s+came|paid|wants)',
+        r'(?:mr|mrs|ms)\.?\s+([A-Za-z]+)',
+    ]
+    customer_name = None
+    for pattern in customer_patterns:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            potential_name = match.group(1).strip().title()
+            excluded_words = ['Service', 'Wash', 'Customer', 'Full', 'Basic', 'Premium', 'Interior', 'Cash', 'Card']
+            if potential_name not in excluded_words:
+                customer_name = potential_name
+                break
+    amount = legacy_amount(message)
+    if not amount and service_type and service_type in SERVICE_PRICES:
+        amount = SERVICE_PRICES[service_type]
+    payment_status = 'Paid'
+    if any(word in message_lower for word in ['unpaid', 'owes', 'later', 'credit']):
+        payment_status = 'Unpaid'
+    return {'customer_name': customer_name, 'service_type': service_type, 'amount': amount,
+            'payment_method': payment_method, 'payment_status': payment_status}
+
+
+def legacy_amount(message):
+    """Amount patterns tried in order, compiled through the re cache on every call"""
+    amount_patterns = [
+        r'[rR]\s*(\d+(?:,\d+)*(?:\.\d{2})?)',
+        r'(\d+(?:,\d+)*(?:\.\d{2})?)\s*rand',
+        r'\b(\d+(?:,\d+)*(?:\.\d{2})?)\b',
+    ]
+    for pattern in amount_patterns:
+        matches = re.findall(pattern, message)
+        if matches:
+            try:
+                return max(float(match.replace(',', '')) for match in matches)
+            except ValueError:
+                continue
+    return None
+
+
+def legacy_expense_info(message):
+    """The pre-engine extract_expense_info"""
+    amount = legacy_amount(message)
+    supplier_patterns = [
+        r'(?:paid|pay|from|to|bought from|purchased from)\s+([A-Za-z][A-Za-z\s]+?)(?:\s|$|for|,|\d)',
+        r'([A-Za-z][A-Za-z\s]+(?:suppliers?|store|shop|company|ltd|pty|co))',
+        r'(?:supplier|vendor):\s*([A-Za-z][A-Za-z\s]+)',
+    ]
+    supplier = None
+    for pattern in supplier_patterns:
+        match = re.search(pattern, message, re.IGNORECASE)
+        if match:
+            potential_supplier = re.sub(r'\s+', ' ', match.group(1).strip())
+            if len(potential_supplier) > 1 and not potential_supplier.isdigit():
+                supplier = potential_supplier
+                break
+    category_keywords = {
+        'Supplies': ['soap', 'chemical', 'detergent', 'wax', 'towel', 'bucket', 'supplies', 'cleaning', 'brushes'],
+        'Equipment': ['hose', 'machine', 'vacuum', 'pressure', 'equipment', 'tool', 'replacement'],
+        'Utilities': ['water', 'electricity', 'power', 'utility', 'bill'],
+        'Staff': ['salary', 'wage', 'pay', 'employee', 'worker', 'staff'],
+        'Marketing': ['advert', 'marketing', 'promotion', 'flyer', 'social media'],
+        'Fuel': ['petrol', 'diesel', 'fuel', 'gas'],
+        'Maintenance': ['repair', 'fix', 'service', 'maintenance', 'upkeep']
+    }
+    category = 'Other'
+    message_lower = message.lower()
+    for cat, keywords in category_keywords.items():
+        if any(keyword in message_lower for keyword in keywords):
+            category = cat
+            break
+    return {'amount': amount, 'supplier': supplier, 'category': category, 'description': message[:100].strip()}
+
+
+def legacy_route(message):
+    """The pre-engine indicator rules"""
+    message_lower = message.lower()
+    expense_indicators = ['paid', 'bought', 'spent', 'cost', 'expense', 'bill', 'salary']
+    service_indicators = ['served', 'customer', 'wash', 'service', 'finished', 'completed']
+    has_digit = any(char.isdigit() for char in message)
+    if (any(i in message_lower for i in expense_indicators) and
+            not any(i in message_lower for i in service_indicators) and has_digit):
+        return 'expense'
+    elif (any(i in message_lower for i in service_indicators) and has_digit and
+          ('customer' in message_lower or 'client' in message_lower)):
+        return 'service'
+    elif any(t in message_lower for t in ['business', 'report', 'numbers', 'performance']):
+        return 'report'
+    elif 'cash flow' in message_lower:
+        return 'cash_flow'
+    elif any(t in message_lower for t in ['income statement', 'profit and loss']):
+        return 'income_statement'
+    elif (any(t in message_lower for t in ['what is', 'explain']) and
+          any(t in message_lower for t in ['profit', 'loss', 'revenue', 'margin'])):
+        return 'explain'
+    return 'conversation'
+
+
+def legacy_parse(message):
+    """Route, then re-scan the message for the routed extractor"""
+    route = legacy_route(message)
+    parsed = {'message': message, 'route': route}
+    if route == 'service':
+        parsed['service'] = legacy_service_info(message)
+    elif route == 'expense':
+        parsed['expense'] = legacy_expense_info(message)
+    elif route == 'explain':
+        message_lower = message.lower()
+        parsed['finance_term'] = next((term for term in ['profit', 'loss', 'revenue', 'income', 'expenses', 'cash flow', 'margin']
+                                       if term in message_lower), None)
+    return parsed
+
+
+def throughput(func, messages, repeat=3):
+    """Messages per second, best pass over the batch"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(messages)
+        timings.append(time.perf_counter() - start)
+    return len(messages) / min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.messages)
+    extractor = MessageExtractor(SERVICE_PRICES)
+    legacy_rate, legacy = throughput(lambda batch: [legacy_parse(m) for m in batch], messages)
+    engine_rate, parsed = throughput(extractor.parse_batch, messages)
+    # The legacy rules have no notion of periods ("this week"), so compare everything else
+    parsed = [{key: value for key, value in result.items() if key != 'periods'} for result in parsed]
+    assert legacy == parsed, 'extraction results differ'
+
+    print(f"{'engine':>8} {'msgs/sec':>10}")
+    print(f"{'legacy':>8} {legacy_rate:>10,.0f}")
+    print(f"{'compiled':>8} {engine_rate:>10,.0f}")
+    print(f"speedup {engine_rate / legacy_rate:.1f}x on {len(messages):,} messages (identical results)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Claude calls and latency for repeated chat messages, with and without the response cache.
+
+Replays a small-talk/FAQ mix through process_natural_message against the fake
+Drive and a stub Anthropic client with --llm-latency seconds per call. The
+cache's keying, TTL and eviction are covered by tests/test_response_cache.py.
+
+Usage: python benchmarks/bench_llm_cache.py [--messages 200] [--llm-latency 0.4]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAnthropic, fake_drive_service
+from benchmarks.synthetic import workbook_bytes
+
+import cardetail
+
+CHAT_MESSAGES = ['hello', 'Hello!', 'thanks', 'Thanks Moloi', 'how are you', 'what is a margin',
+                 'any tips for getting more customers?', 'good morning', 'ok', 'what should I charge?']
+
+
+def run(cache_size, messages, llm_latency, content):
+    """Replay the messages on a fresh assistant; returns latencies, stub client and route stats"""
+    os.environ['LLM_CACHE_SIZE'] = str(cache_size)
+    assistant = cardetail.IntelligentBusinessAssistant()
+    assistant.drive_service, http = fake_drive_service(content)
+    assistant.anthropic_client = FakeAnthropic(latency=llm_latency)
+    timings = []
+    for message in messages:
+        start = time.perf_counter()
+        assistant.process_natural_message(message, 'whatsapp:+27000000000')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, assistant.anthropic_client, assistant.route_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--llm-latency', type=float, default=0.4)
+    args = parser.parse_args()
+
+    rnd = random.Random(3)
+    messages = [rnd.choice(CHAT_MESSAGES) for _ in range(args.messages)]
+    content = workbook_bytes(500)
+
+    print(f"{'cache':>6} {'claude calls':>13} {'hit rate':>9} {'saved tokens':>13} {'p50 (ms)':>9} {'total (s)':>10}")
+    for cache_size in (0, 500):
+        timings, client, stats = run(cache_size, messages, args.llm_latency, content)
+        cache = stats['llm_cache']
+        saved = cache['saved_input_tokens'] + cache['saved_output_tokens']
+        print(f"{cache_size:>6} {client.calls:>13} {cache['hit_rate']:>9.0%} {saved:>13,} "
+              f"{statistics.median(timings):>9.1f} {sum(timings) / 1000:>10.1f}")
+    system = client.last_request['system']
+    print(f"static prefix cached: {system[0].get('cache_control')}, volatile block: {len(system[1]['text'])} chars")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""load_business_data latency: cold (Drive revision changed, download and parse) vs warm (snapshot reused).
+
+Each workbook size runs in a fresh child process so the peak RSS column covers
+only that size. A cold load is forced by bumping the fake Drive revision, as an
+edit made directly in Drive would.
+
+Usage: python benchmarks/bench_load_business_data.py [--rows 2000,20000] [--loads 10] [--drive-latency 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import install_fakes
+from benchmarks.measure import SUMMARY_HEADER, format_summary, run_child, summarize
+from benchmarks.synthetic import workbook_bytes
+
+
+def measure(args):
+    """Child process: time cold and warm loads on one workbook size"""
+    import json
+    import cardetail
+
+    content = workbook_bytes(args.rows)
+    http, anthropic, twilio = install_fakes(cardetail.assistant, content, args.drive_latency)
+    timings = {'cold': [], 'warm': []}
+    for _ in range(args.loads):
+        for kind in ('cold', 'warm'):
+            if kind == 'cold':
+                http.replace_content(content)
+            start = time.perf_counter()
+            data = cardetail.assistant.load_business_data()
+            timings[kind].append((time.perf_counter() - start) * 1000)
+            assert data and data['operations_count'] == args.rows
+    print(json.dumps({kind: summarize(values) for kind, values in timings.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='2000,20000', help='comma-separated service row counts')
+    parser.add_argument('--loads', type=int, default=10)
+    parser.add_argument('--drive-latency', type=float, default=0.05)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.rows = int(args.rows)
+        measure(args)
+        return
+
+    print(f"{'rows':>7} {'load':>5} {SUMMARY_HEADER}")
+    for rows in [int(value) for value in args.rows.split(',')]:
+        result = run_child(__file__, ['--rows', rows, '--loads', args.loads, '--drive-latency', args.drive_latency])
+        for kind in ('cold', 'warm'):
+            print(f"{rows:>7} {kind:>5} {format_summary(result[kind])}")
+
+
+if __name__ == '__main__':
+    main()
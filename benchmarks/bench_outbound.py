@@ -0,0 +1,140 @@
+"""Burst of replies through the outbound send queue: inline sends vs background workers.
+
+Each mode runs in a fresh child process against a fake Twilio client that takes
+--twilio-latency per call and fails every --fail-every'th call with a 503, so
+retries are exercised. "submit" is the time send_whatsapp_message holds the
+caller (the inbound worker); "delivered" runs from submit to the reply's last
+segment going out. Every reply is checked for segment order, the 1600-character
+limit and per-recipient ordering, and sends per second are checked against the
+token bucket.
+
+Usage: python benchmarks/bench_outbound.py [--replies 100] [--recipients 10] [--long-every 4]
+       [--rate 20] [--burst 5] [--fail-every 7] [--twilio-latency 0.1]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeTwilio
+from benchmarks.measure import SUMMARY_HEADER, format_summary, run_child, summarize
+
+MODES = {'inline': 0, 'queued': 4}
+
+SEGMENT_MARKER = re.compile(r'\n\((\d+)/(\d+)\)$')
+
+
+def reply_body(number, long_every):
+    """A short answer, or every long_every'th reply a multi-segment report"""
+    if long_every and number % long_every == 0:
+        lines = [f"Reply {number}: weekly report"]
+        lines += [f"Week {week}, day {day}: R{week * 100 + day * 7:,} revenue across {day + 3} services"
+                  for week in range(1, 5) for day in range(1, 31)]
+        return '\n'.join(lines)
+    return f"Reply {number}: logged the Premium Wash for R280, payment status Paid. " * 3
+
+
+def max_per_window(times, window=1.0):
+    """Most sends inside any sliding window of `window` seconds"""
+    best = 0
+    start = 0
+    for end, sent_at in enumerate(times):
+        while sent_at - times[start] > window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+def check_order(sent, expected):
+    """Every recipient got its replies in submit order, each split into ordered, in-limit segments"""
+    import cardetail
+
+    received = {}
+    for to, body, _ in sent:
+        assert len(body) <= cardetail.OutboundSender.MAX_BODY, f"{len(body)}-character segment to {to}"
+        received.setdefault(to, []).append(body)
+    for to, bodies in expected.items():
+        segments = [segment for body in bodies for segment in cardetail.OutboundSender.split(body)]
+        assert received.get(to) == segments, f"replies to {to} arrived out of order or incomplete"
+        for segment in segments:
+            marker = SEGMENT_MARKER.search(segment)
+            assert marker is None or int(marker.group(1)) <= int(marker.group(2))
+
+
+def measure(args):
+    """Child process: submit the burst, wait for every delivery and report latencies"""
+    import json
+    import cardetail
+
+    assistant = cardetail.assistant
+    twilio = assistant.twilio_client = FakeTwilio(latency=args.twilio_latency, fail_every=args.fail_every)
+    recipients = [f"whatsapp:+2760000{number:04d}" for number in range(args.recipients)]
+
+    expected = {}
+    submits = []
+    start = time.perf_counter()
+    for number in range(args.replies):
+        to = recipients[number % len(recipients)]
+        body = reply_body(number, args.long_every)
+        submitted_at = time.perf_counter()
+        assert assistant.send_whatsapp_message(to, body)
+        submits.append((time.perf_counter() - submitted_at) * 1000)
+        expected.setdefault(to, []).append(body)
+
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        stats = assistant.outbound.stats()
+        if stats['sent'] + stats['failed'] >= args.replies:
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    deliveries = [assistant.outbound.delivery(number) for number in range(1, args.replies + 1)]
+    delivered = [(delivery['finished_at'] - delivery['queued_at']) * 1000 for delivery in deliveries
+                 if delivery['status'] == 'sent']
+    check_order(twilio.sent, expected)
+
+    print(json.dumps({'submit': summarize(submits, elapsed), 'delivered': summarize(delivered, elapsed),
+                      'segments': len(twilio.sent), 'calls': twilio.calls, 'retries': stats['retries'],
+                      'failed': stats['failed'],
+                      'max_per_second': max_per_window([sent_at for _, _, sent_at in twilio.sent])}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replies', type=int, default=100)
+    parser.add_argument('--recipients', type=int, default=10)
+    parser.add_argument('--long-every', type=int, default=4, help='every Nth reply is a multi-segment report')
+    parser.add_argument('--rate', type=float, default=20, help='sends per second allowed by the token bucket')
+    parser.add_argument('--burst', type=float, default=5)
+    parser.add_argument('--fail-every', type=int, default=7, help='fake Twilio fails every Nth call with a 503')
+    parser.add_argument('--twilio-latency', type=float, default=0.1)
+    parser.add_argument('--timeout', type=float, default=600, help='seconds to wait for queued replies')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    child_args = ['--replies', args.replies, '--recipients', args.recipients, '--long-every', args.long_every,
+                  '--fail-every', args.fail_every, '--twilio-latency', args.twilio_latency, '--timeout', args.timeout]
+    print(f"{'mode':>7} {'metric':>10} {SUMMARY_HEADER}")
+    for mode, workers in MODES.items():
+        result = run_child(__file__, child_args, env={
+            'OUTBOUND_WORKERS': str(workers), 'OUTBOUND_QUEUE_SIZE': str(args.replies),
+            'OUTBOUND_RATE_PER_SECOND': str(args.rate), 'OUTBOUND_BURST': str(args.burst),
+            'OUTBOUND_BACKOFF_SECONDS': '0.05', 'OUTBOUND_MAX_BACKOFF_SECONDS': '0.5'})
+        for metric in ('submit', 'delivered'):
+            print(f"{mode:>7} {metric:>10} {format_summary(result[metric])}")
+        print(f"{'':>7} {'':>10} segments {result['segments']} in {result['calls']} calls, "
+              f"retries {result['retries']}, failed {result['failed']}, "
+              f"max sends in 1s {result['max_per_second']} (rate {args.rate:g} + burst {args.burst:g})")
+        assert result['max_per_second'] <= args.rate + args.burst, 'token bucket let too many sends through'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Service and expense save latency for each write path: full workbook, streaming workbook, write-behind journal, SQLite.
+
+Each path runs in a fresh child process configured through the same environment
+variables production uses, against the fake Drive with --drive-latency per call.
+Saves alternate services and expenses, each in its own request context as
+separate WhatsApp messages would be.
+
+Usage: python benchmarks/bench_save_paths.py [--rows 2000] [--saves 20] [--drive-latency 0.05]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import install_fakes
+from benchmarks.measure import SUMMARY_HEADER, format_summary, run_child, summarize
+from benchmarks.synthetic import workbook_bytes
+
+SERVICE = {'customer_name': 'Thabo Mokoena', 'service_type': 'Full Wash', 'amount': 180.0,
+           'payment_method': 'Cash', 'payment_status': 'Paid'}
+EXPENSE = {'amount': 350.0, 'supplier': 'CleanCo Suppliers', 'category': 'Supplies',
+           'description': 'Paid CleanCo Suppliers R350 for soap'}
+
+
+def path_environments(tmp):
+    """Environment for each write path"""
+    return {
+        'full': {'WORKBOOK_LOAD_MODE': 'full'},
+        'streaming': {'WORKBOOK_LOAD_MODE': 'streaming'},
+        'write-behind': {'WRITE_BEHIND': 'true', 'WRITE_JOURNAL_PATH': os.path.join(tmp, 'pending_writes.jsonl'),
+                         'WRITE_BEHIND_DEBOUNCE_SECONDS': '3600'},
+        'sqlite': {'STORAGE_BACKEND': 'sqlite', 'SQLITE_PATH': os.path.join(tmp, 'ledger.db'),
+                   'SQLITE_EXPORT_INTERVAL_SECONDS': '3600'},
+    }
+
+
+def measure(args):
+    """Child process: warm the data, then time alternating service and expense saves"""
+    import json
+    import cardetail
+
+    assistant = cardetail.assistant
+    http, anthropic, twilio = install_fakes(assistant, workbook_bytes(args.rows), args.drive_latency)
+    assistant.load_business_data()
+    timings = {'service': [], 'expense': []}
+    for number in range(args.saves):
+        kind = 'service' if number % 2 == 0 else 'expense'
+        start = time.perf_counter()
+        if kind == 'service':
+            result = assistant.save_complete_service(dict(SERVICE))
+            assert result and result['success']
+        else:
+            assert assistant.save_expense(dict(EXPENSE))
+        timings[kind].append((time.perf_counter() - start) * 1000)
+    print(json.dumps({kind: summarize(values) for kind, values in timings.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000, help='service rows in the synthetic workbook')
+    parser.add_argument('--saves', type=int, default=20)
+    parser.add_argument('--drive-latency', type=float, default=0.05)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    print(f"{'path':>12} {'save':>8} {SUMMARY_HEADER}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for path, env in path_environments(tmp).items():
+            result = run_child(__file__, ['--rows', args.rows, '--saves', args.saves,
+                                          '--drive-latency', args.drive_latency], env=env)
+            for kind in ('service', 'expense'):
+                print(f"{path:>12} {kind:>8} {format_summary(result[kind])}")
+
+
+if __name__ == '__main__':
+    main()
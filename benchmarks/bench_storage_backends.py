@@ -0,0 +1,73 @@
+"""Per-message latency: Drive-workbook backend vs SQLite ledger backend.
+
+Both run against in-process fakes (no network). Drive calls get --drive-latency
+seconds each, roughly what a Drive round trip costs from a small VPS.
+
+Usage: python benchmarks/bench_storage_backends.py [--rows 2000,20000] [--messages 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAnthropic, fake_drive_service
+from benchmarks.synthetic import workbook_bytes
+
+import cardetail
+
+MESSAGES = {
+    'report': 'show me the business report',
+    'service': 'Customer John full wash R180 card',
+}
+
+
+def make_assistant(backend, content, drive_latency, ledger_path):
+    """Fresh assistant wired to fakes for the chosen backend"""
+    os.environ['STORAGE_BACKEND'] = backend
+    os.environ['SQLITE_PATH'] = ledger_path
+    os.environ['SQLITE_EXPORT_INTERVAL_SECONDS'] = '3600'
+    assistant = cardetail.IntelligentBusinessAssistant()
+    assistant.drive_service, http = fake_drive_service(content, drive_latency)
+    assistant.anthropic_client = FakeAnthropic()
+    return assistant, http
+
+
+def time_messages(assistant, message, count):
+    """Latencies in ms of process_natural_message for one kind of message"""
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        assistant.process_natural_message(message, 'whatsapp:+27000000000')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='2000,20000', help='comma-separated service row counts')
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--drive-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'backend':>7} {'message':>8} {'first (ms)':>11} {'p50 (ms)':>9} {'max (ms)':>9}")
+    for rows in [int(value) for value in args.rows.split(',')]:
+        content = workbook_bytes(rows)
+        for backend in ('drive', 'sqlite'):
+            with tempfile.TemporaryDirectory() as tmp:
+                assistant, http = make_assistant(backend, content, args.drive_latency,
+                                                 os.path.join(tmp, 'ledger.db'))
+                first = time_messages(assistant, MESSAGES['report'], 1)[0]
+                for kind, message in MESSAGES.items():
+                    timings = time_messages(assistant, message, args.messages)
+                    print(f"{rows:>7} {backend:>7} {kind:>8} {first:>11.1f} "
+                          f"{statistics.median(timings):>9.1f} {max(timings):>9.1f}")
+                if assistant.ledger:
+                    assistant.ledger.connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""One busy tenant's burst vs quiet tenants' replies on the shared worker pool: fair rotation vs one FIFO.
+
+Each mode runs in a fresh child process serving --tenants businesses from a
+TENANTS_FILE, each with its own fake Drive workbook of --rows services, persona
+and price list. After every tenant has answered one warm-up message, the hot
+tenant posts --burst report requests from --hot-senders numbers and every quiet
+tenant then posts one. "fifo" puts all tenants in one queue (the single-tenant
+behaviour); "fair" is the default, taking tenants in turn. Latency runs from the
+webhook POST to the reply reaching the tenant's fake Twilio client. Every reply
+must address its own tenant's owner, and at most --max-warm tenants may still
+hold a workbook snapshot at the end; setting it below --tenants bounds memory
+but makes the evicted quiet tenants pay a cold workbook load.
+
+Usage: python benchmarks/bench_tenants.py [--tenants 8] [--burst 80] [--hot-senders 20] [--rows 500]
+       [--workers 4] [--max-warm 8] [--drive-latency 0.05]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import add_latency_arguments, install_fakes
+from benchmarks.measure import SUMMARY_HEADER, format_summary, peak_rss_mb, run_child, summarize
+from benchmarks.synthetic import workbook_bytes
+
+MODES = ('fifo', 'fair')
+
+
+def tenant_number(index):
+    """The WhatsApp number tenant `index` receives messages on"""
+    return f"whatsapp:+2710000{index:04d}"
+
+
+def write_tenants(path, count):
+    """TENANTS_FILE with shop1..shopN, each with its own number, persona, workbook and prices"""
+    tenants = [{'id': f"shop{index}", 'TWILIO_WHATSAPP_NUMBER': tenant_number(index),
+                'OWNER_NAME': f"Owner{index}", 'BUSINESS_NAME': f"Shop {index} Detailing",
+                'GOOGLE_DRIVE_FILE_ID': f"workbook-shop{index}",
+                'service_prices': {'Basic Wash': 100 + index, 'Full Wash': 170 + index,
+                                   'Premium Wash': 260 + index, 'Interior Only': 140 + index}}
+               for index in range(1, count + 1)]
+    with open(path, 'w', encoding='utf-8') as config_file:
+        json.dump({'tenants': tenants}, config_file)
+
+
+def wait_for(twilios, expected, timeout):
+    """Block until every fake Twilio client has sent its expected number of replies"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(len(twilios[tenant_id].sent) >= count for tenant_id, count in expected.items()):
+            return
+        time.sleep(0.005)
+    raise AssertionError('timed out waiting for replies')
+
+
+def measure(args):
+    """Child process: warm every tenant, post the burst and the quiet messages, time each reply"""
+    import cardetail
+
+    if args.mode == 'fifo':
+        # Everyone in one group: the dispatcher degrades to a single FIFO of senders
+        submit = cardetail.dispatcher.submit
+        cardetail.dispatcher.submit = lambda sender, message, group=None: submit(sender, message)
+
+    content = workbook_bytes(args.rows)
+    tenant_ids = [f"shop{index}" for index in range(1, args.tenants + 1)]
+    twilios = {}
+    for tenant_id in tenant_ids:
+        tenant_assistant = cardetail.tenants.get(tenant_id)
+        twilios[tenant_id] = install_fakes(tenant_assistant, content, args.drive_latency,
+                                           args.llm_latency, args.twilio_latency)[2]
+        assert tenant_assistant.owner_name in tenant_assistant.system_prompt
+        # Every tenant sends on the environment's Twilio account, so they share its one rate limit
+        assert tenant_assistant.outbound.bucket is cardetail.assistant.outbound.bucket
+    client = cardetail.app.test_client()
+
+    def post(index, sender):
+        client.post('/webhook', data={'Body': 'show me the business report', 'From': sender,
+                                      'To': tenant_number(index)})
+        return time.perf_counter()
+
+    owner_number = 'whatsapp:+27820000000'
+    for index in range(1, args.tenants + 1):
+        post(index, owner_number)
+    wait_for(twilios, {tenant_id: 1 for tenant_id in tenant_ids}, args.timeout)
+
+    hot_posts = {}
+    for number in range(args.burst):
+        sender = f"whatsapp:+2783{number % args.hot_senders:07d}"
+        hot_posts.setdefault(sender, []).append(post(1, sender))
+    quiet_posts = {tenant_id: post(index, owner_number) for index, tenant_id in enumerate(tenant_ids[1:], 2)}
+    expected = {tenant_id: 2 for tenant_id in tenant_ids}
+    expected['shop1'] = 1 + args.burst
+    wait_for(twilios, expected, args.timeout)
+
+    quiet = []
+    for index, tenant_id in enumerate(tenant_ids[1:], 2):
+        to, body, sent_at = twilios[tenant_id].sent[-1]
+        assert f"Owner{index}" in body, f"{tenant_id} replied as someone else: {body}"
+        quiet.append((sent_at - quiet_posts[tenant_id]) * 1000)
+    hot = []
+    for to, body, sent_at in twilios['shop1'].sent[1:]:
+        assert 'Owner1' in body, f"shop1 replied as someone else: {body}"
+        hot.append((sent_at - hot_posts[to].pop(0)) * 1000)
+
+    warm = sum(1 for tenant_assistant in cardetail.tenants.active() if tenant_assistant.snapshot is not None)
+    print(json.dumps({'quiet': summarize(quiet), 'hot': summarize(hot), 'warm': warm,
+                      'peak_mb': peak_rss_mb(), 'tenants': cardetail.tenants.stats()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=8)
+    parser.add_argument('--burst', type=int, default=80, help='report requests the hot tenant posts at once')
+    parser.add_argument('--hot-senders', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=500, help='services in each tenant workbook')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-warm', type=int, default=8, help='TENANT_MAX_WARM')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    add_latency_arguments(parser, drive=0.05, llm=0.0, twilio=0.0)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    print(f"{'mode':>5} {'tenant':>6} {SUMMARY_HEADER}")
+    with tempfile.TemporaryDirectory() as directory:
+        tenants_file = os.path.join(directory, 'tenants.json')
+        write_tenants(tenants_file, args.tenants)
+        child_args = ['--tenants', args.tenants, '--burst', args.burst, '--hot-senders', args.hot_senders,
+                      '--rows', args.rows, '--timeout', args.timeout, '--drive-latency', args.drive_latency,
+                      '--llm-latency', args.llm_latency, '--twilio-latency', args.twilio_latency]
+        for mode in MODES:
+            result = run_child(__file__, child_args + ['--mode', mode], env={
+                'TENANTS_FILE': tenants_file, 'WEBHOOK_WORKERS': str(args.workers),
+                'WEBHOOK_QUEUE_SIZE': str(args.burst + args.tenants * 2),
+                'TENANT_MAX_WARM': str(args.max_warm), 'OUTBOUND_WORKERS': '0'})
+            for tenant in ('quiet', 'hot'):
+                print(f"{mode:>5} {tenant:>6} {format_summary(result[tenant])}")
+            print(f"{'':>5} {'':>6} {result['warm']} of {result['tenants']['active']} tenants holding a workbook "
+                  f"(max {args.max_warm}), peak RSS {result['peak_mb']:.0f} MB")
+            assert result['warm'] <= args.max_warm, 'more tenants kept their workbook than TENANT_MAX_WARM'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Full /webhook requests through Flask's test client: inline replies vs the worker pool.
+
+Each mode runs in a fresh child process (the dispatcher reads WEBHOOK_WORKERS at
+import) against fake Drive, Anthropic and Twilio clients with the given latencies.
+"ack" is the HTTP response time; "end-to-end" runs from the POST to the Twilio
+send of that message's reply, matched per sender since replies are ordered per sender.
+
+Usage: python benchmarks/bench_webhook.py [--messages 100] [--senders 10] [--rows 2000]
+       [--drive-latency 0.05] [--llm-latency 0.3] [--twilio-latency 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import add_latency_arguments, install_fakes
+from benchmarks.measure import SUMMARY_HEADER, format_summary, run_child, summarize
+from benchmarks.synthetic import synthetic_messages, workbook_bytes
+
+MODES = {'inline': 0, 'queued': 4}
+
+
+def measure(args):
+    """Child process: post the synthetic messages to /webhook and wait for every reply"""
+    import json
+    import cardetail
+
+    http, anthropic, twilio = install_fakes(cardetail.assistant, workbook_bytes(args.rows), args.drive_latency,
+                                            args.llm_latency, args.twilio_latency)
+    client = cardetail.app.test_client()
+    senders = [f"whatsapp:+2760000{number:04d}" for number in range(args.senders)]
+
+    posted = {}
+    acks = []
+    start = time.perf_counter()
+    for number, message in enumerate(synthetic_messages(args.messages)):
+        sender = senders[number % len(senders)]
+        posted_at = time.perf_counter()
+        response = client.post('/webhook', data={'Body': message, 'From': sender})
+        acks.append((time.perf_counter() - posted_at) * 1000)
+        if response.status_code == 200:
+            posted.setdefault(sender, []).append(posted_at)
+
+    expected = sum(len(times) for times in posted.values())
+    deadline = time.monotonic() + args.timeout
+    while len(twilio.sent) < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    replies = {}
+    for to, body, sent_at in list(twilio.sent):
+        replies.setdefault(to, []).append(sent_at)
+    end_to_end = [(sent_at - posted_at) * 1000 for sender, times in posted.items()
+                  for posted_at, sent_at in zip(times, replies.get(sender, []))]
+
+    print(json.dumps({'ack': summarize(acks, elapsed), 'end_to_end': summarize(end_to_end, elapsed),
+                      'replied': len(twilio.sent), 'expected': expected, 'drive_calls': http.calls,
+                      'claude_calls': anthropic.calls}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--senders', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=2000, help='service rows in the synthetic workbook')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds to wait for queued replies')
+    add_latency_arguments(parser)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args)
+        return
+
+    child_args = ['--messages', args.messages, '--senders', args.senders, '--rows', args.rows,
+                  '--timeout', args.timeout, '--drive-latency', args.drive_latency,
+                  '--llm-latency', args.llm_latency, '--twilio-latency', args.twilio_latency]
+    print(f"{'mode':>7} {'metric':>11} {SUMMARY_HEADER}")
+    for mode, workers in MODES.items():
+        result = run_child(__file__, child_args, env={'WEBHOOK_WORKERS': str(workers),
+                                                      'WEBHOOK_QUEUE_SIZE': str(args.messages)})
+        for metric in ('ack', 'end_to_end'):
+            print(f"{mode:>7} {metric.replace('_', '-'):>11} {format_summary(result[metric])}")
+        print(f"{'':>7} {'':>11} replies {result['replied']}/{result['expected']}, "
+              f"drive calls {result['drive_calls']}, claude calls {result['claude_calls']}")
+
+
+if __name__ == '__main__':
+    main()
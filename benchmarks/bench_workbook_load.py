@@ -0,0 +1,83 @@
+"""Parse time, append+save time and peak RSS: full openpyxl workbook vs StreamingWorkbook.
+
+Each measurement runs in a fresh child process so ru_maxrss reflects only that
+load. Rows are service rows (Operations + Revenue each) plus a quarter as many
+expenses.
+
+Usage: python benchmarks/bench_workbook_load.py [--rows 10000,100000,500000] [--full-limit 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.measure import peak_rss_mb, run_child
+
+
+def measure(mode, path):
+    """Child process: load, parse and append one service in the given workbook mode"""
+    import openpyxl
+    import cardetail
+
+    assistant = cardetail.assistant
+    with open(path, 'rb') as workbook_file:
+        content = workbook_file.read()
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'streaming':
+        workbook = cardetail.StreamingWorkbook(content)
+    else:
+        workbook = openpyxl.load_workbook(path)
+    data = assistant.parse_business_workbook(workbook)
+    parse_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    today = cardetail.date.today()
+    assistant.append_sheet_row(workbook, 'Operations', ('CW999999', 'Bench', today, 1, 'January', 'Yes',
+                                                        'Full Wash', 'bench', 'Completed'))
+    assistant.append_sheet_row(workbook, 'Revenue', ('REV999999', 'CW999999', today, 'January', 'Full Wash',
+                                                     180.0, 'Paid', 'Cash', 'Washed', 1))
+    with tempfile.NamedTemporaryFile(suffix='.xlsx') as output:
+        workbook.save(output.name)
+    append_seconds = time.perf_counter() - start
+
+    print(json.dumps({'parse_s': parse_seconds, 'append_s': append_seconds, 'operations': data['operations_count'],
+                      'baseline_mb': baseline, 'peak_mb': peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10000,100000,500000', help='comma-separated service row counts')
+    parser.add_argument('--full-limit', type=int, default=100000,
+                        help='skip the full openpyxl load above this many rows')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(*args.child)
+        return
+
+    from benchmarks.synthetic import workbook_bytes
+
+    print(f"{'rows':>8} {'mode':>10} {'parse (s)':>10} {'append+save (s)':>16} {'peak RSS (MB)':>14} {'over baseline':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in [int(value) for value in args.rows.split(',')]:
+            path = os.path.join(tmp, f'{rows}.xlsx')
+            with open(path, 'wb') as workbook_file:
+                workbook_file.write(workbook_bytes(rows, write_only=True))
+            for mode in ('full', 'streaming'):
+                if mode == 'full' and rows > args.full_limit:
+                    print(f"{rows:>8} {mode:>10} {'-':>10} {'-':>16} {'-':>14} {'-':>14}")
+                    continue
+                result = run_child(__file__, [mode, path])
+                print(f"{rows:>8} {mode:>10} {result['parse_s']:>10.2f} {result['append_s']:>16.2f} "
+                      f"{result['peak_mb']:>14.0f} {result['peak_mb'] - result['baseline_mb']:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""In-process stand-ins for the external services cardetail.py talks to.
+
+FakeDriveHttp plugs into googleapiclient's real Drive client (via build(..., http=...)),
+so get/get_media/update go through the same request code as production.
+FakeAnthropic and FakeTwilio replace the SDK clients' messages.create. Every fake
+takes a per-call latency so benchmarks can model network round trips offline.
+"""
+import email
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from email import policy
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build
+
+# Benchmarks swap in fakes right after import; don't build the real SDK clients behind them
+os.environ.setdefault('CLIENT_PREWARM', 'false')
+
+
+class FakeDriveHttp:
+    """httplib2-compatible transport holding the workbook in memory, plus any files created next to it"""
+
+    def __init__(self, content, latency=0.0):
+        self.content = content
+        self.revision = 1
+        self.latency = latency
+        self.calls = {'get': 0, 'get_media': 0, 'update': 0, 'upload_chunk': 0}
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.files = {}
+
+    def metadata(self):
+        """Revision fields the assistant asks Drive for"""
+        return {
+            'headRevisionId': str(self.revision),
+            'md5Checksum': hashlib.md5(self.content).hexdigest(),
+            'modifiedTime': f"2024-01-01T00:00:00.{self.revision:03d}Z"
+        }
+
+    def replace_content(self, content):
+        """Simulate somebody editing the workbook on Drive directly"""
+        with self.lock:
+            self.content = content
+            self.revision += 1
+
+    def upload_parts(self, body, headers):
+        """(metadata, file bytes) of a simple or multipart upload"""
+        if hasattr(body, 'read'):
+            body = body.read()
+        if isinstance(body, str):
+            body = body.encode('latin-1')
+        content_type = headers.get('content-type', '')
+        if 'multipart' not in content_type:
+            return {}, body
+        message = email.message_from_bytes(
+            b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body, policy=policy.HTTP)
+        parts = list(message.iter_parts())
+        metadata = json.loads(parts[0].get_payload(decode=True)) if len(parts) > 1 else {}
+        return metadata, parts[-1].get_payload(decode=True)
+
+    def upload_body(self, body, headers):
+        """Pull the file bytes out of a simple or multipart upload"""
+        return self.upload_parts(body, headers)[1]
+
+    def other_file(self, uri, method, body, headers):
+        """files.list/create and get/update of files other than the workbook; None for workbook requests"""
+        path = uri.split('?')[0]
+        file_id = re.search(r'/files/([^/]+)$', path)
+        if file_id and file_id.group(1) in self.files:
+            file = self.files[file_id.group(1)]
+            self.calls['other_files'] = self.calls.get('other_files', 0) + 1
+            if 'alt=media' in uri:
+                return httplib2.Response({'status': '200', 'content-length': str(len(file['content']))}), file['content']
+            if '/upload/drive/' in uri:
+                file['content'] = self.upload_body(body, headers)
+            return httplib2.Response({'status': '200'}), json.dumps({'id': file_id.group(1)}).encode()
+        if path.endswith('/upload/drive/v3/files') and method == 'POST':
+            self.calls['other_files'] = self.calls.get('other_files', 0) + 1
+            metadata, content = self.upload_parts(body, headers)
+            new_id = f"file{len(self.files) + 1}"
+            self.files[new_id] = {'name': metadata.get('name'), 'parents': metadata.get('parents', []),
+                                  'content': content}
+            return httplib2.Response({'status': '200'}), json.dumps({'id': new_id}).encode()
+        if path.endswith('/drive/v3/files') and method == 'GET':
+            self.calls['other_files'] = self.calls.get('other_files', 0) + 1
+            query = parse_qs(urlparse(uri).query).get('q', [''])[0]
+            name = re.search(r"name = '([^']*)'", query)
+            found = [{'id': file_id} for file_id, file in self.files.items() if name and file['name'] == name.group(1)]
+            return httplib2.Response({'status': '200'}), json.dumps({'files': found[:1]}).encode()
+        return None
+
+    def resumable_chunk(self, uri, body, headers):
+        """One PUT of a resumable upload session: 308 until the last byte arrives, then the file metadata"""
+        session = self.sessions[re.search(r'upload_id=(\w+)', uri).group(1)]
+        if hasattr(body, 'read'):
+            body = body.read()
+        content_range = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', headers.get('content-range', ''))
+        if content_range:
+            start, end, total = content_range.groups()
+            del session[int(start):]
+            session.extend(body or b'')
+            if total != '*' and int(end) + 1 == int(total):
+                self.calls['update'] += 1
+                self.content = bytes(session)
+                self.revision += 1
+                return httplib2.Response({'status': '200'}), json.dumps(self.metadata()).encode()
+        progress = {'range': f"bytes=0-{len(session) - 1}"} if session else {}
+        return httplib2.Response({'status': '308', **progress}), b''
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=1, connection_type=None):
+        if self.latency:
+            time.sleep(self.latency)
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        with self.lock:
+            response = self.other_file(uri, method, body, headers)
+            if response:
+                return response
+            if 'upload_id=' in uri:
+                self.calls['upload_chunk'] += 1
+                return self.resumable_chunk(uri, body, headers)
+            if 'uploadType=resumable' in uri:
+                upload_id = str(len(self.sessions) + 1)
+                self.sessions[upload_id] = bytearray()
+                return httplib2.Response({
+                    'status': '200',
+                    'location': f"https://www.googleapis.com/upload/drive/v3/files/fake?upload_id={upload_id}"
+                }), b''
+            if '/upload/drive/' in uri:
+                self.calls['update'] += 1
+                self.content = self.upload_body(body, headers)
+                self.revision += 1
+                return httplib2.Response({'status': '200'}), json.dumps(self.metadata()).encode()
+            if 'alt=media' in uri:
+                self.calls['get_media'] += 1
+                data = self.content
+                byte_range = re.match(r'bytes=(\d+)-(\d+)', headers.get('range', ''))
+                if byte_range:
+                    start, end = map(int, byte_range.groups())
+                    chunk = data[start:end + 1]
+                    return httplib2.Response({
+                        'status': '206',
+                        'content-range': f"bytes {start}-{start + len(chunk) - 1}/{len(data)}"
+                    }), chunk
+                return httplib2.Response({'status': '200', 'content-length': str(len(data))}), data
+            self.calls['get'] += 1
+            return httplib2.Response({'status': '200'}), json.dumps(self.metadata()).encode()
+
+
+def fake_drive_service(content, latency=0.0):
+    """Real Drive v3 client wired to a FakeDriveHttp; returns (service, http)"""
+    http = FakeDriveHttp(content, latency)
+    return build('drive', 'v3', http=http, static_discovery=True, cache_discovery=False), http
+
+
+class FakeAnthropic:
+    """Stands in for anthropic.Anthropic: messages.create returns a canned reply"""
+
+    def __init__(self, latency=0.0, reply="Sure thing, Moloi."):
+        self.latency = latency
+        self.reply = reply
+        self.calls = 0
+        self.last_request = None
+        self.messages = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        self.last_request = kwargs
+        if self.latency:
+            time.sleep(self.latency)
+
+        class Usage:
+            input_tokens = 400
+            output_tokens = 20
+            cache_creation_input_tokens = 0
+            cache_read_input_tokens = 0
+
+        class Block:
+            text = self.reply
+
+        class Response:
+            content = [Block()]
+            usage = Usage()
+
+        return Response()
+
+
+class FakeTwilioError(Exception):
+    """Carries an HTTP status like twilio.base.exceptions.TwilioRestException"""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status} from fake Twilio")
+        self.status = status
+
+
+class FakeTwilio:
+    """Stands in for twilio.rest.Client: messages.create records the outbound message
+
+    With fail_every=N every Nth call raises a FakeTwilioError with fail_status instead
+    of sending, to exercise the sender's retries.
+    """
+
+    def __init__(self, latency=0.0, fail_every=0, fail_status=503):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.sent = []
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.messages = self
+
+    def create(self, body, from_, to, **options):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.calls += 1
+            if self.fail_every and self.calls % self.fail_every == 0:
+                raise FakeTwilioError(self.fail_status)
+            self.sent.append((to, body, time.perf_counter()))
+            sid = f"SM{len(self.sent):032d}"
+
+        class Message:
+            pass
+
+        message = Message()
+        message.sid = sid
+        return message
+
+
+def add_latency_arguments(parser, drive=0.05, llm=0.3, twilio=0.1):
+    """--drive-latency/--llm-latency/--twilio-latency, in seconds per call"""
+    parser.add_argument('--drive-latency', type=float, default=drive)
+    parser.add_argument('--llm-latency', type=float, default=llm)
+    parser.add_argument('--twilio-latency', type=float, default=twilio)
+
+
+def install_fakes(assistant, content, drive_latency=0.0, llm_latency=0.0, twilio_latency=0.0):
+    """Point an assistant's Drive, Anthropic and Twilio clients at fakes; returns (drive http, anthropic, twilio)"""
+    assistant.drive_service, http = fake_drive_service(content, drive_latency)
+    assistant.anthropic_client = FakeAnthropic(latency=llm_latency)
+    assistant.twilio_client = FakeTwilio(latency=twilio_latency)
+    return http, assistant.anthropic_client, assistant.twilio_client
@@ -0,0 +1,49 @@
+"""Latency percentiles, throughput and peak memory for the benchmark scripts."""
+import json
+import os
+import resource
+import subprocess
+import sys
+
+SUMMARY_HEADER = f"{'count':>6} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'per sec':>8} {'peak RSS (MB)':>14}"
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (Linux reports KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(timings_ms, elapsed_seconds=None):
+    """p50/p99/max latency and throughput; throughput uses wall time when given, else the summed latencies"""
+    elapsed = elapsed_seconds if elapsed_seconds is not None else sum(timings_ms) / 1000
+    return {
+        'count': len(timings_ms),
+        'p50_ms': percentile(timings_ms, 50),
+        'p99_ms': percentile(timings_ms, 99),
+        'max_ms': max(timings_ms, default=0.0),
+        'per_sec': len(timings_ms) / elapsed if elapsed else 0.0,
+        'peak_mb': peak_rss_mb()
+    }
+
+
+def format_summary(summary):
+    """One row under SUMMARY_HEADER"""
+    return (f"{summary['count']:>6} {summary['p50_ms']:>9.1f} {summary['p99_ms']:>9.1f} {summary['max_ms']:>9.1f} "
+            f"{summary['per_sec']:>8.1f} {summary['peak_mb']:>14.0f}")
+
+
+def run_child(script, args, env=None):
+    """Run a benchmark script's --child mode in a fresh interpreter and return its last JSON line"""
+    child_env = dict(os.environ, **(env or {}))
+    output = subprocess.run([sys.executable, os.path.abspath(script), '--child'] + [str(arg) for arg in args],
+                            capture_output=True, text=True, check=True, env=child_env).stdout
+    return json.loads(output.strip().splitlines()[-1])
@@ -0,0 +1,66 @@
+"""Run every benchmark script in turn and fail if any of them errors.
+
+By default each script gets small sizes so the whole suite finishes in a few
+minutes offline; --full runs every script with its own defaults. Any script that
+exits non-zero (including a failed equivalence assertion) makes the runner exit 1.
+
+Usage: python benchmarks/run_all.py [--full] [--only webhook,save_paths]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUICK_ARGS = {
+    'extraction': ['--messages', '5000'],
+    'llm_cache': ['--messages', '40', '--llm-latency', '0.05'],
+    'load_business_data': ['--rows', '2000', '--loads', '3'],
+    'save_paths': ['--rows', '1000', '--saves', '6'],
+    'webhook': ['--messages', '40', '--senders', '5', '--rows', '500'],
+    'workbook_load': ['--rows', '10000', '--full-limit', '10000'],
+    'customer_journey': ['--sizes', '500,1000', '--legacy-limit', '1000'],
+    'storage_backends': ['--rows', '2000', '--messages', '5'],
+    'cold_start': ['--starts', '1', '--calls', '5'],
+    'outbound': ['--replies', '30', '--recipients', '5'],
+    'bulk_import': ['--records', '8', '--rows', '500'],
+    'archive': ['--sizes', '500,2000', '--messages', '2'],
+    'tenants': ['--tenants', '4', '--burst', '24', '--hot-senders', '8', '--rows', '300'],
+    'customer_index': ['--sizes', '5000', '--queries', '300', '--scan-queries', '50'],
+    'digests': ['--tenants', '4', '--rows', '300', '--rounds', '2'],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--full', action='store_true', help="use each benchmark's default sizes")
+    parser.add_argument('--only', help='comma-separated benchmark names, e.g. webhook,save_paths')
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(QUICK_ARGS)
+    unknown = [name for name in names if name not in QUICK_ARGS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = []
+    for name in names:
+        command = [sys.executable, os.path.join(BENCHMARK_DIR, f"bench_{name}.py")] + ([] if args.full else QUICK_ARGS[name])
+        print(f"== {name}: {' '.join(command[1:])}", flush=True)
+        start = time.perf_counter()
+        # stderr carries the assistant's logging; only show it when the script fails
+        completed = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+        if completed.returncode:
+            print('\n'.join(completed.stderr.splitlines()[-20:]))
+        results.append((name, completed.returncode, time.perf_counter() - start))
+        print(flush=True)
+
+    print(f"{'benchmark':>20} {'result':>7} {'seconds':>8}")
+    for name, returncode, seconds in results:
+        print(f"{name:>20} {'ok' if returncode == 0 else 'FAILED':>7} {seconds:>8.1f}")
+    sys.exit(1 if any(returncode for name, returncode, seconds in results) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Synthetic Operations/Revenue/Expenses workbooks in the layout cardetail.py expects."""
+import io
+import random
+from datetime import date, timedelta
+
+import openpyxl
+
+SERVICE_PRICES = {'Basic Wash': 120, 'Full Wash': 180, 'Premium Wash': 280, 'Interior Only': 150}
+EXPENSE_CATEGORIES = ['Supplies', 'Equipment', 'Utilities', 'Staff', 'Marketing', 'Fuel', 'Maintenance']
+HEADERS = {
+    'Operations': ['Customer_ID', 'Customer_Name', 'Service_Date', 'Week_Number', 'Month',
+                   'Service_Completed', 'Service_Type', 'Notes', 'Status'],
+    'Revenue': ['Transaction_Id', 'Customer_id', 'Service_Date', 'Month', 'Service_Type', 'Amount',
+                'Payment_Status', 'Payment_Method', 'Status', 'Week_Number'],
+    'Expenses': ['Transaction_ID', 'Date', 'Month', 'Category', 'Description', 'Amount',
+                 'Supplier', 'Status', 'Notes']
+}
+
+
+def week_of_month(day):
+    """Same rule as IntelligentBusinessAssistant.calculate_week_of_month"""
+    return (day.day - 1) // 7 + 1
+
+
+def build_workbook(services=1000, expenses=None, customers=None, start=date(2023, 1, 1), seed=42, write_only=False):
+    """openpyxl Workbook with `services` Operations+Revenue rows and `expenses` Expenses rows"""
+    rnd = random.Random(seed)
+    expenses = services // 4 if expenses is None else expenses
+    customers = max(1, services // 3) if customers is None else customers
+    span_days = max(1, services // 20)
+
+    workbook = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        workbook.remove(workbook.active)
+    sheets = {name: workbook.create_sheet(name) for name in HEADERS}
+    for name, header in HEADERS.items():
+        sheets[name].append(header)
+
+    for i in range(services):
+        day = start + timedelta(days=rnd.randrange(span_days))
+        customer_id = f"CW{rnd.randint(1, customers):03d}"
+        service = rnd.choice(list(SERVICE_PRICES))
+        paid = rnd.random() < 0.9
+        sheets['Operations'].append([
+            customer_id, f"Customer {customer_id[2:]}", day, week_of_month(day), day.strftime('%B'),
+            'Yes', service, 'Logged via WhatsApp', 'Completed'
+        ])
+        sheets['Revenue'].append([
+            f"REV{i + 1:03d}", customer_id, day, day.strftime('%B'), service, float(SERVICE_PRICES[service]),
+            'Paid' if paid else 'Unpaid', rnd.choice(['Cash', 'Card', 'EFT']),
+            'Washed' if paid else 'Not yet Washed', week_of_month(day)
+        ])
+    for i in range(expenses):
+        day = start + timedelta(days=rnd.randrange(span_days))
+        sheets['Expenses'].append([
+            f"EXP{i + 1:03d}", day, day.strftime('%B'), rnd.choice(EXPENSE_CATEGORIES),
+            'Synthetic expense', -float(rnd.randint(20, 900)), f"Supplier {rnd.randint(1, 40)}",
+            'Recorded', 'Added via WhatsApp'
+        ])
+    return workbook
+
+
+def workbook_bytes(services=1000, expenses=None, customers=None, seed=42, write_only=False, start=date(2023, 1, 1)):
+    """Serialized .xlsx content for build_workbook; write_only streams large workbooks"""
+    buffer = io.BytesIO()
+    build_workbook(services, expenses, customers, start=start, seed=seed, write_only=write_only).save(buffer)
+    return buffer.getvalue()
+
+
+MESSAGE_TEMPLATES = [
+    'Served customer {name} {service} R{amount} {method}',
+    'Customer {name} came for a {service}, paid {amount} rand by {method}',
+    'Finished {service} for client {name} R{amount}, owes us',
+    'Paid {supplier} R{cost} for {item}',
+    'Bought {item} from {supplier} for {cost}',
+    'Electricity bill R{cost}',
+    'Salary for worker R{cost}',
+    'How is the business doing this week?',
+    'What is profit margin?',
+    'Show me the cash flow',
+    'Thanks, hello!',
+]
+
+
+def synthetic_messages(count=1000, seed=42):
+    """WhatsApp-style service, expense, report and chat messages"""
+    rnd = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        messages.append(rnd.choice(MESSAGE_TEMPLATES).format(
+            name=rnd.choice(['John', 'Thabo Mokoena', 'Lerato', 'Mr Smith', 'Sipho']),
+            service=rnd.choice(['basic wash', 'full wash', 'premium detailed', 'interior only']),
+            amount=rnd.choice([120, 150, 180, 280, '1,200']),
+            method=rnd.choice(['cash', 'card', 'EFT', 'bank transfer']),
+            supplier=rnd.choice(['CleanCo Suppliers', 'Shell', 'Makro store', 'Joe']),
+            cost=rnd.randint(20, 900),
+            item=rnd.choice(['soap', 'wax', 'a new hose', 'petrol', 'towels', 'flyers'])))
+    return messages
@@ -1,87 +1,2660 @@
 import os
 import json
-from flask import Flask, request, jsonify
-import anthropic
-from twilio.rest import Client
+import hmac
+import csv
+from flask import Flask, Response, request, jsonify
 import openpyxl
-from datetime import datetime, timedelta, timezone
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+from datetime import date, datetime, timedelta, timezone
 import logging
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 import io
-import tempfile
 import re
 import random
+import threading
+import time
+import atexit
+import sqlite3
+import shelve
+import shutil
+import sys
+import unicodedata
+from operator import itemgetter
+import zipfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape as xml_escape
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from copy import copy
+import bisect
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Drive metadata that changes whenever the workbook content changes
+DRIVE_REVISION_FIELDS = 'headRevisionId,md5Checksum,modifiedTime'
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Resumable upload chunks must be a multiple of 256 KiB
+DRIVE_CHUNK_GRANULARITY = 256 * 1024
+
+# The business configured from environment variables; tenants from TENANTS_FILE get their own ids
+DEFAULT_TENANT_ID = 'default'
+TENANT_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+# Relative local file settings (write journal, SQLite ledger, archives, spill file) live here, not in the working directory
+DATA_DIR = os.getenv('DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+# Static part of the Claude system prompt, filled in with the tenant's persona; sent as a cacheable prefix ahead of the live metrics
+SYSTEM_PROMPT = """You are {owner_name}'s business assistant for {business_name} in South Africa.
+
+CONTEXT AWARENESS:
+- Currency: South African Rand (R)
+- Business location: South Africa
+- Week numbers: 1-4 within each month
+
+COMMUNICATION STYLE:
+- Always address the owner as "{owner_name}"
+- Keep responses SHORT and practical 
+- Use simple, clear English
+- Be direct and helpful
+- Use "Rand" or "R" for currency
+
+SMART DATA COLLECTION:
+- Services: Customer Name, Service Type, Amount (Rand), Payment Method, Payment Status
+- Expenses: Amount (Rand), Supplier, Category
+- Extract from full sentences when possible
+- Auto-generate IDs and calculate dates/weeks
+- Track payment status (Paid/Unpaid)
+
+DETECTION RULES:
+- Service: served, customer, wash, service, finished, completed
+- Expense: paid, bought, spent, cost, expense, bill, salary
+- NEVER log purchases as services
+- Track both service completion AND payment status
+
+Be conversational but focused on accurate data collection."""
+
+# Workbook column layout, shared by the Excel sheets and the SQLite ledger tables
+SHEET_COLUMNS = {
+    'Operations': ['Customer_ID', 'Customer_Name', 'Service_Date', 'Week_Number', 'Month',
+                   'Service_Completed', 'Service_Type', 'Notes', 'Status'],
+    'Revenue': ['Transaction_Id', 'Customer_id', 'Service_Date', 'Month', 'Service_Type', 'Amount',
+                'Payment_Status', 'Payment_Method', 'Status', 'Week_Number'],
+    'Expenses': ['Transaction_ID', 'Date', 'Month', 'Category', 'Description', 'Amount',
+                 'Supplier', 'Status', 'Notes']
+}
+SQLITE_COLUMN_TYPES = {'Amount': 'REAL', 'Week_Number': 'INTEGER'}
+
+# Sheets added to the live workbook once closed months are archived: per-week totals and per-customer history
+SUMMARY_SHEET_COLUMNS = {
+    'Period_Summary': ['Year', 'Month', 'Week_Number', 'Sheet', 'Group', 'Status', 'Count', 'Amount', 'Last_ID'],
+    'Customer_Summary': ['Customer_ID', 'Customer_Name', 'Services', 'Service_Types', 'Total_Spent',
+                         'Last_Service_Date']
+}
+
+class StreamingWorkbook:
+    """xlsx content parsed with openpyxl's read-only reader and appended to at the sheet-XML level"""
+    
+    MAIN_NAMESPACE = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    RELATIONSHIP_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+    EXCEL_EPOCH = datetime(1899, 12, 30)
+    ROW_NUMBER_PATTERN = re.compile(rb'<row\b[^>]*?\br="(\d+)"')
+    CELL_PATTERN = re.compile(rb'<c\b([^>]*?)/?>')
+    ATTRIBUTE_PATTERN = re.compile(rb'\b(r|s|t)="([^"]*)"')
+    DIMENSION_PATTERN = re.compile(rb'(<dimension\b[^>]*?\bref="[A-Z]+\d+:[A-Z]+)(\d+)(")')
+    # Sheets are copied in chunks of this size; the last row must fit in one
+    CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, content):
+        self.content = content
+        self.max_rows = {}
+        self.pending_rows = {}
+    
+    def read_rows(self):
+        """(sheet name, values) for every business and summary sheet row, streamed and column-limited"""
+        workbook = openpyxl.load_workbook(io.BytesIO(self.content), read_only=True)
+        try:
+            for sheet_name, columns in {**SUMMARY_SHEET_COLUMNS, **SHEET_COLUMNS}.items():
+                if sheet_name in SUMMARY_SHEET_COLUMNS and sheet_name not in workbook.sheetnames:
+                    continue
+                sheet = workbook[sheet_name]
+                # Drive-edited files can carry a stale <dimension>; read to the real last row
+                sheet.reset_dimensions()
+                last_row = 1
+                for last_row, row in enumerate(sheet.iter_rows(min_row=2, max_col=len(columns), values_only=True),
+                                               start=2):
+                    yield sheet_name, row
+                self.max_rows[sheet_name] = last_row
+        finally:
+            workbook.close()
+    
+    def max_row(self, sheet_name):
+        """Last used row of a sheet, including rows not yet saved"""
+        return self.max_rows.get(sheet_name, 1) + len(self.pending_rows.get(sheet_name, []))
+    
+    def append(self, sheet_name, row):
+        """Queue a row for the next save, without the control characters a worksheet cannot hold"""
+        row = tuple(ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value for value in row)
+        self.pending_rows.setdefault(sheet_name, []).append(row)
+        return self.max_row(sheet_name)
+    
+    def save(self, filename):
+        """Write the content with queued rows appended"""
+        with open(filename, 'wb') as workbook_file:
+            workbook_file.write(self.to_bytes())
+    
+    def to_bytes(self):
+        """xlsx bytes with queued rows appended"""
+        if any(self.pending_rows.values()):
+            try:
+                try:
+                    content = self.append_sheet_xml()
+                except ValueError as e:
+                    logger.info(f"Rewriting the whole workbook to append rows: {str(e)}")
+                    content = self.append_with_openpyxl()
+            except Exception:
+                # Rows that can't be written must not stay queued and fail every later save too
+                self.pending_rows = {}
+                raise
+            for sheet_name, rows in self.pending_rows.items():
+                self.max_rows[sheet_name] = self.max_rows.get(sheet_name, 1) + len(rows)
+            self.content = content
+            self.pending_rows = {}
+        return self.content
+    
+    def append_with_openpyxl(self):
+        """Fallback: load the full workbook, append, re-serialize"""
+        workbook = openpyxl.load_workbook(io.BytesIO(self.content))
+        for sheet_name, rows in self.pending_rows.items():
+            sheet = workbook[sheet_name]
+            for row in rows:
+                next_row = sheet.max_row + 1
+                for column, value in enumerate(row, start=1):
+                    sheet.cell(row=next_row, column=column, value=value)
+        output = io.BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+    
+    def append_sheet_xml(self):
+        """Copy the zip, splicing new <row> elements into only the sheets that changed"""
+        source = zipfile.ZipFile(io.BytesIO(self.content))
+        sheet_paths = self.sheet_paths(source)
+        missing = set(self.pending_rows) - set(sheet_paths.values())
+        if missing:
+            raise ValueError(f"sheets not found: {', '.join(sorted(missing))}")
+        
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                rows = self.pending_rows.get(sheet_paths.get(item.filename))
+                if rows:
+                    self.splice_rows(source, item, target, rows)
+                    continue
+                # A copy of the entry, as writing one records the target's offsets in it
+                with source.open(item) as member, target.open(copy(item), 'w') as copy_member:
+                    shutil.copyfileobj(member, copy_member, self.CHUNK_SIZE)
+        return output.getvalue()
+    
+    def sheet_paths(self, source):
+        """Zip member path of each worksheet, keyed by path"""
+        workbook_xml = ElementTree.fromstring(source.read('xl/workbook.xml'))
+        properties = workbook_xml.find(f'{self.MAIN_NAMESPACE}workbookPr')
+        if properties is not None and properties.get('date1904') in ('1', 'true'):
+            raise ValueError("1904 date system")
+        relationships = ElementTree.fromstring(source.read('xl/_rels/workbook.xml.rels'))
+        targets = {relationship.get('Id'): relationship.get('Target') for relationship in relationships}
+        paths = {}
+        for sheet in workbook_xml.iter(f'{self.MAIN_NAMESPACE}sheet'):
+            target = targets.get(sheet.get(self.RELATIONSHIP_ID), '')
+            paths[target.lstrip('/') if target.startswith('/') else f'xl/{target}'] = sheet.get('name')
+        return paths
+    
+    def chunks(self, source, item):
+        """Uncompressed bytes of a zip member, CHUNK_SIZE at a time"""
+        with source.open(item) as member:
+            yield from iter(lambda: member.read(self.CHUNK_SIZE), b'')
+    
+    def splice_rows(self, source, item, target, rows):
+        """Copy a sheet with rows inserted before </sheetData>, styled like the last existing row, a chunk at a time"""
+        # First pass keeps only the start of the sheet, up to <sheetData>, and the end, which holds the last row
+        head, tail, size = b'', b'', 0
+        for chunk in self.chunks(source, item):
+            if b'<sheetData' not in head:
+                head += chunk
+            tail = tail[-self.CHUNK_SIZE:] + chunk
+            size += len(chunk)
+        dimension = self.DIMENSION_PATTERN.search(head, 0, max(head.find(b'<sheetData'), 0))
+        end = tail.rfind(b'</sheetData>')
+        start = tail.rfind(b'<row ', 0, end)
+        row_number = self.ROW_NUMBER_PATTERN.match(tail, start) if start >= 0 else None
+        if end < 0 or not row_number or int(row_number.group(1)) < 2:
+            raise ValueError("no data row to copy cell styles from")
+        
+        previous_cells = {}
+        for cell in self.CELL_PATTERN.finditer(tail, start, end):
+            attributes = dict(self.ATTRIBUTE_PATTERN.findall(cell.group(1)))
+            column = attributes.get(b'r', b'').rstrip(b'0123456789').decode()
+            previous_cells[column] = attributes
+        
+        last_row = int(row_number.group(1))
+        new_rows = []
+        for row in rows:
+            last_row += 1
+            cells = []
+            for column_number, value in enumerate(row, start=1):
+                if value is not None:
+                    column = get_column_letter(column_number)
+                    cells.append(self.cell_xml(f'{column}{last_row}', value, previous_cells.get(column, {})))
+            new_rows.append(f'<row r="{last_row}">{"".join(cells)}</row>'.encode())
+        
+        # Second pass copies the sheet through, moving the <dimension> to the new last row and splicing the rows in
+        edits = [(end + size - len(tail), 0, b''.join(new_rows))]
+        if dimension:
+            edits.insert(0, (dimension.start(2), dimension.end(2) - dimension.start(2), str(last_row).encode()))
+        chunks = self.chunks(source, item)
+        buffered, position = b'', 0
+        
+        def copy_to(offset, write):
+            """Pass the sheet bytes up to `offset` to `write`"""
+            nonlocal buffered, position
+            while position + len(buffered) < offset:
+                write(buffered)
+                position += len(buffered)
+                buffered = next(chunks)
+            write(buffered[:offset - position])
+            buffered = buffered[offset - position:]
+            position = offset
+        
+        with target.open(copy(item), 'w') as copy_member:
+            for offset, skip, replacement in edits:
+                copy_to(offset, copy_member.write)
+                copy_to(offset + skip, lambda dropped: None)
+                copy_member.write(replacement)
+            copy_to(size, copy_member.write)
+    
+    def cell_xml(self, reference, value, previous):
+        """<c> element for a value, reusing the style index of the cell above"""
+        style = f' s="{previous[b"s"].decode()}"' if b's' in previous else ''
+        if isinstance(value, bool):
+            return f'<c r="{reference}"{style} t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c r="{reference}"{style}><v>{value!r}</v></c>'
+        if isinstance(value, (datetime, date)):
+            # Dates are styled numbers; only trust the style if the cell above was one too
+            if not style or previous.get(b't', b'n') != b'n':
+                raise ValueError(f"no date style to copy for {reference}")
+            if isinstance(value, datetime):
+                serial = (value.replace(tzinfo=None) - self.EXCEL_EPOCH).total_seconds() / 86400
+            else:
+                serial = (value - self.EXCEL_EPOCH.date()).days
+            return f'<c r="{reference}"{style}><v>{serial!r}</v></c>'
+        if isinstance(value, str):
+            return f'<c r="{reference}"{style} t="inlineStr"><is><t xml:space="preserve">{xml_escape(value)}</t></is></c>'
+        raise ValueError(f"unsupported value type {type(value).__name__} in {reference}")
+
+class BusinessAggregates:
+    """Running business totals, updated in O(1) for every appended sheet row"""
+    
+    def __init__(self):
+        self.total_revenue = 0
+        self.total_expenses = 0
+        self.paid_revenue = 0
+        self.operations_count = 0
+        self.completed_services = 0
+        self.service_performance = {}
+        self.service_customers = {}
+        self.expense_analysis = {}
+        self.customer_service_counts = {}
+        self.repeat_customers = 0
+    
+    def add_operation(self, op):
+        """Count one Operations row"""
+        self.operations_count += 1
+        if op['Service_Completed'] == 'Yes':
+            self.completed_services += 1
+        
+        customer_id = op['Customer_ID']
+        count = self.customer_service_counts.get(customer_id, 0) + 1
+        self.customer_service_counts[customer_id] = count
+        if count == 2:
+            self.repeat_customers += 1
+    
+    def performance_for(self, service):
+        """Running totals for a service type, created on first sight"""
+        if service not in self.service_performance:
+            self.service_performance[service] = {'revenue': 0, 'count': 0, 'customers': [], 'unique_customers': 0}
+            self.service_customers[service] = set()
+        return self.service_performance[service]
+    
+    def add_service_customer(self, service, customer_id):
+        """Count a customer once per service type"""
+        performance = self.performance_for(service)
+        if customer_id not in self.service_customers[service]:
+            self.service_customers[service].add(customer_id)
+            performance['customers'].append(customer_id)
+            performance['unique_customers'] += 1
+    
+    def add_revenue(self, rev):
+        """Count one Revenue row"""
+        amount = rev['Amount']
+        self.total_revenue += amount
+        if rev['Payment_Status'] == 'Paid':
+            self.paid_revenue += amount
+        
+        performance = self.performance_for(rev['Service_Type'])
+        performance['revenue'] += amount
+        performance['count'] += 1
+        self.add_service_customer(rev['Service_Type'], rev['Customer_id'])
+    
+    def add_expense(self, exp):
+        """Count one Expenses row"""
+        self.total_expenses += exp['Amount']
+        category = exp['Category']
+        self.expense_analysis[category] = self.expense_analysis.get(category, 0) + exp['Amount']
+    
+    def add_period_summary(self, summary):
+        """Count an archived Period_Summary row as if its rows were still in the sheets"""
+        count = summary['Count']
+        amount = summary['Amount']
+        if summary['Sheet'] == 'Operations':
+            self.operations_count += count
+            if summary['Status'] == 'Yes':
+                self.completed_services += count
+        elif summary['Sheet'] == 'Revenue':
+            self.total_revenue += amount
+            if summary['Status'] == 'Paid':
+                self.paid_revenue += amount
+            performance = self.performance_for(summary['Group'])
+            performance['revenue'] += amount
+            performance['count'] += count
+        elif summary['Sheet'] == 'Expenses':
+            self.total_expenses += amount
+            self.expense_analysis[summary['Group']] = self.expense_analysis.get(summary['Group'], 0) + amount
+    
+    def add_customer_summary(self, customer):
+        """Merge an archived customer's visit count and service types, in any order with the live rows"""
+        customer_id = customer['Customer_ID']
+        if customer['Services']:
+            previous = self.customer_service_counts.get(customer_id, 0)
+            count = self.customer_service_counts[customer_id] = previous + customer['Services']
+            if previous < 2 <= count:
+                self.repeat_customers += 1
+        for service in customer['Service_Types']:
+            self.add_service_customer(service, customer_id)
+    
+    def summary(self):
+        """Derived metrics in the shape load_business_data has always returned"""
+        net_profit = self.total_revenue - self.total_expenses
+        return {
+            'total_revenue': self.total_revenue, 'total_expenses': self.total_expenses,
+            'net_profit': net_profit,
+            'profit_margin': (net_profit / self.total_revenue * 100) if self.total_revenue > 0 else 0,
+            'service_performance': self.service_performance,
+            'expense_analysis': self.expense_analysis,
+            'completion_rate': (self.completed_services / self.operations_count * 100) if self.operations_count else 0,
+            'payment_rate': (self.paid_revenue / self.total_revenue * 100) if self.total_revenue > 0 else 0,
+            'paid_revenue': self.paid_revenue,
+            'total_customers': len(self.customer_service_counts),
+            'repeat_customers': self.repeat_customers,
+            'operations_count': self.operations_count
+        }
+
+class CustomerIndex:
+    """Customer names by normalized key, with word-prefix search over the sorted keys and one-typo matching per word"""
+    
+    NORMALIZE_PATTERN = re.compile(r"[^a-z0-9]+")
+    # Names the assistant writes when none was given; never matched to an existing customer
+    PLACEHOLDER_KEYS = {'walk in customer', 'walk in', 'unknown', 'none'}
+    # Leading words that aren't part of the name ("customer Thabo", "Mr Smith")
+    NAME_PREFIXES = {'customer', 'client', 'mr', 'mrs', 'ms', 'miss', 'dr'}
+    # Shorter keys are usually a lone first name, where one letter makes a different name (Thabo/Thabi)
+    FUZZY_MIN_LENGTH = 8
+    KEY_LETTERS = 'abcdefghijklmnopqrstuvwxyz0123456789'
+    
+    def __init__(self):
+        self.ids_by_key = {}
+        self.names_by_key = {}
+        self.sorted_keys = []
+        # Every word of every name, for checking typo corrections
+        self.words = set()
+    
+    @classmethod
+    def key(cls, name):
+        """Accent, case, punctuation and spacing-insensitive form of a name; None for blanks and placeholders"""
+        text = unicodedata.normalize('NFKD', str(name or '')).encode('ascii', 'ignore').decode('ascii')
+        words = cls.NORMALIZE_PATTERN.sub(' ', text.lower()).split()
+        while words and words[0] in cls.NAME_PREFIXES:
+            words.pop(0)
+        key = ' '.join(words)
+        return key if key and key not in cls.PLACEHOLDER_KEYS else None
+    
+    @classmethod
+    def edits(cls, word):
+        """Every string one deletion, swap of neighbours, substitution or insertion away from a word"""
+        splits = [(word[:position], word[position:]) for position in range(len(word) + 1)]
+        deletes = [left + right[1:] for left, right in splits if right]
+        swaps = [left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1]
+        substitutions = [left + letter + right[1:] for left, right in splits if right for letter in cls.KEY_LETTERS]
+        inserts = [left + letter + right for left, right in splits for letter in cls.KEY_LETTERS]
+        return set(deletes + swaps + substitutions + inserts)
+    
+    @staticmethod
+    def id_order(customer_id):
+        """Sort CW9 before CW10 so the oldest of several IDs under one name wins"""
+        return len(customer_id), customer_id
+    
+    def add(self, customer_id, name):
+        """Index one customer's name; duplicates under one key keep the oldest ID"""
+        key = self.key(name)
+        if key is None or not customer_id:
+            return
+        current = self.ids_by_key.get(key)
+        if current is None:
+            self.ids_by_key[key] = customer_id
+            self.names_by_key[key] = name
+            bisect.insort(self.sorted_keys, key)
+            self.words.update(key.split())
+        elif self.id_order(customer_id) < self.id_order(current):
+            self.ids_by_key[key] = customer_id
+            self.names_by_key[key] = name
+    
+    def prefix_match(self, key):
+        """The one customer whose name starts with these whole words (e.g. "Thabo" for "Thabo Nkosi"), else None"""
+        prefix = key + ' '
+        position = bisect.bisect_left(self.sorted_keys, prefix)
+        match = None
+        while position < len(self.sorted_keys) and self.sorted_keys[position].startswith(prefix):
+            candidate = self.sorted_keys[position]
+            if match is not None and self.ids_by_key[candidate] != self.ids_by_key[match]:
+                return None
+            match = candidate
+            position += 1
+        return match
+    
+    def corrections(self, word):
+        """Known words one typo away from a word"""
+        corrections = self.edits(word) & self.words
+        corrections.discard(word)
+        return corrections
+    
+    def fuzzy_match(self, key):
+        """The one customer a single typo away (e.g. "Jonh Smith"); None when there is none or several"""
+        if len(key) < self.FUZZY_MIN_LENGTH:
+            return None
+        words = key.split()
+        matches = {}
+        for position, word in enumerate(words):
+            for correction in self.corrections(word):
+                candidate = ' '.join(words[:position] + [correction] + words[position + 1:])
+                if candidate in self.ids_by_key:
+                    matches[self.ids_by_key[candidate]] = candidate
+        return next(iter(matches.values())) if len(matches) == 1 else None
+    
+    def lookup(self, name):
+        """(Customer_ID, Customer_Name, 'exact'/'prefix'/'fuzzy') of the existing customer a name refers to, or None"""
+        key = self.key(name)
+        if key is None:
+            return None
+        if key in self.ids_by_key:
+            match, match_type = key, 'exact'
+        else:
+            match, match_type = self.prefix_match(key), 'prefix'
+            if match is None:
+                match, match_type = self.fuzzy_match(key), 'fuzzy'
+        if match is None:
+            return None
+        return self.ids_by_key[match], self.names_by_key[match], match_type
+    
+    def __len__(self):
+        return len(self.ids_by_key)
+
+class LedgerIndex:
+    """Customer journeys and names keyed by Customer_ID, built in one pass and extended in O(1) per appended row"""
+    
+    def __init__(self):
+        # No customer -> rows or month/week -> rows lists are kept: the journey holds everything the replies say
+        # about a customer, and PeriodRollups serves the month and week totals. A query that needs raw rows
+        # should file them here in add_operation/add_revenue so appended rows keep them current.
+        # total_spent counts each Revenue row once (the old join added it once per Operations row)
+        self.customer_journey = {}
+        # Revenue rows whose customer has no Operations row yet, folded in when the first one arrives
+        self.unmatched_revenue = {}
+        self.customers = CustomerIndex()
+    
+    def add_operation(self, op):
+        """Extend the customer's journey with one Operations row"""
+        customer_id = op['Customer_ID']
+        self.customers.add(customer_id, op['Customer_Name'])
+        
+        journey = self.customer_journey.get(customer_id)
+        if journey is None:
+            previous_revenue = self.unmatched_revenue.pop(customer_id, [])
+            journey = self.customer_journey[customer_id] = {
+                'name': op['Customer_Name'],
+                'services_completed': 0,
+                'total_spent': sum(rev['Amount'] for rev in previous_revenue),
+                'last_service_date': None,
+                'service_types': [],
+                'payment_methods': [rev['Payment_Method'] for rev in previous_revenue],
+                'notes': []
+            }
+        journey['services_completed'] += 1
+        journey['service_types'].append(op['Service_Type'])
+        journey['notes'].append(op['Notes'])
+        journey['last_service_date'] = op['Service_Date']
+    
+    def add_revenue(self, rev):
+        """Add one Revenue row to the customer's spend"""
+        customer_id = rev['Customer_id']
+        journey = self.customer_journey.get(customer_id)
+        if journey is None:
+            self.unmatched_revenue.setdefault(customer_id, []).append(rev)
+            return
+        journey['total_spent'] += rev['Amount']
+        journey['payment_methods'].append(rev['Payment_Method'])
+    
+    def add_customer_summary(self, customer):
+        """Start or extend a customer's journey from their archived history"""
+        self.customers.add(customer['Customer_ID'], customer['Customer_Name'])
+        journey = self.customer_journey.get(customer['Customer_ID'])
+        if journey is None:
+            journey = self.customer_journey[customer['Customer_ID']] = {
+                'name': customer['Customer_Name'], 'services_completed': 0, 'total_spent': 0,
+                'last_service_date': None, 'service_types': [], 'payment_methods': [], 'notes': []
+            }
+        journey['services_completed'] += customer['Services']
+        journey['total_spent'] += customer['Total_Spent']
+        journey['service_types'].extend(customer['Service_Types'])
+        if journey['last_service_date'] is None:
+            journey['last_service_date'] = customer['Last_Service_Date']
+
+class PeriodRollups:
+    """Revenue and expense totals per (year, month, week) and per month, kept current as rows are appended"""
+    
+    def __init__(self, week_of_month):
+        self.week_of_month = week_of_month
+        self.buckets = {}
+        self.years_by_month = {}
+    
+    @staticmethod
+    def empty_bucket():
+        """Totals for a period with nothing recorded"""
+        return {'revenue': 0, 'paid_revenue': 0, 'services': 0, 'expenses': 0, 'operations': 0, 'completed': 0,
+                'by_service': {}, 'by_payment_status': {}, 'by_category': {}}
+    
+    def period_buckets(self, day, month, week):
+        """The week bucket and the month bucket a row falls into"""
+        return self.year_buckets(day.year if hasattr(day, 'year') else None, month, week)
+    
+    def year_buckets(self, year, month, week):
+        """The week and month buckets for a year, month name and week number"""
+        if year is not None:
+            self.years_by_month.setdefault(month, set()).add(year)
+        buckets = []
+        for key in ((year, month, week), (year, month, None)):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = self.empty_bucket()
+            buckets.append(bucket)
+        return buckets
+    
+    def add_operation(self, op):
+        """Count one Operations row and whether it was completed"""
+        for bucket in self.period_buckets(op['Service_Date'], op['Month'], op['Week_Number']):
+            bucket['operations'] += 1
+            if op['Service_Completed'] == 'Yes':
+                bucket['completed'] += 1
+    
+    def add_revenue(self, rev):
+        """Add one Revenue row to its period, service and payment status"""
+        amount = rev['Amount']
+        status = rev['Payment_Status']
+        for bucket in self.period_buckets(rev['Service_Date'], rev['Month'], rev['Week_Number']):
+            bucket['revenue'] += amount
+            bucket['services'] += 1
+            if status == 'Paid':
+                bucket['paid_revenue'] += amount
+            service = bucket['by_service'].get(rev['Service_Type'])
+            if service is None:
+                service = bucket['by_service'][rev['Service_Type']] = {'revenue': 0, 'count': 0}
+            service['revenue'] += amount
+            service['count'] += 1
+            bucket['by_payment_status'][status] = bucket['by_payment_status'].get(status, 0) + amount
+    
+    def add_expense(self, exp):
+        """Add one Expenses row to its period and category"""
+        day = exp['Date']
+        week = self.week_of_month(day) if hasattr(day, 'day') else 1
+        amount = exp['Amount']
+        for bucket in self.period_buckets(day, exp['Month'], week):
+            bucket['expenses'] += amount
+            bucket['by_category'][exp['Category']] = bucket['by_category'].get(exp['Category'], 0) + amount
+    
+    def add_period_summary(self, summary):
+        """Add an archived Period_Summary row to its week and month"""
+        count = summary['Count']
+        amount = summary['Amount']
+        status = summary['Status']
+        for bucket in self.year_buckets(summary['Year'], summary['Month'], summary['Week_Number']):
+            if summary['Sheet'] == 'Operations':
+                bucket['operations'] += count
+                if status == 'Yes':
+                    bucket['completed'] += count
+            elif summary['Sheet'] == 'Revenue':
+                bucket['revenue'] += amount
+                bucket['services'] += count
+                if status == 'Paid':
+                    bucket['paid_revenue'] += amount
+                service = bucket['by_service'].get(summary['Group'])
+                if service is None:
+                    service = bucket['by_service'][summary['Group']] = {'revenue': 0, 'count': 0}
+                service['revenue'] += amount
+                service['count'] += count
+                bucket['by_payment_status'][status] = bucket['by_payment_status'].get(status, 0) + amount
+            elif summary['Sheet'] == 'Expenses':
+                bucket['expenses'] += amount
+                bucket['by_category'][summary['Group']] = bucket['by_category'].get(summary['Group'], 0) + amount
+    
+    def period(self, year, month, week=None):
+        """Totals for one week of a month, or the whole month when week is None"""
+        return self.buckets.get((year, month, week)) or self.empty_bucket()
+    
+    def latest_year(self, month, not_after):
+        """Most recent year with rows for a month, for questions that name the month only"""
+        years = [year for year in self.years_by_month.get(month, ()) if year <= not_after]
+        return max(years) if years else not_after
+
+class WriteJournal:
+    """Append-only, fsynced log of sheet rows that have not reached Google Drive yet"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = []
+        self.next_seq = 1
+        self.load()
+    
+    def encode_value(self, value):
+        """Make a cell value JSON-safe"""
+        if isinstance(value, datetime):
+            return {'datetime': value.isoformat()}
+        if hasattr(value, 'isoformat'):
+            return {'date': value.isoformat()}
+        return value
+    
+    def decode_value(self, value):
+        """Restore a cell value written by encode_value"""
+        if isinstance(value, dict) and 'datetime' in value:
+            return datetime.fromisoformat(value['datetime'])
+        if isinstance(value, dict) and 'date' in value:
+            return datetime.fromisoformat(value['date']).date()
+        return value
+    
+    def load(self):
+        """Read entries left behind by a previous process"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping torn write journal line in {self.path}")
+                    continue
+                entry['rows'] = [(sheet_name, tuple(self.decode_value(v) for v in values))
+                                 for sheet_name, values in entry['rows']]
+                self.pending.append(entry)
+                self.next_seq = max(self.next_seq, entry['seq'] + 1)
+        if self.pending:
+            logger.info(f"Recovered {len(self.pending)} unflushed writes from {self.path}")
+    
+    def append(self, rows):
+        """Durably log one record's rows and return its journal entry"""
+        with self.lock:
+            entry = {
+                'seq': self.next_seq,
+                'keys': [row[0] for sheet_name, row in rows if sheet_name in ('Revenue', 'Expenses')],
+                'rows': list(rows)
+            }
+            line = json.dumps(dict(entry, rows=[(sheet_name, [self.encode_value(v) for v in row])
+                                                for sheet_name, row in rows]))
+            with open(self.path, 'a', encoding='utf-8') as journal_file:
+                journal_file.write(line + '\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            self.pending.append(entry)
+            self.next_seq += 1
+            return entry
+    
+    def pending_entries(self):
+        """Entries not yet uploaded, oldest first"""
+        with self.lock:
+            return list(self.pending)
+    
+    def mark_flushed(self, seq):
+        """Drop entries up to seq and atomically rewrite the journal with the rest"""
+        with self.lock:
+            self.pending = [entry for entry in self.pending if entry['seq'] > seq]
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as journal_file:
+                for entry in self.pending:
+                    journal_file.write(json.dumps(dict(entry, rows=[(sheet_name, [self.encode_value(v) for v in row])
+                                                                    for sheet_name, row in entry['rows']])) + '\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            os.replace(temp_path, self.path)
+
+class MonthArchive:
+    """Closed months' rows, one workbook per (year, month), kept in a local directory or a Google Drive folder"""
+    
+    def __init__(self, assistant, storage, directory, folder_id, prefix):
+        self.assistant = assistant
+        self.storage = storage
+        self.directory = directory
+        self.folder_id = folder_id
+        self.prefix = prefix
+    
+    def name(self, year, month):
+        """File name of a month's archive, e.g. business-archive-2024-03.xlsx"""
+        return f"{self.prefix}-{year}-{month:02d}.xlsx"
+    
+    def path(self, year, month):
+        """Local path of a month's archive"""
+        return os.path.join(self.directory, self.name(year, month))
+    
+    def load(self, year, month):
+        """(content, Drive file id) of an existing archive; content is None when there is none yet"""
+        if self.storage == 'drive':
+            file_id = self.assistant.find_drive_file(self.name(year, month), self.folder_id)
+            if not file_id:
+                return None, None
+            content = self.assistant.download_workbook_content(file_id)
+            if content is None:
+                raise IOError(f"could not download {self.name(year, month)}")
+            return content, file_id
+        if not os.path.exists(self.path(year, month)):
+            return None, None
+        with open(self.path(year, month), 'rb') as archive_file:
+            return archive_file.read(), None
+    
+    def store(self, year, month, rows_by_sheet):
+        """Add a month's rows to its archive; rows it already holds are skipped, so a retried archive run is harmless"""
+        content, file_id = self.load(year, month)
+        if content:
+            workbook = openpyxl.load_workbook(io.BytesIO(content))
+        else:
+            workbook = openpyxl.Workbook()
+            workbook.remove(workbook.active)
+            for sheet_name, columns in SHEET_COLUMNS.items():
+                workbook.create_sheet(sheet_name).append(columns)
+        
+        for sheet_name, rows in rows_by_sheet.items():
+            sheet = workbook[sheet_name]
+            existing = set(sheet.iter_rows(min_row=2, max_col=len(SHEET_COLUMNS[sheet_name]), values_only=True))
+            for row in rows:
+                if tuple(row) not in existing:
+                    sheet.append(list(row))
+        
+        output = io.BytesIO()
+        workbook.save(output)
+        if self.storage == 'drive':
+            if file_id:
+                return self.assistant.upload_workbook_content(output.getvalue(), file_id) is not None
+            return self.assistant.create_drive_file(self.name(year, month), output.getvalue(), self.folder_id) is not None
+        
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self.path(year, month) + '.tmp'
+        with open(temporary_path, 'wb') as archive_file:
+            archive_file.write(output.getvalue())
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+        os.replace(temporary_path, self.path(year, month))
+        return True
+
+class IdAllocator:
+    """Atomic CW/REV/EXP sequences, seeded from loaded data instead of rescanning the workbook"""
+    
+    ID_PATTERN = re.compile(r'^([A-Z]+)(\d+)$')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_numbers = {}
+    
+    def observe_number(self, prefix, number):
+        """Never hand out a number at or below one already in use"""
+        with self.lock:
+            if number > self.last_numbers.get(prefix, 0):
+                self.last_numbers[prefix] = number
+    
+    def observe(self, identifier):
+        """Record an existing ID such as CW012 or REV104"""
+        match = self.ID_PATTERN.match(str(identifier or ''))
+        if match:
+            self.observe_number(match.group(1), int(match.group(2)))
+    
+    def prefix_of(self, identifier):
+        """Letter prefix of an ID"""
+        match = self.ID_PATTERN.match(str(identifier or ''))
+        return match.group(1) if match else None
+    
+    def number_of(self, identifier):
+        """Sequence number of an ID, 0 if it has none"""
+        match = self.ID_PATTERN.match(str(identifier or ''))
+        return int(match.group(2)) if match else 0
+    
+    def allocate(self, prefix):
+        """Next ID for a prefix, unique within this process"""
+        with self.lock:
+            number = self.last_numbers.get(prefix, 0) + 1
+            self.last_numbers[prefix] = number
+        return f"{prefix}{str(number).zfill(3)}"
+    
+    def allocate_block(self, prefix, count):
+        """`count` consecutive IDs for a prefix, reserved under one lock acquisition"""
+        with self.lock:
+            first = self.last_numbers.get(prefix, 0) + 1
+            self.last_numbers[prefix] = first + count - 1
+        return [f"{prefix}{str(number).zfill(3)}" for number in range(first, first + count)]
+
+class MessageExtractor:
+    """Routing and extraction vocabularies compiled once and matched in a single pass"""
+    
+    # Vocabulary -> group -> keywords; the first group in order wins, as in the original scans
+    VOCABULARIES = {
+        'service_type': {
+            'Basic Wash': ['basic', 'simple', 'quick wash', 'standard', 'normal'],
+            'Full Wash': ['full', 'complete', 'comprehensive', 'thorough'],
+            'Premium Wash': ['premium', 'deluxe', 'luxury', 'detailed', 'top service'],
+            'Interior Only': ['interior', 'inside', 'cabin clean', 'inside only']
+        },
+        'payment_method': {
+            'Cash': ['cash', 'notes', 'money'],
+            'Card': ['card', 'swipe', 'tap'],
+            'EFT': ['eft', 'transfer', 'bank transfer', 'online']
+        },
+        'payment_status': {
+            'Unpaid': ['unpaid', 'owes', 'later', 'credit']
+        },
+        'category': {
+            'Supplies': ['soap', 'chemical', 'detergent', 'wax', 'towel', 'bucket', 'supplies', 'cleaning', 'brushes'],
+            'Equipment': ['hose', 'machine', 'vacuum', 'pressure', 'equipment', 'tool', 'replacement'],
+            'Utilities': ['water', 'electricity', 'power', 'utility', 'bill'],
+            'Staff': ['salary', 'wage', 'pay', 'employee', 'worker', 'staff'],
+            'Marketing': ['advert', 'marketing', 'promotion', 'flyer', 'social media'],
+            'Fuel': ['petrol', 'diesel', 'fuel', 'gas'],
+            'Maintenance': ['repair', 'fix', 'service', 'maintenance', 'upkeep']
+        },
+        'expense_indicator': {'expense': ['paid', 'bought', 'spent', 'cost', 'expense', 'bill', 'salary']},
+        'service_indicator': {'service': ['served', 'customer', 'wash', 'service', 'finished', 'completed']},
+        'party': {'customer': ['customer', 'client']},
+        'report': {'report': ['business', 'report', 'numbers', 'performance']},
+        'cash_flow': {'cash_flow': ['cash flow']},
+        'income_statement': {'income_statement': ['income statement', 'profit and loss']},
+        'question': {'explain': ['what is', 'explain']},
+        'explain_term': {'explain': ['profit', 'loss', 'revenue', 'margin']},
+        'finance_term': {term: [term] for term in ['profit', 'loss', 'revenue', 'income', 'expenses', 'cash flow', 'margin']},
+        'period_cue': {'period': ['week', 'month', 'jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']},
+        'period_metric': {'period': ['compare', 'how did', 'how was', 'how were', 'how much', 'versus', 'vs', 'revenue', 'profit',
+                                     'sales', 'expense', 'income', 'made', 'earn', 'spen', 'summary']}
+    }
+    
+    AMOUNT_PATTERNS = [
+        re.compile(r'[rR]\s*(\d+(?:,\d+)*(?:\.\d{2})?)'),
+        re.compile(r'(\d+(?:,\d+)*(?:\.\d{2})?)\s*rand'),
+        re.compile(r'\b(\d+(?:,\d+)*(?:\.\d{2})?)\b'),
+    ]
+    
+    # Each pattern with the keywords it cannot match without; the scan lets us skip the regex
+    CUSTOMER_PATTERNS = [
+        (re.compile(r'(?:customer|client|for|served)\s+([A-Za-z]+(?:\s+[A-Za-z]+)?)', re.IGNORECASE),
+         ['customer', 'client', 'for', 'served']),
+        (re.compile(r'([A-Za-z]+(?:\s+[A-Za-z]+)?)(?:\s+came|paid|wants)', re.IGNORECASE),
+         ['came', 'paid', 'wants']),
+        (re.compile(r'(?:mr|mrs|ms)\.?\s+([A-Za-z]+)', re.IGNORECASE),
+         ['mr', 'ms']),
+    ]
+    
+    EXCLUDED_NAMES = {'Service', 'Wash', 'Customer', 'Full', 'Basic', 'Premium', 'Interior', 'Cash', 'Card'}
+    
+    SUPPLIER_PATTERNS = [
+        (re.compile(r'(?:paid|pay|from|to|bought from|purchased from)\s+([A-Za-z][A-Za-z\s]+?)(?:\s|$|for|,|\d)', re.IGNORECASE),
+         ['paid', 'pay', 'from', 'to']),
+        (re.compile(r'([A-Za-z][A-Za-z\s]+(?:suppliers?|store|shop|company|ltd|pty|co))', re.IGNORECASE),
+         ['supplier', 'store', 'shop', 'ltd', 'pty', 'co']),
+        (re.compile(r'(?:supplier|vendor):\s*([A-Za-z][A-Za-z\s]+)', re.IGNORECASE),
+         ['supplier', 'vendor']),
+    ]
+    
+    WHITESPACE_PATTERN = re.compile(r'\s+')
+    DIGIT_PATTERN = re.compile(r'\d')
+    
+    MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+                   'August', 'September', 'October', 'November', 'December']
+    MONTH_ALIASES = dict([(name.lower(), name) for name in MONTH_NAMES] +
+                         [(name[:3].lower(), name) for name in MONTH_NAMES] + [('sept', 'September')])
+    MONTH_REGEX = '|'.join(sorted(MONTH_ALIASES, key=len, reverse=True))
+    
+    # "week 2 of March", "March 2024 week 2", "week 1", "this week", "last month"
+    PERIOD_PATTERN = re.compile(
+        rf'\b(?:week\s*(?P<week>[1-5])(?:\s+(?:of|in)\s+(?P<week_month>{MONTH_REGEX})(?:\s+(?P<week_year>\d{{4}}))?)?'
+        rf'|(?P<month>{MONTH_REGEX})(?:\s+(?P<year>\d{{4}}))?(?:,?\s+week\s*(?P<month_week>[1-5]))?'
+        rf'|(?P<relative>this|last|previous)\s+(?P<unit>week|month))\b')
+    
+    # Routes that answer for a period when the message names one
+    PERIOD_ROUTES = ('report', 'cash_flow', 'income_statement', 'period')
+    
+    # Lines of a multi-line message (or CSV rows) that are logged in one batch
+    BULK_ROUTES = ('service', 'expense')
+    
+    # CSV header (lowercased, spaces as underscores) -> record field
+    CSV_COLUMNS = {
+        'type': 'kind', 'record_type': 'kind', 'message': 'message', 'text': 'message',
+        'customer': 'customer_name', 'customer_name': 'customer_name', 'name': 'customer_name',
+        'service': 'service_type', 'service_type': 'service_type', 'amount': 'amount',
+        'payment_method': 'payment_method', 'method': 'payment_method',
+        'payment_status': 'payment_status', 'status': 'payment_status',
+        'supplier': 'supplier', 'paid_to': 'supplier', 'category': 'category', 'description': 'description'
+    }
+    
+    def __init__(self, service_prices):
+        self.service_prices = service_prices
+        vocabularies = dict(self.VOCABULARIES)
+        for number, (pattern, cues) in enumerate(self.CUSTOMER_PATTERNS):
+            vocabularies[('customer_pattern', number)] = {'cue': cues}
+        for number, (pattern, cues) in enumerate(self.SUPPLIER_PATTERNS):
+            vocabularies[('supplier_pattern', number)] = {'cue': cues}
+        
+        keyword_ranks = {}
+        for vocabulary, groups in vocabularies.items():
+            for rank, (group, keywords) in enumerate(groups.items()):
+                for keyword in keywords:
+                    ranks = keyword_ranks.setdefault(keyword, {})
+                    if rank < ranks.get(vocabulary, (rank + 1,))[0]:
+                        ranks[vocabulary] = (rank, group)
+        
+        # The pattern reports only the longest keyword at each position, so credit
+        # it with every shorter keyword that is a prefix of it
+        self.keyword_hits = {}
+        for keyword in keyword_ranks:
+            hits = {}
+            for prefix, ranks in keyword_ranks.items():
+                if keyword.startswith(prefix):
+                    for vocabulary, ranked_group in ranks.items():
+                        hits[vocabulary] = min(ranked_group, hits.get(vocabulary, ranked_group))
+            self.keyword_hits[keyword] = list(hits.items())
+        
+        # Cheap first-character test, then a trie-shaped alternation that prefers the longest keyword
+        first_chars = re.escape(''.join(sorted({keyword[0] for keyword in keyword_ranks})))
+        self.keyword_pattern = re.compile(f'(?=[{first_chars}])(?=({self.trie_regex(keyword_ranks)}))')
+    
+    @staticmethod
+    def trie_regex(keywords):
+        """Regex alternation factored by shared prefixes"""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        
+        def build(node):
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            return f'(?:{body})?' if '' in node else body
+        
+        return build(trie)
+    
+    def scan(self, message):
+        """One pass over the message: the winning group of every vocabulary present"""
+        best = {}
+        for keyword in self.keyword_pattern.findall(message.lower()):
+            for vocabulary, ranked_group in self.keyword_hits[keyword]:
+                if vocabulary not in best or ranked_group < best[vocabulary]:
+                    best[vocabulary] = ranked_group
+        return {vocabulary: group for vocabulary, (rank, group) in best.items()}
+    
+    def extract_periods(self, message, found=None):
+        """Periods named in a message, in order, with the spans they cover"""
+        found = self.scan(message) if found is None else found
+        if 'period_cue' not in found:
+            return [], []
+        message_lower = message.lower()
+        periods, spans = [], []
+        for match in self.PERIOD_PATTERN.finditer(message_lower):
+            if match.group('relative'):
+                periods.append(('relative', 'this' if match.group('relative') == 'this' else 'last', match.group('unit')))
+            elif match.group('week'):
+                month = match.group('week_month')
+                year = match.group('week_year')
+                periods.append(('month', self.MONTH_ALIASES[month] if month else None,
+                                int(year) if year else None, int(match.group('week'))))
+            else:
+                month, year, week = match.group('month', 'year', 'month_week')
+                # "may" is usually the verb unless a year, a week or a preposition pins it down
+                if month == 'may' and not (year or week or message_lower[:match.start()].split()[-1:] in (['in'], ['of'], ['for'])):
+                    continue
+                periods.append(('month', self.MONTH_ALIASES[month], int(year) if year else None, int(week) if week else None))
+            spans.append(match.span())
+        return periods, spans
+    
+    def route(self, message, found=None, spans=None):
+        """Intent route for a message, same precedence as the original indicator rules"""
+        found = self.scan(message) if found is None else found
+        if spans is None:
+            periods, spans = self.extract_periods(message, found)
+        
+        # Digits inside "week 2" or "March 2024" are not amounts
+        text = message
+        for start, end in reversed(spans):
+            text = text[:start] + ' ' + text[end:]
+        has_digit = self.DIGIT_PATTERN.search(text) is not None
+        
+        if 'expense_indicator' in found and 'service_indicator' not in found and has_digit:
+            return 'expense'
+        elif 'service_indicator' in found and has_digit and 'party' in found:
+            return 'service'
+        elif 'report' in found:
+            return 'report'
+        elif 'cash_flow' in found:
+            return 'cash_flow'
+        elif 'income_statement' in found:
+            return 'income_statement'
+        elif 'question' in found and 'explain_term' in found:
+            return 'explain'
+        elif spans and 'period_metric' in found:
+            return 'period'
+        return 'conversation'
+    
+    def extract_amount(self, message):
+        """Largest amount from the first amount pattern that matches"""
+        if not self.DIGIT_PATTERN.search(message):
+            return None
+        for pattern in self.AMOUNT_PATTERNS:
+            matches = pattern.findall(message)
+            if matches:
+                try:
+                    return max(float(match.replace(',', '')) for match in matches)
+                except ValueError:
+                    continue
+        return None
+    
+    def extract_service(self, message, found=None):
+        """Customer name, service type, amount, payment method and status"""
+        found = self.scan(message) if found is None else found
+        service_type = found.get('service_type')
+        
+        customer_name = None
+        for number, (pattern, cues) in enumerate(self.CUSTOMER_PATTERNS):
+            match = ('customer_pattern', number) in found and pattern.search(message)
+            if match:
+                potential_name = match.group(1).strip().title()
+                if potential_name not in self.EXCLUDED_NAMES:
+                    customer_name = potential_name
+                    break
+        
+        # Smart amount suggestion
+        amount = self.extract_amount(message)
+        if not amount and service_type and service_type in self.service_prices:
+            amount = self.service_prices[service_type]
+        
+        return {
+            'customer_name': customer_name,
+            'service_type': service_type,
+            'amount': amount,
+            'payment_method': found.get('payment_method', 'Cash'),
+            'payment_status': 'Unpaid' if 'payment_status' in found else 'Paid'
+        }
+    
+    def extract_expense(self, message, found=None):
+        """Amount, supplier and category of an expense"""
+        found = self.scan(message) if found is None else found
+        
+        supplier = None
+        for number, (pattern, cues) in enumerate(self.SUPPLIER_PATTERNS):
+            match = ('supplier_pattern', number) in found and pattern.search(message)
+            if match:
+                potential_supplier = self.WHITESPACE_PATTERN.sub(' ', match.group(1).strip())
+                if len(potential_supplier) > 1 and not potential_supplier.isdigit():
+                    supplier = potential_supplier
+                    break
+        
+        return {
+            'amount': self.extract_amount(message),
+            'supplier': supplier,
+            'category': found.get('category', 'Other'),
+            'description': message[:100].strip()
+        }
+    
+    def parse(self, message):
+        """Route plus extracted fields for one message, from a single keyword scan"""
+        if '\n' in message:
+            bulk = self.parse_bulk(message)
+            if bulk:
+                return {'message': message, 'route': 'bulk', **bulk}
+        
+        found = self.scan(message)
+        periods, spans = self.extract_periods(message, found)
+        route = self.route(message, found, spans)
+        parsed = {'message': message, 'route': route}
+        if periods and route in self.PERIOD_ROUTES:
+            parsed['periods'] = periods
+        if route == 'service':
+            parsed['service'] = self.extract_service(message, found)
+        elif route == 'expense':
+            parsed['expense'] = self.extract_expense(message, found)
+        elif route == 'explain':
+            parsed['finance_term'] = found.get('finance_term')
+        return parsed
+    
+    def parse_bulk(self, message):
+        """Service and expense records from a multi-line message; None unless at least two lines are records"""
+        lines = [line.strip() for line in message.splitlines()]
+        records = []
+        skipped = []
+        for number, line in enumerate(lines, 1):
+            if not line:
+                continue
+            parsed = self.parse(line)
+            if parsed['route'] in self.BULK_ROUTES:
+                records.append({'line': number, 'text': line, 'kind': parsed['route'], 'info': parsed[parsed['route']]})
+            else:
+                skipped.append({'line': number, 'text': line})
+        if len(records) < 2:
+            return None
+        return {'records': records, 'skipped': skipped}
+    
+    def parse_csv(self, text):
+        """Records from CSV rows: explicit columns win, the rest is extracted from the row's text"""
+        records = []
+        skipped = []
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            # The header is line 1, and a quoted cell may span lines
+            number = reader.line_num
+            fields = {}
+            for column, value in row.items():
+                field = self.CSV_COLUMNS.get(str(column or '').strip().lower().replace(' ', '_'))
+                if field and isinstance(value, str) and value.strip():
+                    fields[field] = value.strip()
+            line = fields.get('message') or ' '.join(value.strip() for value in row.values()
+                                                     if isinstance(value, str) and value.strip())
+            if not line:
+                continue
+            
+            kind = fields.get('kind', '').lower()
+            if kind not in self.BULK_ROUTES:
+                if 'supplier' in fields or 'category' in fields:
+                    kind = 'expense'
+                elif 'customer_name' in fields or 'service_type' in fields:
+                    kind = 'service'
+                else:
+                    kind = self.parse(line)['route']
+            if kind not in self.BULK_ROUTES:
+                skipped.append({'line': number, 'text': line})
+                continue
+            
+            info = self.extract_service(line) if kind == 'service' else self.extract_expense(line)
+            if 'amount' in fields:
+                info['amount'] = self.extract_amount(fields['amount'])
+            if kind == 'service':
+                if 'customer_name' in fields:
+                    info['customer_name'] = fields['customer_name'].title()
+                if 'service_type' in fields:
+                    info['service_type'] = self.scan(fields['service_type']).get('service_type',
+                                                                                 fields['service_type'].title())
+                if 'payment_method' in fields:
+                    info['payment_method'] = self.scan(fields['payment_method']).get('payment_method',
+                                                                                     fields['payment_method'].title())
+                if 'payment_status' in fields:
+                    unpaid = 'payment_status' in self.scan(fields['payment_status']) or fields['payment_status'].lower() in ('no', 'not paid', 'owing')
+                    info['payment_status'] = 'Unpaid' if unpaid else 'Paid'
+                if not info['amount'] and info['service_type'] in self.service_prices:
+                    info['amount'] = self.service_prices[info['service_type']]
+            else:
+                if 'supplier' in fields:
+                    info['supplier'] = fields['supplier']
+                if 'category' in fields:
+                    info['category'] = self.scan(fields['category']).get('category', fields['category'].title())
+                if 'description' in fields:
+                    info['description'] = fields['description'][:100]
+            records.append({'line': number, 'text': line, 'kind': kind, 'info': info})
+        return {'records': records, 'skipped': skipped}
+    
+    def parse_batch(self, messages):
+        """Parse historical messages in bulk, e.g. for a ledger backfill"""
+        return [self.parse(message) for message in messages]
+
+class ResponseCache:
+    """Bounded LRU of Claude replies with a TTL, counting hits and the tokens they saved"""
+    
+    NORMALIZE_PATTERN = re.compile(r"[^a-z0-9 ]+")
+    
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0,
+                         'saved_input_tokens': 0, 'saved_output_tokens': 0,
+                         'prompt_cache_read_tokens': 0, 'prompt_cache_write_tokens': 0}
+    
+    @classmethod
+    def normalize(cls, message):
+        """Case, punctuation and spacing-insensitive form of a message"""
+        return ' '.join(cls.NORMALIZE_PATTERN.sub('', message.lower()).split())
+    
+    def get(self, key):
+        """Cached reply for a key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() - entry['stored_at'] > self.ttl_seconds:
+                del self.entries[key]
+                self.counters['expired'] += 1
+                entry = None
+            if not entry:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            self.counters['saved_input_tokens'] += entry['input_tokens']
+            self.counters['saved_output_tokens'] += entry['output_tokens']
+            return entry['reply']
+    
+    def put(self, key, reply, usage=None):
+        """Store a reply with the token usage a repeat would have cost"""
+        if self.max_entries <= 0:
+            return
+        input_tokens = getattr(usage, 'input_tokens', 0) or 0
+        with self.lock:
+            # Prompt-cache tokens are billed separately from input_tokens
+            cache_read = getattr(usage, 'cache_read_input_tokens', 0) or 0
+            cache_write = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+            self.counters['prompt_cache_read_tokens'] += cache_read
+            self.counters['prompt_cache_write_tokens'] += cache_write
+            self.entries[key] = {'reply': reply, 'stored_at': time.monotonic(),
+                                 'input_tokens': input_tokens + cache_read + cache_write,
+                                 'output_tokens': getattr(usage, 'output_tokens', 0) or 0}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+    
+    def stats(self):
+        """Hit rate, size and token savings"""
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return dict(self.counters, entries=len(self.entries),
+                        hit_rate=round(self.counters['hits'] / lookups, 3) if lookups else 0.0)
+
+class ConversationTurn:
+    """One message in a conversation; epoch-second timestamp instead of a datetime"""
+    
+    __slots__ = ('role', 'text', 'timestamp')
+    
+    def __init__(self, role, text, timestamp):
+        self.role = role
+        self.text = text
+        self.timestamp = timestamp
+
+class Conversation:
+    """Recent turns for one phone number"""
+    
+    __slots__ = ('turns', 'last_seen')
+    
+    def __init__(self, max_turns, turns=(), last_seen=0):
+        self.turns = deque(turns, maxlen=max_turns)
+        self.last_seen = last_seen
+
+class ConversationStore:
+    """Per-number turn cap, idle TTL and global LRU, with optional spill of evicted conversations to disk"""
+    
+    def __init__(self, max_turns, max_numbers, idle_ttl_seconds, spill_path=None):
+        self.max_turns = max_turns
+        self.max_numbers = max_numbers
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.lock = threading.Lock()
+        # Ordered by last activity, least recent first
+        self.conversations = OrderedDict()
+        self.counters = {'turns_dropped': 0, 'idle_evictions': 0, 'lru_evictions': 0,
+                         'spilled': 0, 'restored': 0}
+        self.spill = None
+        if spill_path:
+            self.spill = shelve.open(spill_path)
+            self.purge_spill()
+            atexit.register(self.close)
+    
+    def append(self, phone_number, role, text):
+        """Record a turn, evicting idle and least recently used conversations as needed"""
+        now = int(time.time())
+        with self.lock:
+            conversation = self.conversations.get(phone_number) or self.restore(phone_number)
+            if conversation is None:
+                conversation = Conversation(self.max_turns)
+            self.conversations[phone_number] = conversation
+            self.conversations.move_to_end(phone_number)
+            if len(conversation.turns) == self.max_turns:
+                self.counters['turns_dropped'] += 1
+            conversation.turns.append(ConversationTurn(role, text, now))
+            conversation.last_seen = now
+            self.evict(now)
+    
+    def history(self, phone_number):
+        """Turns kept for a number, oldest first"""
+        with self.lock:
+            conversation = self.conversations.get(phone_number) or self.restore(phone_number)
+            if conversation is None:
+                return []
+            self.conversations[phone_number] = conversation
+            self.evict(int(time.time()))
+            return list(conversation.turns)
+    
+    def evict(self, now):
+        """Drop idle conversations from the cold end, then spill beyond the size cap"""
+        while self.conversations:
+            phone_number, conversation = next(iter(self.conversations.items()))
+            if now - conversation.last_seen <= self.idle_ttl_seconds:
+                break
+            del self.conversations[phone_number]
+            self.counters['idle_evictions'] += 1
+        while len(self.conversations) > self.max_numbers:
+            phone_number, conversation = self.conversations.popitem(last=False)
+            self.counters['lru_evictions'] += 1
+            self.spill_conversation(phone_number, conversation)
+    
+    def spill_conversation(self, phone_number, conversation):
+        """Write an evicted conversation to the spill file, if one is configured"""
+        if self.spill is None:
+            return
+        self.spill[phone_number] = (conversation.last_seen,
+                                    [(turn.role, turn.text, turn.timestamp) for turn in conversation.turns])
+        self.counters['spilled'] += 1
+    
+    def restore(self, phone_number):
+        """Bring a spilled conversation back into memory, unless it has gone idle"""
+        if self.spill is None or phone_number not in self.spill:
+            return None
+        last_seen, turns = self.spill.pop(phone_number)
+        if int(time.time()) - last_seen > self.idle_ttl_seconds:
+            return None
+        self.counters['restored'] += 1
+        return Conversation(self.max_turns, (ConversationTurn(*turn) for turn in turns), last_seen)
+    
+    def purge_spill(self):
+        """Forget spilled conversations that went idle while the process was down"""
+        cutoff = int(time.time()) - self.idle_ttl_seconds
+        for phone_number in [key for key, (last_seen, turns) in self.spill.items() if last_seen < cutoff]:
+            del self.spill[phone_number]
+    
+    def close(self):
+        """Spill everything still in memory so a restart picks up where we left off"""
+        with self.lock:
+            if self.spill is None:
+                return
+            while self.conversations:
+                self.spill_conversation(*self.conversations.popitem(last=False))
+            self.spill.close()
+            self.spill = None
+    
+    def stats(self):
+        """Sizes, eviction counts and an estimate of the memory held by turns"""
+        with self.lock:
+            turns = [turn for conversation in self.conversations.values() for turn in conversation.turns]
+            footprint = sum(sys.getsizeof(turn) + sys.getsizeof(turn.text) for turn in turns)
+            footprint += sum(sys.getsizeof(conversation) + sys.getsizeof(conversation.turns)
+                             for conversation in self.conversations.values())
+            return dict(self.counters, numbers=len(self.conversations), turns=len(turns),
+                        approx_bytes=footprint, spill_enabled=self.spill is not None)
+
+class SQLiteLedger:
+    """Local SQLite copy of Operations, Revenue and Expenses, queried with SQL aggregates"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.customers = None
+        self.create_schema()
+    
+    def table_name(self, sheet_name):
+        """SQLite table backing a sheet"""
+        return sheet_name.lower()
+    
+    def create_schema(self):
+        """Create tables and the indexes the aggregate queries rely on"""
+        with self.lock, self.connection:
+            for sheet_name, columns in SHEET_COLUMNS.items():
+                column_sql = ', '.join(f"{column.lower()} {SQLITE_COLUMN_TYPES.get(column, 'TEXT')}" for column in columns)
+                self.connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table_name(sheet_name)} ({column_sql})")
+            self.connection.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_operations_customer ON operations(customer_id);
+                CREATE INDEX IF NOT EXISTS idx_operations_date ON operations(service_date);
+                CREATE INDEX IF NOT EXISTS idx_operations_period ON operations(month, week_number);
+                CREATE INDEX IF NOT EXISTS idx_revenue_customer ON revenue(customer_id);
+                CREATE INDEX IF NOT EXISTS idx_revenue_date ON revenue(service_date);
+                CREATE INDEX IF NOT EXISTS idx_revenue_period ON revenue(month, week_number);
+                CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+                CREATE INDEX IF NOT EXISTS idx_expenses_month ON expenses(month);
+                CREATE TABLE IF NOT EXISTS ledger_meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+            # Ledgers created before the import was recorded: rows mean the import already happened
+            if not self.is_imported() and any(
+                    self.connection.execute(f"SELECT 1 FROM {self.table_name(sheet_name)} LIMIT 1").fetchone()
+                    for sheet_name in SHEET_COLUMNS):
+                self.record_import()
+    
+    def to_sql(self, value):
+        """Store dates as ISO text"""
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+    
+    def from_sql(self, column, value):
+        """Turn ISO date text back into dates for the workbook export"""
+        if value and column in ('Service_Date', 'Date'):
+            try:
+                return datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return value
+        return value
+    
+    def is_imported(self):
+        """True once the workbook has been imported, even if it had no rows"""
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM ledger_meta WHERE key = 'imported_at'").fetchone() is not None
+    
+    def record_import(self):
+        """Mark the workbook import as done (caller commits)"""
+        self.connection.execute("INSERT OR REPLACE INTO ledger_meta VALUES ('imported_at', ?)",
+                                (datetime.now(timezone.utc).isoformat(),))
+    
+    def insert_row(self, sheet_name, row):
+        """Insert one sheet row (caller commits)"""
+        columns = SHEET_COLUMNS[sheet_name]
+        values = [self.to_sql(value) for value in list(row)[:len(columns)]]
+        values += [None] * (len(columns) - len(values))
+        with self.lock:
+            self.connection.execute(
+                f"INSERT INTO {self.table_name(sheet_name)} VALUES ({', '.join('?' * len(columns))})", values)
+            if sheet_name == 'Operations' and self.customers is not None:
+                self.customers.add(values[0], values[1])
+    
+    def commit(self):
+        """Commit pending inserts"""
+        with self.lock:
+            self.connection.commit()
+    
+    def rollback(self):
+        """Discard pending inserts, and the customer index that may have seen them"""
+        with self.lock:
+            self.connection.rollback()
+            self.customers = None
+    
+    def customer_index(self):
+        """CustomerIndex over Operations, built on first use and kept current by insert_row"""
+        with self.lock:
+            if self.customers is None:
+                customers = CustomerIndex()
+                for customer_id, customer_name in self.connection.execute(
+                        "SELECT customer_id, customer_name FROM operations ORDER BY rowid"):
+                    customers.add(customer_id, customer_name)
+                self.customers = customers
+            return self.customers
+    
+    def import_workbook(self, workbook):
+        """One-time import of the Excel workbook, replacing whatever the ledger holds"""
+        with self.lock, self.connection:
+            counts = {}
+            for sheet_name, columns in SHEET_COLUMNS.items():
+                table = self.table_name(sheet_name)
+                self.connection.execute(f"DELETE FROM {table}")
+                rows = [[self.to_sql(value) for value in (list(row) + [None] * len(columns))[:len(columns)]]
+                        for row in workbook[sheet_name].iter_rows(min_row=2, values_only=True) if row and row[0]]
+                self.connection.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows)
+                counts[sheet_name] = len(rows)
+            self.record_import()
+            self.customers = None
+        logger.info(f"Imported workbook into SQLite ledger: {counts}")
+        return counts
+    
+    def export_workbook(self):
+        """Build the Excel layout from the ledger"""
+        workbook = openpyxl.Workbook(write_only=True)
+        with self.lock:
+            for sheet_name, columns in SHEET_COLUMNS.items():
+                sheet = workbook.create_sheet(sheet_name)
+                sheet.append(columns)
+                for row in self.connection.execute(f"SELECT * FROM {self.table_name(sheet_name)} ORDER BY rowid"):
+                    sheet.append([self.from_sql(column, value) for column, value in zip(columns, row)])
+        return workbook
+    
+    def max_id_numbers(self):
+        """Highest CW/REV/EXP numbers in use, for seeding the ID allocator"""
+        with self.lock:
+            query = self.connection.execute
+            return {
+                'CW': query("SELECT COALESCE(MAX(CAST(SUBSTR(customer_id, 3) AS INTEGER)), 0) FROM operations "
+                            "WHERE customer_id LIKE 'CW%'").fetchone()[0],
+                'REV': max(query("SELECT COALESCE(MAX(CAST(SUBSTR(transaction_id, 4) AS INTEGER)), 0) FROM revenue "
+                                 "WHERE transaction_id LIKE 'REV%'").fetchone()[0],
+                           query("SELECT COALESCE(MAX(rowid), 0) FROM revenue").fetchone()[0]),
+                'EXP': max(query("SELECT COALESCE(MAX(CAST(SUBSTR(transaction_id, 4) AS INTEGER)), 0) FROM expenses "
+                                 "WHERE transaction_id LIKE 'EXP%'").fetchone()[0],
+                           query("SELECT COALESCE(MAX(rowid), 0) FROM expenses").fetchone()[0])
+            }
+    
+    def load_business_data(self):
+        """Business metrics computed with SQL aggregates, in the load_business_data shape"""
+        with self.lock:
+            query = self.connection.execute
+            total_revenue, paid_revenue = query(
+                "SELECT COALESCE(SUM(amount), 0), COALESCE(SUM(CASE WHEN payment_status = 'Paid' THEN amount END), 0) "
+                "FROM revenue").fetchone()
+            total_expenses = query("SELECT COALESCE(SUM(ABS(amount)), 0) FROM expenses").fetchone()[0]
+            
+            service_performance = {}
+            for service, revenue, count, customers in query(
+                    "SELECT service_type, COALESCE(SUM(amount), 0), COUNT(*), GROUP_CONCAT(DISTINCT customer_id) "
+                    "FROM revenue GROUP BY service_type"):
+                customer_list = customers.split(',') if customers else []
+                service_performance[service] = {'revenue': revenue, 'count': count,
+                                                'customers': customer_list, 'unique_customers': len(customer_list)}
+            
+            expense_analysis = dict(query(
+                "SELECT COALESCE(NULLIF(category, ''), 'Other'), SUM(ABS(COALESCE(amount, 0))) "
+                "FROM expenses GROUP BY 1").fetchall())
+            
+            operations_count, completed_services = query(
+                "SELECT COUNT(*), COALESCE(SUM(service_completed = 'Yes'), 0) FROM operations").fetchone()
+            total_customers, repeat_customers = query(
+                "SELECT COUNT(*), COALESCE(SUM(visits > 1), 0) FROM "
+                "(SELECT COUNT(*) AS visits FROM operations GROUP BY customer_id)").fetchone()
+        
+        net_profit = total_revenue - total_expenses
+        return {
+            'total_revenue': total_revenue, 'total_expenses': total_expenses,
+            'net_profit': net_profit,
+            'profit_margin': (net_profit / total_revenue * 100) if total_revenue > 0 else 0,
+            'service_performance': service_performance, 'expense_analysis': expense_analysis,
+            'completion_rate': (completed_services / operations_count * 100) if operations_count else 0,
+            'payment_rate': (paid_revenue / total_revenue * 100) if total_revenue > 0 else 0,
+            'paid_revenue': paid_revenue,
+            'total_customers': total_customers, 'repeat_customers': repeat_customers,
+            'operations_count': operations_count, 'rollups': self
+        }
+    
+    def period(self, year, month, week=None):
+        """Period totals in the PeriodRollups shape, from the (month, week_number) indexes"""
+        year = str(year)
+        revenue_filter = "month = ? AND SUBSTR(service_date, 1, 4) = ?" + (" AND week_number = ?" if week else "")
+        expense_filter = "month = ? AND SUBSTR(date, 1, 4) = ?" + (
+            " AND (CAST(SUBSTR(date, 9, 2) AS INTEGER) - 1) / 7 + 1 = ?" if week else "")
+        params = (month, year, week) if week else (month, year)
+        bucket = PeriodRollups.empty_bucket()
+        with self.lock:
+            query = self.connection.execute
+            for service, status, revenue, count in query(
+                    f"SELECT service_type, payment_status, COALESCE(SUM(amount), 0), COUNT(*) FROM revenue "
+                    f"WHERE {revenue_filter} GROUP BY 1, 2", params):
+                bucket['revenue'] += revenue
+                bucket['services'] += count
+                if status == 'Paid':
+                    bucket['paid_revenue'] += revenue
+                totals = bucket['by_service'].setdefault(service, {'revenue': 0, 'count': 0})
+                totals['revenue'] += revenue
+                totals['count'] += count
+                bucket['by_payment_status'][status] = bucket['by_payment_status'].get(status, 0) + revenue
+            bucket['by_category'] = dict(query(
+                f"SELECT COALESCE(NULLIF(category, ''), 'Other'), SUM(ABS(COALESCE(amount, 0))) FROM expenses "
+                f"WHERE {expense_filter} GROUP BY 1", params).fetchall())
+            bucket['expenses'] = sum(bucket['by_category'].values())
+            bucket['operations'], bucket['completed'] = query(
+                f"SELECT COUNT(*), COALESCE(SUM(service_completed = 'Yes'), 0) FROM operations "
+                f"WHERE {revenue_filter}", params).fetchone()
+        return bucket
+    
+    def latest_year(self, month, not_after):
+        """Most recent year with revenue for a month, for questions that name the month only"""
+        with self.lock:
+            year = self.connection.execute(
+                "SELECT MAX(SUBSTR(service_date, 1, 4)) FROM revenue WHERE month = ? AND SUBSTR(service_date, 1, 4) <= ?",
+                (month, str(not_after))).fetchone()[0]
+        return int(year) if year else not_after
+
+class BusinessDataContext:
+    """Workbook and business data for a single request, loaded and saved at most once"""
+    
+    def __init__(self, assistant):
+        self.assistant = assistant
+        self.snapshot = None
+        self.loaded = False
+        self.appended_rows = []
+        self.minted_ids = set()
+        self.id_map = {}
+    
+    def load(self):
+        """Load business data on first use and reuse it for the rest of the request"""
+        if not self.loaded:
+            self.snapshot = self.assistant.load_snapshot()
+            self.loaded = True
+        return self.snapshot['data'] if self.snapshot else None
+    
+    @property
+    def workbook(self):
+        """Open workbook that writes for this request go through"""
+        self.load()
+        return self.snapshot['workbook'] if self.snapshot else None
+    
+    def append_row(self, sheet_name, row):
+        """Write a row into the open workbook and remember it so commit can fold it into the totals"""
+        row = self.assistant.clean_row(row)
+        self.assistant.append_sheet_row(self.workbook, sheet_name, row)
+        self.appended_rows.append((sheet_name, tuple(row)))
+        self.assistant.data_changed()
+    
+    def allocate_id(self, prefix):
+        """Mint the next CW/REV/EXP ID for a row written in this request"""
+        self.load()
+        identifier = self.assistant.id_allocator.allocate(prefix)
+        self.minted_ids.add(identifier)
+        return identifier
+    
+    def allocate_ids(self, prefix, count):
+        """Mint a consecutive block of IDs for a batch of rows written in this request"""
+        self.load()
+        identifiers = self.assistant.id_allocator.allocate_block(prefix, count)
+        self.minted_ids.update(identifiers)
+        return identifiers
+    
+    def final_id(self, identifier):
+        """ID as actually saved, after any renumbering during a merge"""
+        return self.id_map.get(identifier, identifier)
+    
+    def discard(self):
+        """Forget this request's uncommitted rows; the next load in the request starts from a fresh copy"""
+        self.appended_rows = []
+        self.snapshot = None
+        self.loaded = False
+    
+    def customer_index(self):
+        """Customer names of the loaded snapshot, None if it could not be loaded"""
+        data = self.load()
+        return data['index'].customers if data else None
+    
+    def commit(self):
+        """Revision-checked upload of the workbook, merging and retrying if Drive moved underneath us"""
+        if self.assistant.journal:
+            revision = self.assistant.journal_appended_rows(self.snapshot, self.appended_rows)
+            self.appended_rows = []
+            return revision
+        for attempt in range(self.assistant.upload_attempts):
+            revision = self.assistant.save_workbook_if_unchanged(self.workbook, self.snapshot['revision'])
+            if revision is not False:
+                self.snapshot = self.assistant.refresh_snapshot(self.snapshot, revision, self.appended_rows)
+                self.appended_rows = []
+                return revision
+            logger.warning(f"Workbook changed on Google Drive during this request, merging (attempt {attempt + 1})")
+            if not self.rebase():
+                break
+        self.assistant.invalidate_snapshot()
+        return None
+    
+    def rebase(self):
+        """Replay this request's rows on the latest Drive revision, renumbering clashing IDs"""
+        self.assistant.invalidate_snapshot()
+        self.snapshot = self.assistant.load_snapshot()
+        if not self.snapshot:
+            return False
+        
+        existing_ids = self.assistant.existing_ids(self.snapshot['data'])
+        renumbered = {}
+        for identifier in sorted(self.minted_ids):
+            if identifier in existing_ids:
+                renumbered[identifier] = self.assistant.id_allocator.allocate(
+                    self.assistant.id_allocator.prefix_of(identifier))
+        for original, current in self.id_map.items():
+            self.id_map[original] = renumbered.get(current, current)
+        for identifier, replacement in renumbered.items():
+            self.id_map.setdefault(identifier, replacement)
+        self.minted_ids = {renumbered.get(identifier, identifier) for identifier in self.minted_ids}
+        
+        self.appended_rows = [(sheet_name, tuple(renumbered.get(value, value) if isinstance(value, str) else value
+                                                 for value in row))
+                              for sheet_name, row in self.appended_rows]
+        for sheet_name, row in self.appended_rows:
+            self.assistant.append_sheet_row(self.workbook, sheet_name, row)
+        return True
+
+class SQLiteDataContext(BusinessDataContext):
+    """Request context backed by the SQLite ledger instead of the Drive workbook"""
+    
+    def load(self):
+        """Query the ledger once for this request"""
+        if not self.loaded:
+            self.snapshot = {'data': self.assistant.load_ledger_data(), 'workbook': None}
+            self.loaded = True
+        return self.snapshot['data']
+    
+    def customer_index(self):
+        """Customer names in the ledger"""
+        return self.assistant.ledger.customer_index()
+    
+    def append_row(self, sheet_name, row):
+        """Insert a row into the ledger; it becomes visible on commit"""
+        row = self.assistant.clean_row(row)
+        self.assistant.ledger.insert_row(sheet_name, row)
+        self.appended_rows.append((sheet_name, tuple(row)))
+        self.assistant.data_changed()
+    
+    def commit(self):
+        """Commit the request's inserts and flag the Drive export as stale"""
+        self.assistant.ledger.commit()
+        self.assistant.export_pending.set()
+        self.appended_rows = []
+        self.loaded = False
+        return 'sqlite'
+
+class Metrics:
+    """Prometheus-format latency histograms and counters, cheap enough to leave on in production"""
+    
+    # Seconds; spans range from sub-millisecond parses to multi-second Drive uploads
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    
+    DESCRIPTIONS = {
+        'stage_duration_seconds': ('histogram', 'Time spent in each stage of handling a message'),
+        'webhook_stage_duration_seconds': ('histogram', 'Webhook worker pool queue wait, processing and send time'),
+        'routes_total': ('counter', 'Messages by the route they took'),
+        'claude_requests_total': ('counter', 'Messages answered by calling Claude or without it'),
+        'llm_cache_total': ('counter', 'Claude response cache lookups by result'),
+        'webhook_messages_total': ('counter', 'Webhook messages accepted, rejected, processed or failed'),
+        'outbound_stage_duration_seconds': ('histogram', 'Send queue wait, rate-limit wait and delivery time'),
+        'outbound_messages_total': ('counter', 'Outbound replies accepted, rejected, processed or failed by the send queue'),
+        'outbound_segments_total': ('counter', 'WhatsApp message segments sent, retried or failed'),
+        'customer_matches_total': ('counter', 'Logged customer names matched to an existing Customer_ID, by match type, or new'),
+        'digests_total': ('counter', 'Stored digests built, served, found stale or sent, by kind'),
+        'errors_total': ('counter', 'Errors by stage'),
+    }
+    
+    def __init__(self, namespace='cardetail', buckets=BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+    
+    def observe(self, name, seconds, **labels):
+        """Record one duration; bucket counts are kept per bucket and made cumulative on render"""
+        key = (name, tuple(sorted(labels.items())))
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[slot] += 1
+            histogram[-1] += seconds
+    
+    def increment(self, name, amount=1, **labels):
+        """Add to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    @contextmanager
+    def span(self, stage):
+        """Time a block as one stage; an exception escaping it also counts as an error for that stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment('errors_total', stage=stage)
+            raise
+        finally:
+            self.observe('stage_duration_seconds', time.perf_counter() - started, stage=stage)
+    
+    def label_text(self, labels, extra=()):
+        """{name="value",...} for a label tuple"""
+        pairs = [f'{key}="{str(value)}"' for key, value in tuple(labels) + tuple(extra)]
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+    
+    def render(self, gauges=None):
+        """Text exposition format 0.0.4; gauges maps name -> (help, value) for values sampled at scrape time"""
+        with self.lock:
+            histograms = {key: list(values) for key, values in self.histograms.items()}
+            counters = dict(self.counters)
+        
+        families = {}
+        for (name, labels), values in histograms.items():
+            families.setdefault(name, []).append((labels, values))
+        for (name, labels), value in counters.items():
+            families.setdefault(name, []).append((labels, value))
+        
+        lines = []
+        for name in sorted(families):
+            kind, description = self.DESCRIPTIONS.get(name, ('counter', name))
+            metric = f"{self.namespace}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, value in sorted(families[name], key=lambda item: item[0]):
+                if kind != 'histogram':
+                    lines.append(f"{metric}{self.label_text(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{self.label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_sum{self.label_text(labels)} {value[-1]:.6f}")
+                lines.append(f"{metric}_count{self.label_text(labels)} {cumulative}")
+        for name, (description, value) in sorted((gauges or {}).items()):
+            metric = f"{self.namespace}_{name}"
+            lines.extend([f"# HELP {metric} {description}", f"# TYPE {metric} gauge", f"{metric} {value}"])
+        return '\n'.join(lines) + '\n'
+
+class MessageDispatcher:
+    """Worker pool for queued messages: concurrent across senders, strictly ordered per sender, round-robin across groups"""
+    
+    def __init__(self, handler, workers, max_queue, metrics=None, name='webhook', max_group_queue=None):
+        self.handler = handler
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_group_queue = max_group_queue or max_queue
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.senders_ready = threading.Condition(self.lock)
+        # Ready senders per group (tenant); workers take one sender from each group in turn
+        self.ready_senders = {}
+        self.ready_groups = deque()
+        self.pending = {}
+        self.group_depth = {}
+        self.depth = 0
+        self.busy_workers = 0
+        self.threads = []
+        self.counters = {'accepted': 0, 'rejected': 0, 'processed': 0, 'failed': 0}
+        self.stage_timings = {}
+    
+    def start_workers(self):
+        """Spin up the pool on first use (caller holds the lock)"""
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self.work, name=f"{self.name}-worker-{len(self.threads) + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def submit(self, sender, message, group=None):
+        """Queue a message; False when the queue, or the sender's group share of it, is full"""
+        with self.lock:
+            if self.depth >= self.max_queue or self.group_depth.get(group, 0) >= self.max_group_queue:
+                self.counters['rejected'] += 1
+                self.count('rejected')
+                return False
+            self.start_workers()
+            sender_queue = self.pending.get(sender)
+            if sender_queue is None:
+                self.pending[sender] = deque([(message, time.monotonic(), group)])
+                self.mark_ready(sender, group)
+            else:
+                # Sender is already queued or being processed; its worker picks this up next
+                sender_queue.append((message, time.monotonic(), group))
+            self.group_depth[group] = self.group_depth.get(group, 0) + 1
+            self.depth += 1
+            self.counters['accepted'] += 1
+            self.count('accepted')
+            return True
+    
+    def mark_ready(self, sender, group):
+        """Put a sender in its group's ready line and wake a worker (caller holds the lock)"""
+        group_senders = self.ready_senders.get(group)
+        if group_senders is None:
+            group_senders = self.ready_senders[group] = deque()
+            self.ready_groups.append(group)
+        group_senders.append(sender)
+        self.senders_ready.notify()
+    
+    def next_sender(self):
+        """Block for the next ready sender, rotating through groups so a busy one can't starve the rest"""
+        with self.lock:
+            while not self.ready_groups:
+                self.senders_ready.wait()
+            group = self.ready_groups.popleft()
+            group_senders = self.ready_senders[group]
+            sender = group_senders.popleft()
+            if group_senders:
+                self.ready_groups.append(group)
+            else:
+                del self.ready_senders[group]
+            message, enqueued_at, group = self.pending[sender].popleft()
+            self.busy_workers += 1
+            return sender, message, enqueued_at, group
+    
+    def work(self):
+        """Take one sender at a time so their messages never run concurrently"""
+        while True:
+            sender, message, enqueued_at, group = self.next_sender()
+            self.record('queue_wait', time.monotonic() - enqueued_at)
+            try:
+                self.handler(sender, message)
+            except Exception as e:
+                logger.error(f"Error processing queued message from {sender}: {str(e)}")
+                with self.lock:
+                    self.counters['failed'] += 1
+                self.count('failed')
+            finally:
+                with self.lock:
+                    self.busy_workers -= 1
+                    self.depth -= 1
+                    self.group_depth[group] -= 1
+                    if not self.group_depth[group]:
+                        del self.group_depth[group]
+                    self.counters['processed'] += 1
+                    if self.pending[sender]:
+                        self.mark_ready(sender, group)
+                    else:
+                        del self.pending[sender]
+                self.count('processed')
+    
+    def count(self, result):
+        """Mirror a message counter into the metrics registry"""
+        if self.metrics:
+            self.metrics.increment(f'{self.name}_messages_total', result=result)
+    
+    def record(self, stage, seconds):
+        """Accumulate a per-stage timing"""
+        with self.lock:
+            timing = self.stage_timings.setdefault(stage, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            timing['count'] += 1
+            timing['total_ms'] += seconds * 1000
+            timing['max_ms'] = max(timing['max_ms'], seconds * 1000)
+        if self.metrics:
+            self.metrics.observe(f'{self.name}_stage_duration_seconds', seconds, stage=stage)
+    
+    def stats(self):
+        """Queue depth, pool usage, counters and average/max stage timings"""
+        with self.lock:
+            return {
+                'workers': self.workers, 'busy_workers': self.busy_workers,
+                'queue_depth': self.depth, 'max_queue': self.max_queue,
+                'max_group_queue': self.max_group_queue,
+                'active_senders': len(self.pending), 'active_groups': len(self.group_depth),
+                **self.counters,
+                'stages': {stage: {'count': timing['count'],
+                                   'avg_ms': round(timing['total_ms'] / timing['count'], 1),
+                                   'max_ms': round(timing['max_ms'], 1)}
+                           for stage, timing in self.stage_timings.items()}
+            }
+
+class TokenBucket:
+    """Rate limiter shared by the send workers: `rate` tokens a second, up to `capacity` banked for bursts"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is free; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class OutboundSender:
+    """Background WhatsApp delivery: bounded per-recipient queue, token-bucket pacing, retries and long-reply splitting"""
+    
+    # Twilio rejects WhatsApp bodies longer than this
+    MAX_BODY = 1600
+    
+    # Room kept at the end of each segment for its "(2/3)" marker
+    MARKER_RESERVE = 12
+    
+    def __init__(self, send, workers, max_queue, rate, burst, max_attempts, backoff, max_backoff,
+                 metrics=None, history=500, bucket=None):
+        self.send = send
+        # Senders on one Twilio account pass the same bucket, so together they stay under the account's limit
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.metrics = metrics
+        self.history = history
+        self.dispatcher = MessageDispatcher(self.deliver, workers, max_queue, metrics, name='outbound')
+        self.lock = threading.Lock()
+        self.deliveries = OrderedDict()
+        self.delivery_by_sid = {}
+        self.next_id = 1
+        self.counters = {'sent': 0, 'failed': 0, 'rejected': 0, 'segments': 0, 'retries': 0}
+    
+    @classmethod
+    def split(cls, body, limit=MAX_BODY):
+        """Ordered segments of at most `limit` characters, cut at paragraph, line or word boundaries"""
+        if len(body) <= limit:
+            return [body]
+        room = limit - cls.MARKER_RESERVE
+        parts = []
+        remaining = body
+        while len(remaining) > room:
+            for separator in ('\n\n', '\n', ' '):
+                cut = remaining.rfind(separator, 0, room)
+                if cut > room // 2:
+                    break
+            else:
+                cut = room
+            parts.append(remaining[:cut].rstrip())
+            remaining = remaining[cut:].lstrip()
+        parts.append(remaining)
+        return [f"{part}\n({number}/{len(parts)})" for number, part in enumerate(parts, 1)]
+    
+    def retryable(self, error):
+        """Network errors, throttling and 5xx are worth retrying; other 4xx (bad number, bad body) are not"""
+        status = getattr(error, 'status', None)
+        return status is None or status == 429 or status >= 500
+    
+    def retry_delay(self, attempt):
+        """Exponential backoff with jitter so retries from a burst don't land together"""
+        return min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+    
+    def submit(self, to_number, body):
+        """Queue a reply; returns its delivery id, or None when the queue is full"""
+        segments = self.split(body)
+        with self.lock:
+            delivery_id = self.next_id
+            self.next_id += 1
+            self.deliveries[delivery_id] = {
+                'id': delivery_id, 'to': to_number, 'status': 'queued', 'segments': segments,
+                'sent_segments': 0, 'attempts': 0, 'sids': [], 'error': None,
+                'queued_at': time.time(), 'finished_at': None, 'delivery_status': {}
+            }
+            # Forget the oldest finished replies; ones still queued are bounded by the queue size
+            while len(self.deliveries) > self.history:
+                oldest = next(iter(self.deliveries.values()))
+                if oldest['finished_at'] is None:
+                    break
+                del self.deliveries[oldest['id']]
+                for sid in oldest['sids']:
+                    self.delivery_by_sid.pop(sid, None)
+        
+        if self.dispatcher.workers <= 0:
+            self.deliver(to_number, delivery_id)
+            return delivery_id
+        if not self.dispatcher.submit(to_number, delivery_id):
+            self.finish(delivery_id, 'rejected', 'Send queue full')
+            return None
+        return delivery_id
+    
+    def deliver(self, to_number, delivery_id):
+        """Send every segment in order, retrying each with backoff; a segment that can't be sent ends the reply"""
+        with self.lock:
+            segments = self.deliveries[delivery_id]['segments']
+        
+        started = time.monotonic()
+        for segment in segments:
+            attempt = 0
+            while True:
+                attempt += 1
+                waited = self.bucket.acquire()
+                if waited and self.metrics:
+                    self.metrics.observe('outbound_stage_duration_seconds', waited, stage='rate_limit')
+                try:
+                    sid = self.send(to_number, segment)
+                except Exception as e:
+                    with self.lock:
+                        self.deliveries[delivery_id]['attempts'] += 1
+                    if attempt >= self.max_attempts or not self.retryable(e):
+                        logger.error(f"Error sending WhatsApp to {to_number} after {attempt} attempts: {str(e)}")
+                        self.count_segment('failed')
+                        self.finish(delivery_id, 'failed', str(e))
+                        return
+                    delay = self.retry_delay(attempt)
+                    logger.info(f"Retrying WhatsApp to {to_number} in {delay:.1f}s: {str(e)}")
+                    self.count_segment('retried')
+                    time.sleep(delay)
+                    continue
+                with self.lock:
+                    delivery = self.deliveries[delivery_id]
+                    delivery['attempts'] += 1
+                    delivery['sent_segments'] += 1
+                    if sid:
+                        delivery['sids'].append(sid)
+                        self.delivery_by_sid[sid] = delivery_id
+                self.count_segment('sent')
+                break
+        
+        self.dispatcher.record('deliver', time.monotonic() - started)
+        logger.info(f"Message sent to {to_number} in {len(segments)} segment(s)")
+        self.finish(delivery_id, 'sent')
+    
+    def count_segment(self, result):
+        """Per-segment counters, mirrored into the metrics registry"""
+        with self.lock:
+            key = {'sent': 'segments', 'retried': 'retries'}.get(result)
+            if key:
+                self.counters[key] += 1
+        if self.metrics:
+            self.metrics.increment('outbound_segments_total', result=result)
+    
+    def finish(self, delivery_id, status, error=None):
+        """Record a reply's final outcome"""
+        with self.lock:
+            self.counters[status] += 1
+            delivery = self.deliveries.get(delivery_id)
+            if delivery is None:
+                return
+            delivery['status'] = status
+            delivery['error'] = error
+            delivery['finished_at'] = time.time()
+    
+    def update_status(self, sid, status, error_code=None):
+        """Apply a Twilio status callback (delivered, read, undelivered, failed) to the segment it reports on"""
+        with self.lock:
+            delivery = self.deliveries.get(self.delivery_by_sid.get(sid))
+            if delivery is None:
+                return False
+            delivery['delivery_status'][sid] = status
+            if error_code:
+                delivery['error'] = f"Twilio error {error_code}"
+            return True
+    
+    def delivery(self, delivery_id):
+        """One reply's outcome, without the segment bodies"""
+        with self.lock:
+            delivery = self.deliveries.get(delivery_id)
+            if delivery is None:
+                return None
+            return {**delivery, 'segments': len(delivery['segments']), 'sids': list(delivery['sids']),
+                    'delivery_status': dict(delivery['delivery_status'])}
+    
+    def stats(self):
+        """Send queue status, outcome counters and the most recent failures"""
+        with self.lock:
+            recent_failures = [{'id': delivery['id'], 'to': delivery['to'], 'error': delivery['error']}
+                               for delivery in reversed(self.deliveries.values())
+                               if delivery['status'] in ('failed', 'rejected')][:10]
+            counters = dict(self.counters)
+        return {'queue': self.dispatcher.stats(), 'rate_per_second': self.bucket.rate,
+                'burst': self.bucket.capacity, **counters, 'recent_failures': recent_failures}
+
+class LazyClient:
+    """Service client built by an assistant method on first access; assigning the attribute replaces it"""
+    
+    def __init__(self, factory):
+        self.factory = factory
+    
+    def __set_name__(self, owner, name):
+        self.name = name
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        with instance.client_lock:
+            # Once built the client lives in the instance dict, which shadows this descriptor
+            client = instance.__dict__.get(self.name)
+            if client is not None:
+                return client
+            # A failed build is remembered for CLIENT_RETRY_SECONDS so an outage doesn't rebuild on every access
+            failure = instance.client_failures.get(self.name)
+            if failure is not None and time.monotonic() < failure[0]:
+                if failure[1] is None:
+                    return None
+                raise RuntimeError(f"{self.name} unavailable, retrying in "
+                                   f"{failure[0] - time.monotonic():.0f}s: {str(failure[1])}") from failure[1]
+            retry_at = time.monotonic() + instance.client_retry_seconds
+            try:
+                client = getattr(instance, self.factory)()
+            except Exception as e:
+                logger.error(f"Error building {self.name}: {str(e)}")
+                instance.client_failures[self.name] = (retry_at, e)
+                raise
+            if client is None:
+                instance.client_failures[self.name] = (retry_at, None)
+                return None
+            instance.client_failures.pop(self.name, None)
+            # Keep a client assigned while we were building (e.g. a test fake)
+            return instance.__dict__.setdefault(self.name, client)
+
 class IntelligentBusinessAssistant:
-    def __init__(self):
+    # SDK imports and discovery happen on first use, not at import time
+    anthropic_client = LazyClient('init_anthropic')
+    twilio_client = LazyClient('init_twilio')
+    drive_service = LazyClient('init_google_drive')
+    
+    def __init__(self, tenant=None, metrics=None, client_source=None, send_buckets=None):
+        # Tenant overrides: any setting below by its environment variable name, plus service_prices
+        self.tenant = tenant or {}
+        self.tenant_id = str(self.tenant.get('id', DEFAULT_TENANT_ID))
+        self.client_source = client_source
+        
         # Configuration
-        self.anthropic_api_key = os.getenv('ANTHROPIC_API_KEY', #################")
-        self.twilio_account_sid = os.getenv('TWILIO_ACCOUNT_SID', "#################")
-        self.twilio_auth_token = os.getenv('TWILIO_AUTH_TOKEN', "#################")
-        self.twilio_whatsapp_number = "whatsapp:+14155238886"
+        self.anthropic_api_key = self.setting('ANTHROPIC_API_KEY', "#################")
+        self.twilio_account_sid = self.setting('TWILIO_ACCOUNT_SID', "#################")
+        self.twilio_auth_token = self.setting('TWILIO_AUTH_TOKEN', "#################")
+        self.twilio_whatsapp_number = self.setting('TWILIO_WHATSAPP_NUMBER', "whatsapp:+14155238886")
+        
+        # Persona used in the system prompt and in replies
+        self.owner_name = self.setting('OWNER_NAME', 'Moloi')
+        self.business_name = self.setting('BUSINESS_NAME', 'MR Banks Car Detailing')
+        self.system_prompt = SYSTEM_PROMPT.format(owner_name=self.owner_name, business_name=self.business_name)
 
        
         # Google Drive configuration
-        self.google_drive_file_id = "#################"
-        self.credentials_file = "#################"
+        self.google_drive_file_id = self.setting('GOOGLE_DRIVE_FILE_ID', "#################")
+        self.credentials_file = self.setting('GOOGLE_CREDENTIALS_FILE', "#################")
+        
+        # Drive transfers stay in memory; uploads above the threshold go resumable in chunks
+        self.drive_download_chunk_size = int(self.setting('DRIVE_DOWNLOAD_CHUNK_BYTES', str(100 * 1024 * 1024)))
+        self.drive_upload_chunk_size = max(DRIVE_CHUNK_GRANULARITY,
+                                           int(self.setting('DRIVE_UPLOAD_CHUNK_BYTES', str(5 * 1024 * 1024)))
+                                           // DRIVE_CHUNK_GRANULARITY * DRIVE_CHUNK_GRANULARITY)
+        self.drive_resumable_threshold = int(self.setting('DRIVE_RESUMABLE_THRESHOLD_BYTES', str(5 * 1024 * 1024)))
+        self.drive_num_retries = int(self.setting('DRIVE_NUM_RETRIES', '3'))
+        
+        # Per-stage latency histograms and counters, scraped from /metrics (one registry shared by all tenants)
+        self.metrics = metrics or Metrics()
+        
+        # Service clients are built lazily and share pooled keep-alive connections across requests
+        self.client_lock = threading.RLock()
+        self.client_failures = {}
+        self.client_retry_seconds = float(self.setting('CLIENT_RETRY_SECONDS', '30'))
+        self.http_timeout = float(self.setting('HTTP_TIMEOUT_SECONDS', '30'))
+        
+        # Replies go out from a background send queue paced to the Twilio account's messages-per-second limit;
+        # send_buckets holds one bucket per account SID, and the first tenant on an account sets its rate
+        self.status_callback_url = self.setting('TWILIO_STATUS_CALLBACK_URL')
+        rate = float(self.setting('OUTBOUND_RATE_PER_SECOND', '80'))
+        burst = float(self.setting('OUTBOUND_BURST', '80'))
+        bucket = None
+        if send_buckets is not None:
+            bucket = send_buckets.setdefault(self.twilio_account_sid, TokenBucket(rate, burst))
+        self.outbound = OutboundSender(
+            self.deliver_whatsapp_message,
+            workers=int(self.setting('OUTBOUND_WORKERS', '2')),
+            max_queue=int(self.setting('OUTBOUND_QUEUE_SIZE', '500')),
+            rate=rate,
+            burst=burst,
+            max_attempts=int(self.setting('OUTBOUND_MAX_ATTEMPTS', '5')),
+            backoff=float(self.setting('OUTBOUND_BACKOFF_SECONDS', '1')),
+            max_backoff=float(self.setting('OUTBOUND_MAX_BACKOFF_SECONDS', '30')),
+            metrics=self.metrics,
+            bucket=bucket)
         
-        # Initialize services
-        self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
-        self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
-        self.drive_service = self.init_google_drive()
+        # Enhanced conversation memory with context, bounded per number and overall
+        self.conversations = ConversationStore(
+            max_turns=int(self.setting('CONVERSATION_MAX_TURNS', '20')),
+            max_numbers=int(self.setting('CONVERSATION_MAX_NUMBERS', '1000')),
+            idle_ttl_seconds=int(self.setting('CONVERSATION_IDLE_TTL_SECONDS', '86400')),
+            spill_path=self.tenant_path('CONVERSATION_SPILL_PATH'))
         
-        # Enhanced conversation memory with context
-        self.conversations = {}
+        # 'streaming' keeps the raw xlsx and appends at the XML level; 'full' keeps an openpyxl object graph
+        self.workbook_mode = self.setting('WORKBOOK_LOAD_MODE', 'streaming')
+        
+        # Parsed workbook snapshot, reused until the Drive revision changes
+        self.snapshot = None
+        self.snapshot_lock = threading.Lock()
+        self.write_lock = threading.RLock()
+        
+        # Write-behind mode: journal appends locally, upload them in batches
+        self.write_behind = self.setting('WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+        self.write_behind_debounce = float(self.setting('WRITE_BEHIND_DEBOUNCE_SECONDS', '5'))
+        self.write_behind_max_batch = int(self.setting('WRITE_BEHIND_MAX_BATCH', '20'))
+        self.journal = None
+        self.flush_event = threading.Event()
+        
+        # Claude reply cache for repeated conversation messages
+        self.response_cache = ResponseCache(int(self.setting('LLM_CACHE_SIZE', '500')),
+                                            float(self.setting('LLM_CACHE_TTL_SECONDS', '3600')))
+        
+        # Intent routing counters
+        self.route_lock = threading.Lock()
+        self.route_counts = {}
+        self.llm_calls = 0
+        self.llm_calls_saved = 0
+        
+        # ID sequences and compare-and-swap retries for concurrent writers
+        self.id_allocator = IdAllocator()
+        self.upload_attempts = int(self.setting('DRIVE_UPLOAD_ATTEMPTS', '3'))
+        self.ledger_ids_seeded = False
+        
+        # Storage backend: the Drive workbook itself, or a local SQLite ledger exported to Drive
+        self.storage_backend = self.setting('STORAGE_BACKEND', 'drive').lower()
+        self.export_interval = float(self.setting('SQLITE_EXPORT_INTERVAL_SECONDS', '900'))
+        self.export_pending = threading.Event()
+        self.ledger = None
+        self.ledger_import_lock = threading.Lock()
+        if self.storage_backend == 'sqlite':
+            self.ledger = SQLiteLedger(self.tenant_path('SQLITE_PATH', 'business_ledger.db'))
+            threading.Thread(target=self.export_loop, name='sqlite-exporter', daemon=True).start()
+        if self.write_behind:
+            self.journal = WriteJournal(self.tenant_path('WRITE_JOURNAL_PATH', 'pending_writes.jsonl'))
+            threading.Thread(target=self.flush_loop, name='write-behind-flusher', daemon=True).start()
+            atexit.register(self.flush_pending_writes)
+            if self.journal.pending:
+                self.flush_event.set()
+        
+        # Closed months move out of the live workbook into per-month archives, leaving summary rows behind
+        self.archive_keep_months = max(1, int(self.setting('ARCHIVE_KEEP_MONTHS', '1')))
+        self.archive = MonthArchive(self, self.setting('ARCHIVE_STORAGE', 'local').lower(),
+                                    self.data_path(self.setting('ARCHIVE_DIR', 'archives')),
+                                    self.setting('ARCHIVE_DRIVE_FOLDER_ID'),
+                                    self.tenant_name('ARCHIVE_PREFIX', 'business-archive'))
+        
+        # Scheduled digests: reports rebuilt at SA-time slots (HH:MM lists) and pushed to the owner's numbers
+        self.digest_refresh_times = self.parse_slot_times(self.setting('DIGEST_REFRESH_TIMES', ''))
+        self.digest_daily_times = self.parse_slot_times(self.setting('DIGEST_DAILY_TIME', ''))
+        self.digest_weekly_times = self.parse_slot_times(self.setting('DIGEST_WEEKLY_TIME', ''))
+        self.digest_recipients = [number.strip() for number in self.setting('DIGEST_RECIPIENTS', '').split(',')
+                                  if number.strip()]
+        self.digest_max_age = float(self.setting('DIGEST_MAX_AGE_SECONDS', '86400'))
+        self.digests = {}
+        self.digest_lock = threading.Lock()
+        self.data_version = 0
         
         # Service pricing (for smart suggestions)
-        self.service_prices = {
+        self.service_prices = self.tenant.get('service_prices') or {
             'Basic Wash': 120,
             'Full Wash': 180,
             'Premium Wash': 280,
             'Interior Only': 150
         }
+        self.extractor = MessageExtractor(self.service_prices)
         
+    def setting(self, name, default=None):
+        """The tenant's own value for a setting, else the environment variable of the same name"""
+        value = self.tenant.get(name)
+        if value is None:
+            return os.getenv(name, default)
+        return str(value).lower() if isinstance(value, bool) else str(value)
+    
+    def tenant_name(self, name, default=None):
+        """A file name setting; shared defaults get the tenant id appended so tenants never write the same file"""
+        if name in self.tenant or self.tenant_id == DEFAULT_TENANT_ID:
+            return self.setting(name, default)
+        path = os.getenv(name, default)
+        if not path:
+            return path
+        root, extension = os.path.splitext(path)
+        return f"{root}.{self.tenant_id}{extension}"
+    
+    def tenant_path(self, name, default=None):
+        """A local file setting, per tenant as in tenant_name and under DATA_DIR when relative"""
+        return self.data_path(self.tenant_name(name, default))
+    
+    def data_path(self, path):
+        """A local path resolved against DATA_DIR, so a restart from another directory finds the same files"""
+        return os.path.join(DATA_DIR, path) if path else path
+    
+    def shared_client(self, name, *credentials):
+        """The default tenant's client when this tenant uses the same credentials, so tenants share pooled connections"""
+        source = self.client_source
+        if source is not None and all(getattr(source, field) == getattr(self, field) for field in credentials):
+            return getattr(source, name)
+        return None
+    
+    def prewarm_clients(self):
+        """Build the service clients in the background so the first message doesn't pay for SDK imports"""
+        started = time.monotonic()
+        for name in ('twilio_client', 'drive_service', 'anthropic_client'):
+            getattr(self, name)
+        logger.info(f"Service clients ready {time.monotonic() - started:.2f}s after startup")
+    
+    def init_anthropic(self):
+        """Anthropic client; its httpx connection pool is reused by every Claude call"""
+        shared = self.shared_client('anthropic_client', 'anthropic_api_key')
+        if shared is not None:
+            return shared
+        import anthropic
+        return anthropic.Anthropic(api_key=self.anthropic_api_key)
+    
+    def init_twilio(self):
+        """Twilio client on a pooled requests session"""
+        shared = self.shared_client('twilio_client', 'twilio_account_sid', 'twilio_auth_token')
+        if shared is not None:
+            return shared
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+        return Client(self.twilio_account_sid, self.twilio_auth_token,
+                      http_client=TwilioHttpClient(pool_connections=True, timeout=self.http_timeout))
+    
     def init_google_drive(self):
         """Initialize Google Drive service"""
+        shared = self.shared_client('drive_service', 'credentials_file')
+        if shared is not None:
+            return shared
         try:
+            import google_auth_httplib2
+            import httplib2
+            from google.oauth2.service_account import Credentials
+            from googleapiclient.discovery import build
+            from googleapiclient.http import HttpRequest
+            
             scopes = ['https://www.googleapis.com/auth/drive']
             creds = Credentials.from_service_account_file(self.credentials_file, scopes=scopes)
-            return build('drive', 'v3', credentials=creds)
+            
+            # httplib2 connections are not thread-safe, so each worker thread keeps its own keep-alive connection
+            thread_http = threading.local()
+            
+            def pooled_request(http, *args, **kwargs):
+                if not hasattr(thread_http, 'http'):
+                    thread_http.http = google_auth_httplib2.AuthorizedHttp(
+                        creds, http=httplib2.Http(timeout=self.http_timeout))
+                return HttpRequest(thread_http.http, *args, **kwargs)
+            
+            # The discovery document bundled with googleapiclient, no fetch or cache lookup
+            return build('drive', 'v3', credentials=creds, requestBuilder=pooled_request,
+                         static_discovery=True, cache_discovery=False)
         except Exception as e:
             logger.error(f"Error initializing Google Drive: {str(e)}")
             return None
     
-    def download_excel_from_drive(self):
-        """Download Excel file from Google Drive"""
+    def download_workbook_content(self, file_id=None):
+        """Download the workbook (or another Drive file) into memory"""
         try:
-            request = self.drive_service.files().get_media(fileId=self.google_drive_file_id)
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx')
-            downloader = MediaIoBaseDownload(temp_file, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
-            temp_file.close()
-            return temp_file.name
+            from googleapiclient.http import MediaIoBaseDownload
+            
+            with self.metrics.span('drive_download'):
+                # A buffer per download, so concurrent downloads don't wait on each other and
+                # getvalue() hands over the buffer's bytes instead of copying them
+                buffer = io.BytesIO()
+                request = self.drive_service.files().get_media(fileId=file_id or self.google_drive_file_id)
+                downloader = MediaIoBaseDownload(buffer, request, chunksize=self.drive_download_chunk_size)
+                done = False
+                while done is False:
+                    status, done = downloader.next_chunk(num_retries=self.drive_num_retries)
+                return buffer.getvalue()
         except Exception as e:
             logger.error(f"Error downloading from Google Drive: {str(e)}")
             return None
     
-    def upload_excel_to_drive(self, local_file_path):
-        """Upload Excel file to Google Drive"""
+    def upload_workbook_content(self, content, file_id=None):
+        """Upload workbook bytes to Google Drive (the live workbook unless file_id is given) and return the new revision"""
         try:
-            media = MediaFileUpload(local_file_path, 
-                                  mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            file = self.drive_service.files().update(
-                fileId=self.google_drive_file_id, media_body=media).execute()
-            return True
+            from googleapiclient.http import MediaIoBaseUpload
+            
+            with self.metrics.span('drive_upload'):
+                resumable = len(content) > self.drive_resumable_threshold
+                media = MediaIoBaseUpload(io.BytesIO(content), mimetype=XLSX_MIMETYPE,
+                                          chunksize=self.drive_upload_chunk_size, resumable=resumable)
+                request = self.drive_service.files().update(
+                    fileId=file_id or self.google_drive_file_id, media_body=media,
+                    fields=DRIVE_REVISION_FIELDS)
+                if resumable:
+                    # Each chunk is retried on its own; a dropped connection resumes from the last acknowledged byte
+                    file = None
+                    while file is None:
+                        status, file = request.next_chunk(num_retries=self.drive_num_retries)
+                else:
+                    file = request.execute()
+            return self.revision_from_metadata(file) or 'uploaded'
         except Exception as e:
             logger.error(f"Error uploading to Google Drive: {str(e)}")
+            return None
+    
+    def find_drive_file(self, name, folder_id=None):
+        """ID of a non-trashed Drive file with this name (in a folder, if given), or None"""
+        query = f"name = '{name}' and trashed = false"
+        if folder_id:
+            query += f" and '{folder_id}' in parents"
+        with self.metrics.span('drive_revision'):
+            files = self.drive_service.files().list(q=query, fields='files(id)', pageSize=1).execute().get('files', [])
+        return files[0]['id'] if files else None
+    
+    def create_drive_file(self, name, content, folder_id=None):
+        """Upload bytes as a new Drive file and return its ID"""
+        from googleapiclient.http import MediaIoBaseUpload
+        
+        with self.metrics.span('drive_upload'):
+            media = MediaIoBaseUpload(io.BytesIO(content), mimetype=XLSX_MIMETYPE)
+            metadata = {'name': name, 'parents': [folder_id]} if folder_id else {'name': name}
+            return self.drive_service.files().create(body=metadata, media_body=media, fields='id').execute().get('id')
+    
+    def revision_from_metadata(self, metadata):
+        """Build a revision marker from Drive file metadata"""
+        marker = tuple(metadata.get(field) for field in DRIVE_REVISION_FIELDS.split(','))
+        return marker if any(marker) else None
+    
+    def get_drive_revision(self):
+        """Cheap metadata check for the workbook's current Drive revision"""
+        try:
+            with self.metrics.span('drive_revision'):
+                metadata = self.drive_service.files().get(
+                    fileId=self.google_drive_file_id, fields=DRIVE_REVISION_FIELDS).execute()
+            return self.revision_from_metadata(metadata)
+        except Exception as e:
+            logger.error(f"Error checking Google Drive revision: {str(e)}")
+            return None
+    
+    def drive_revision_matches(self, revision):
+        """Compare-and-swap guard: is Drive still at the revision our writes are based on?"""
+        current = self.get_drive_revision()
+        if current is None:
+            # Metadata unavailable: someone may have written, so treat it as moved rather than overwrite blindly
+            logger.warning("Google Drive revision unknown; treating the workbook as changed")
+            return False
+        return current == revision
+    
+    def existing_ids(self, data):
+        """Customer and transaction IDs already present in loaded data"""
+        identifiers = set(data['index'].customer_journey)
+        identifiers.update(data['transaction_ids'])
+        identifiers.update(summary['Last_ID'] for summary in data['period_summaries'] if summary['Last_ID'])
+        identifiers.update(customer['Customer_ID'] for customer in data['customer_summaries'])
+        return identifiers
+    
+    def seed_id_allocator(self, workbook, data):
+        """Seed ID sequences from a freshly parsed workbook"""
+        for customer_id in data['index'].customer_journey:
+            self.id_allocator.observe(customer_id)
+        for identifier in data['transaction_ids']:
+            self.id_allocator.observe(identifier)
+        # Archived months keep their IDs reserved through the summary rows
+        for summary in data['period_summaries']:
+            self.id_allocator.observe(summary['Last_ID'])
+        for customer in data['customer_summaries']:
+            self.id_allocator.observe(customer['Customer_ID'])
+        # Transaction numbers historically followed the sheet row count
+        self.id_allocator.observe_number('REV', self.sheet_max_row(workbook, 'Revenue') - 1)
+        self.id_allocator.observe_number('EXP', self.sheet_max_row(workbook, 'Expenses') - 1)
+    
+    def store_snapshot(self, revision, workbook, data):
+        """Remember the open workbook and its parsed data for a Drive revision"""
+        snapshot = {'revision': revision, 'workbook': workbook, 'data': data}
+        with self.snapshot_lock:
+            self.snapshot = snapshot if revision and data else None
+        return snapshot
+    
+    def invalidate_snapshot(self):
+        """Forget the cached snapshot so the next load re-downloads"""
+        with self.snapshot_lock:
+            self.snapshot = None
+    
+    def refresh_snapshot(self, snapshot, revision, appended_rows):
+        """Move the snapshot to the revision we just uploaded, applying our own appends"""
+        if revision:
+            data = self.apply_appended_rows(snapshot['data'], appended_rows)
+            return self.store_snapshot(revision, snapshot['workbook'], data)
+        self.invalidate_snapshot()
+        return None
+    
+    def workbook_content(self, workbook):
+        """Serialize an open workbook of either mode to xlsx bytes"""
+        if isinstance(workbook, StreamingWorkbook):
+            return workbook.to_bytes()
+        output = io.BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+    
+    def save_workbook_to_drive(self, workbook):
+        """Serialize an open workbook and upload it, returning the new revision"""
+        with self.metrics.span('workbook_save'):
+            content = self.workbook_content(workbook)
+        return self.upload_workbook_content(content)
+    
+    def save_workbook_if_unchanged(self, workbook, revision):
+        """Upload a workbook only if Drive is still at `revision`: the new revision, False if it moved, None if the upload failed"""
+        with self.metrics.span('workbook_save'):
+            content = self.workbook_content(workbook)
+        # Checked after serializing, right before the upload, so another writer can only slip into one metadata round trip
+        if not self.drive_revision_matches(revision):
             return False
+        return self.upload_workbook_content(content)
+    
+    def open_data_context(self, data_context=None):
+        """Reuse the caller's request context or start a new one"""
+        if data_context:
+            return data_context
+        return SQLiteDataContext(self) if self.ledger else BusinessDataContext(self)
+    
+    def import_workbook_to_ledger(self):
+        """One-time import of the Drive workbook into the SQLite ledger"""
+        content = self.download_workbook_content()
+        if not content:
+            return None
+        return self.ledger.import_workbook(openpyxl.load_workbook(io.BytesIO(content), read_only=True))
+    
+    def load_ledger_data(self):
+        """SQL-aggregated business data, importing the workbook on first use"""
+        try:
+            with self.metrics.span('load_business_data'):
+                with self.ledger_import_lock:
+                    if not self.ledger.is_imported() and self.import_workbook_to_ledger() is None:
+                        return None
+                    if not self.ledger_ids_seeded:
+                        for prefix, number in self.ledger.max_id_numbers().items():
+                            self.id_allocator.observe_number(prefix, number)
+                        self.ledger_ids_seeded = True
+                return self.ledger.load_business_data()
+        except Exception as e:
+            logger.error(f"Error loading ledger data: {str(e)}")
+            return None
+    
+    def export_ledger_to_drive(self):
+        """Upload the ledger in the existing Excel layout"""
+        try:
+            revision = self.save_workbook_to_drive(self.ledger.export_workbook())
+            if revision:
+                logger.info("Exported SQLite ledger to Google Drive")
+            return revision
+        except Exception as e:
+            logger.error(f"Error exporting ledger to Google Drive: {str(e)}")
+            return None
+    
+    def export_loop(self):
+        """Background exporter: push the ledger to Drive at most once per export interval"""
+        while True:
+            self.export_pending.wait()
+            time.sleep(self.export_interval)
+            self.export_pending.clear()
+            if not self.export_ledger_to_drive():
+                self.export_pending.set()
     
     def get_sa_datetime(self):
         """Get current South African date and time"""
@@ -94,297 +2667,449 @@ class IntelligentBusinessAssistant:
         days_from_first = (date - first_day_of_month).days
         return (days_from_first // 7) + 1
     
-    def load_business_data(self):
-        """Load comprehensive business data with updated column structure"""
+    def previous_week(self, day):
+        """Last day of the week of the month before the one `day` falls in"""
+        return day.replace(day=(self.calculate_week_of_month(day) - 1) * 7 + 1) - timedelta(days=1)
+    
+    def parse_slot_times(self, value):
+        """Sorted (hour, minute) slots from a comma-separated HH:MM setting"""
+        slots = []
+        for text in value.split(','):
+            if not text.strip():
+                continue
+            hour, _, minute = text.strip().partition(':')
+            if not (hour.isdigit() and minute.isdigit() and int(hour) < 24 and int(minute) < 60):
+                raise ValueError(f"Digest times must be HH:MM in South African time: {text.strip()!r}")
+            slots.append((int(hour), int(minute)))
+        return sorted(set(slots))
+    
+    def load_snapshot(self):
+        """Load workbook and data, re-downloading only when the Drive revision changed"""
         try:
-            local_file = self.download_excel_from_drive()
-            if not local_file:
-                return None
-            
-            workbook = openpyxl.load_workbook(local_file)
-            
-            # Load Operations data with updated structure
-            operations_data = []
-            operations_sheet = workbook['Operations']
-            for row in operations_sheet.iter_rows(min_row=2, values_only=True):
-                if row[0]:  # Customer_ID exists
-                    operations_data.append({
-                        'Customer_ID': row[0], 'Customer_Name': row[1] or '',
-                        'Service_Date': row[2], 'Week_Number': row[3] or 1,
-                        'Month': row[4] or datetime.now().strftime('%B'),
-                        'Service_Completed': row[5] or 'No', 'Service_Type': row[6] or '',
-                        'Notes': row[7] or '', 'Status': row[8] or 'Pending'
-                    })
-            
-            # Load Revenue data with new column structure
-            revenue_data = []
-            revenue_sheet = workbook['Revenue']
-            for row in revenue_sheet.iter_rows(min_row=2, values_only=True):
-                if row[0]:
-                    revenue_data.append({
-                        'Transaction_Id': row[0], 'Customer_id': row[1], 'Service_Date': row[2],
-                        'Month': row[3], 'Service_Type': row[4], 'Amount': row[5] or 0,
-                        'Payment_Status': row[6] or 'Unpaid', 'Payment_Method': row[7] or 'Cash',
-                        'Status': row[8] or 'Pending', 'Week_Number': row[9] or 1
-                    })
-            
-            # Load Expenses data (structure unchanged)
-            expenses_data = []
-            expenses_sheet = workbook['Expenses']
-            for row in expenses_sheet.iter_rows(min_row=2, values_only=True):
-                if row[0]:
-                    expenses_data.append({
-                        'Transaction_ID': row[0], 'Date': row[1], 'Month': row[2],
-                        'Category': row[3] or 'Other', 'Description': row[4] or '',
-                        'Amount': abs(row[5]) if row[5] else 0, 'Supplier': row[6] or '',
-                        'Status': row[7] or 'Pending', 'Notes': row[8] or ''
-                    })
-            
-            # Advanced cross-sheet analysis
-            total_revenue = sum(item['Amount'] for item in revenue_data)
-            total_expenses = sum(item['Amount'] for item in expenses_data)
-            net_profit = total_revenue - total_expenses
-            profit_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else 0
-            
-            # Service performance analysis
-            service_performance = {}
-            for item in revenue_data:
-                service = item['Service_Type']
-                if service not in service_performance:
-                    service_performance[service] = {'revenue': 0, 'count': 0, 'customers': set()}
-                service_performance[service]['revenue'] += item['Amount']
-                service_performance[service]['count'] += 1
-                service_performance[service]['customers'].add(item['Customer_id'])
-            
-            # Convert sets to counts for JSON serialization
-            for service in service_performance:
-                service_performance[service]['unique_customers'] = len(service_performance[service]['customers'])
-                service_performance[service]['customers'] = list(service_performance[service]['customers'])
-            
-            # Customer journey analysis
-            customer_journey = {}
-            for op in operations_data:
-                customer_id = op['Customer_ID']
-                if customer_id not in customer_journey:
-                    customer_journey[customer_id] = {
-                        'name': op['Customer_Name'],
-                        'services_completed': 0,
-                        'total_spent': 0,
-                        'last_service_date': None,
-                        'service_types': [],
-                        'payment_methods': [],
-                        'notes': []
-                    }
+            with self.metrics.span('load_business_data'):
+                revision = self.get_drive_revision()
+                with self.snapshot_lock:
+                    if revision and self.snapshot and self.snapshot['revision'] == revision:
+                        return self.snapshot
                 
-                customer_journey[customer_id]['services_completed'] += 1
-                customer_journey[customer_id]['service_types'].append(op['Service_Type'])
-                customer_journey[customer_id]['notes'].append(op['Notes'])
-                customer_journey[customer_id]['last_service_date'] = op['Service_Date']
+                content = self.download_workbook_content()
+                if not content:
+                    return None
                 
-                # Match with revenue data
-                for rev in revenue_data:
-                    if rev['Customer_id'] == customer_id:
-                        customer_journey[customer_id]['total_spent'] += rev['Amount']
-                        customer_journey[customer_id]['payment_methods'].append(rev['Payment_Method'])
-            
-            # Expense analysis
-            expense_analysis = {}
-            for item in expenses_data:
-                category = item['Category']
-                expense_analysis[category] = expense_analysis.get(category, 0) + item['Amount']
-            
-            # Service completion and payment status
-            completed_services = len([op for op in operations_data if op['Service_Completed'] == 'Yes'])
-            completion_rate = (completed_services / len(operations_data) * 100) if operations_data else 0
-            
-            paid_revenue = sum(item['Amount'] for item in revenue_data if item['Payment_Status'] == 'Paid')
-            payment_rate = (paid_revenue / total_revenue * 100) if total_revenue > 0 else 0
-            
-            os.unlink(local_file)
-            
-            return {
-                'operations_data': operations_data, 'revenue_data': revenue_data, 'expenses_data': expenses_data,
-                'total_revenue': total_revenue, 'total_expenses': total_expenses,
-                'net_profit': net_profit, 'profit_margin': profit_margin,
-                'service_performance': service_performance, 'customer_journey': customer_journey,
-                'expense_analysis': expense_analysis, 'completion_rate': completion_rate,
-                'payment_rate': payment_rate, 'paid_revenue': paid_revenue,
-                'total_customers': len(customer_journey),
-                'repeat_customers': len([c for c in customer_journey.values() if c['services_completed'] > 1])
-            }
-            
+                with self.metrics.span('workbook_open'):
+                    if self.workbook_mode == 'streaming':
+                        workbook = StreamingWorkbook(content)
+                    else:
+                        workbook = openpyxl.load_workbook(io.BytesIO(content))
+                
+                data = self.parse_business_workbook(workbook)
+                if data:
+                    self.seed_id_allocator(workbook, data)
+                if data and self.journal:
+                    self.merge_journal(workbook, data)
+                return self.store_snapshot(revision, workbook, data)
+        
         except Exception as e:
             logger.error(f"Error loading business data: {str(e)}")
             return None
     
-    def generate_customer_id(self):
-        """Generate next customer ID"""
-        try:
-            data = self.load_business_data()
-            if data and data['operations_data']:
-                max_num = 0
-                for op in data['operations_data']:
-                    if op['Customer_ID'] and op['Customer_ID'].startswith('CW'):
-                        try:
-                            num = int(op['Customer_ID'][2:])
-                            max_num = max(max_num, num)
-                        except:
-                            continue
-                return f"CW{str(max_num + 1).zfill(3)}"
+    def sheet_max_row(self, workbook, sheet_name):
+        """Last used row of a sheet in either workbook mode"""
+        if isinstance(workbook, StreamingWorkbook):
+            return workbook.max_row(sheet_name)
+        return workbook[sheet_name].max_row
+    
+    def workbook_rows(self, workbook):
+        """(sheet name, values) for each data row, summary sheets first so archived history precedes the live rows"""
+        if isinstance(workbook, StreamingWorkbook):
+            yield from workbook.read_rows()
+            return
+        for sheet_name in {**SUMMARY_SHEET_COLUMNS, **SHEET_COLUMNS}:
+            if sheet_name in SUMMARY_SHEET_COLUMNS and sheet_name not in workbook.sheetnames:
+                continue
+            for row in workbook[sheet_name].iter_rows(min_row=2, values_only=True):
+                yield sheet_name, row
+    
+    def clean_row(self, row):
+        """Row values with the control characters a worksheet cannot hold stripped from the text"""
+        return tuple(ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value for value in row)
+    
+    def discard_writes(self, data_context):
+        """After a failed save: the cached workbook may hold part of the rows, so drop it and the request's rows"""
+        data_context.discard()
+        self.invalidate_snapshot()
+        if self.ledger:
+            self.ledger.rollback()
+    
+    def append_sheet_row(self, workbook, sheet_name, row):
+        """Write row values after the last used row of a sheet"""
+        if isinstance(workbook, StreamingWorkbook):
+            return workbook.append(sheet_name, row)
+        sheet = workbook[sheet_name]
+        next_row = sheet.max_row + 1
+        for column, value in enumerate(row, start=1):
+            sheet.cell(row=next_row, column=column, value=value)
+        return next_row
+    
+    def merge_journal(self, workbook, data):
+        """Re-apply journaled rows that a freshly downloaded workbook does not have yet"""
+        existing_ids = data['transaction_ids']
+        merged_rows = []
+        for entry in self.journal.pending_entries():
+            if entry['keys'] and all(key in existing_ids for key in entry['keys']):
+                continue
+            for sheet_name, row in entry['rows']:
+                self.append_sheet_row(workbook, sheet_name, row)
+                merged_rows.append((sheet_name, row))
+        if merged_rows:
+            self.apply_appended_rows(data, merged_rows)
+            logger.info(f"Merged {len(merged_rows)} journaled rows into the downloaded workbook")
+    
+    def journal_appended_rows(self, snapshot, appended_rows):
+        """Write-behind commit: journal the rows, fold them into the snapshot and wake the flusher"""
+        if not appended_rows:
+            return snapshot['revision']
+        self.journal.append(appended_rows)
+        self.apply_appended_rows(snapshot['data'], appended_rows)
+        self.flush_event.set()
+        return snapshot['revision'] or 'journaled'
+    
+    def flush_pending_writes(self):
+        """Upload every journaled row in one workbook save, then trim the journal"""
+        if not self.journal:
+            return True
+        with self.write_lock:
+            entries = self.journal.pending_entries()
+            if not entries:
+                return True
+            for attempt in range(self.upload_attempts):
+                # Reloading a moved revision re-merges the journal on top of it
+                data_context = BusinessDataContext(self)
+                workbook = data_context.workbook
+                if not workbook:
+                    return False
+                revision = self.save_workbook_if_unchanged(workbook, data_context.snapshot['revision'])
+                if revision is not False:
+                    break
+                self.invalidate_snapshot()
             else:
-                return "CW001"
-        except:
-            return f"CW{str(random.randint(100, 999))}"
+                return False
+            if not revision:
+                return False
+            self.store_snapshot(revision, workbook, data_context.snapshot['data'])
+            self.journal.mark_flushed(entries[-1]['seq'])
+            logger.info(f"Flushed {len(entries)} journaled writes to Google Drive")
+            return True
     
-    def extract_service_info(self, message):
-        """Extract comprehensive service information with intelligent prompting"""
-        # Service type detection
-        services = {
-            'Basic Wash': ['basic', 'simple', 'quick wash', 'standard', 'normal'],
-            'Full Wash': ['full', 'complete', 'comprehensive', 'thorough'],
-            'Premium Wash': ['premium', 'deluxe', 'luxury', 'detailed', 'top service'],
-            'Interior Only': ['interior', 'inside', 'cabin clean', 'inside only']
+    def flush_loop(self):
+        """Background flusher: coalesce journaled writes on a debounce interval or batch size"""
+        while True:
+            self.flush_event.wait()
+            self.flush_event.clear()
+            deadline = time.monotonic() + self.write_behind_debounce
+            while len(self.journal.pending) < self.write_behind_max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.flush_event.wait(remaining)
+                self.flush_event.clear()
+            try:
+                flushed = self.flush_pending_writes()
+            except Exception as e:
+                logger.error(f"Error flushing journaled writes: {str(e)}")
+                # The snapshot workbook may hold rows that never reached Drive; reload and re-merge the journal
+                self.invalidate_snapshot()
+                flushed = False
+            if not flushed:
+                time.sleep(self.write_behind_debounce)
+                self.flush_event.set()
+    
+    def load_business_data(self, data_context=None):
+        """Load comprehensive business data, once per request context"""
+        return self.open_data_context(data_context).load()
+    
+    def operation_from_row(self, row):
+        """Map an Operations sheet row to a dict"""
+        return {
+            'Customer_ID': row[0], 'Customer_Name': row[1] or '',
+            'Service_Date': row[2], 'Week_Number': row[3] or 1,
+            'Month': row[4] or datetime.now().strftime('%B'),
+            'Service_Completed': row[5] or 'No', 'Service_Type': row[6] or '',
+            'Notes': row[7] or '', 'Status': row[8] or 'Pending'
         }
-        
-        service_type = None
-        message_lower = message.lower()
-        for service, keywords in services.items():
-            if any(keyword in message_lower for keyword in keywords):
-                service_type = service
-                break
-        
-        # Payment method detection
-        payment_methods = {
-            'Cash': ['cash', 'notes', 'money'],
-            'Card': ['card', 'swipe', 'tap'],
-            'EFT': ['eft', 'transfer', 'bank transfer', 'online']
+    
+    def revenue_from_row(self, row):
+        """Map a Revenue sheet row to a dict"""
+        return {
+            'Transaction_Id': row[0], 'Customer_id': row[1], 'Service_Date': row[2],
+            'Month': row[3], 'Service_Type': row[4], 'Amount': row[5] or 0,
+            'Payment_Status': row[6] or 'Unpaid', 'Payment_Method': row[7] or 'Cash',
+            'Status': row[8] or 'Pending', 'Week_Number': row[9] or 1
         }
-        
-        payment_method = 'Cash'  # default
-        for method, keywords in payment_methods.items():
-            if any(keyword in message_lower for keyword in keywords):
-                payment_method = method
-                break
-        
-        # Extract customer name
-        customer_patterns = [
-            r'(?:customer|client|for|served)\s+([A-Za-z]+(?:\s+[A-Za-z]+)?)',
-            r'([A-Za-z]+(?:\s+[A-Za-z]+)?)(?:\s+came|paid|wants)',
-            r'(?:mr|mrs|ms)\.?\s+([A-Za-z]+)',
-        ]
-        
-        customer_name = None
-        for pattern in customer_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                potential_name = match.group(1).strip().title()
-                excluded_words = ['Service', 'Wash', 'Customer', 'Full', 'Basic', 'Premium', 'Interior', 'Cash', 'Card']
-                if potential_name not in excluded_words:
-                    customer_name = potential_name
-                    break
-        
-        # Extract amount
-        amount = None
-        amount_patterns = [
-            r'[rR]\s*(\d+(?:,\d+)*(?:\.\d{2})?)',
-            r'(\d+(?:,\d+)*(?:\.\d{2})?)\s*rand',
-            r'\b(\d+(?:,\d+)*(?:\.\d{2})?)\b',
-        ]
-        
-        for pattern in amount_patterns:
-            matches = re.findall(pattern, message)
-            if matches:
-                try:
-                    amounts = [float(match.replace(',', '')) for match in matches]
-                    amount = max(amounts)
-                    break
-                except ValueError:
-                    continue
-        
-        # Smart amount suggestion
-        if not amount and service_type and service_type in self.service_prices:
-            amount = self.service_prices[service_type]
-        
-        # Payment status detection
-        payment_status = 'Paid'  # default for completed services
-        if any(word in message_lower for word in ['unpaid', 'owes', 'later', 'credit']):
-            payment_status = 'Unpaid'
-        
+    
+    def expense_from_row(self, row):
+        """Map an Expenses sheet row to a dict"""
         return {
-            'customer_name': customer_name,
-            'service_type': service_type,
-            'amount': amount,
-            'payment_method': payment_method,
-            'payment_status': payment_status
+            'Transaction_ID': row[0], 'Date': row[1], 'Month': row[2],
+            'Category': row[3] or 'Other', 'Description': row[4] or '',
+            'Amount': abs(row[5]) if row[5] else 0, 'Supplier': row[6] or '',
+            'Status': row[7] or 'Pending', 'Notes': row[8] or ''
         }
     
-    def extract_expense_info(self, message):
-        """Intelligently extract expense information"""
-        # Extract amounts
-        amount_patterns = [
-            r'[rR]\s*(\d+(?:,\d+)*(?:\.\d{2})?)',
-            r'(\d+(?:,\d+)*(?:\.\d{2})?)\s*rand',
-            r'\b(\d+(?:,\d+)*(?:\.\d{2})?)\b',
-        ]
-        
-        amount = None
-        for pattern in amount_patterns:
-            matches = re.findall(pattern, message)
-            if matches:
-                try:
-                    amounts = [float(match.replace(',', '')) for match in matches]
-                    amount = max(amounts)
-                    break
-                except ValueError:
-                    continue
+    def period_summary_from_row(self, row):
+        """Map a Period_Summary sheet row to a dict"""
+        return {
+            'Year': int(row[0]), 'Month': row[1], 'Week_Number': row[2] or 1, 'Sheet': row[3],
+            'Group': row[4] or '', 'Status': row[5] or '', 'Count': int(row[6] or 0),
+            'Amount': row[7] or 0, 'Last_ID': row[8] or ''
+        }
+    
+    def customer_summary_from_row(self, row):
+        """Map a Customer_Summary sheet row to a dict"""
+        return {
+            'Customer_ID': row[0], 'Customer_Name': row[1] or '', 'Services': int(row[2] or 0),
+            'Service_Types': [service for service in (row[3] or '').split(';') if service],
+            'Total_Spent': row[4] or 0, 'Last_Service_Date': row[5]
+        }
+    
+    def parse_business_workbook(self, workbook):
+        """Parse comprehensive business data with updated column structure"""
+        try:
+            # Customer journeys, period rollups and running totals, kept up to date as rows are appended
+            data = {
+                'index': LedgerIndex(), 'rollups': PeriodRollups(self.calculate_week_of_month),
+                'aggregates': BusinessAggregates(), 'period_summaries': [], 'customer_summaries': [],
+                # The live rows themselves aren't kept, only their IDs (to check new ones against) and counts
+                'transaction_ids': set(), 'row_counts': dict.fromkeys(SHEET_COLUMNS, 0)
+            }
+            data['customer_journey'] = data['index'].customer_journey
+            with self.metrics.span('workbook_parse'):
+                # Archived months come in as summaries, ahead of the live rows, which go straight into the totals
+                for sheet_name, row in self.workbook_rows(workbook):
+                    if not (row and row[0]):
+                        continue
+                    if sheet_name == 'Period_Summary':
+                        summary = self.period_summary_from_row(row)
+                        data['period_summaries'].append(summary)
+                        data['rollups'].add_period_summary(summary)
+                    elif sheet_name == 'Customer_Summary':
+                        customer = self.customer_summary_from_row(row)
+                        data['customer_summaries'].append(customer)
+                        data['index'].add_customer_summary(customer)
+                    else:
+                        self.fold_row(data, sheet_name, row)
+            
+            with self.metrics.span('aggregate'):
+                for summary in data['period_summaries']:
+                    data['aggregates'].add_period_summary(summary)
+                for customer in data['customer_summaries']:
+                    data['aggregates'].add_customer_summary(customer)
+            data.update(data['aggregates'].summary())
+            return data
+            
+        except Exception as e:
+            logger.error(f"Error parsing business data: {str(e)}")
+            return None
+    
+    def fold_row(self, data, sheet_name, row):
+        """Add one Operations, Revenue or Expenses row to the snapshot's index, rollups and totals"""
+        data['row_counts'][sheet_name] += 1
+        if sheet_name == 'Operations':
+            op = self.operation_from_row(row)
+            for sink in (data['index'], data['rollups'], data['aggregates']):
+                sink.add_operation(op)
+            return
+        data['transaction_ids'].add(row[0])
+        if sheet_name == 'Revenue':
+            rev = self.revenue_from_row(row)
+            for sink in (data['index'], data['rollups'], data['aggregates']):
+                sink.add_revenue(rev)
+        else:
+            exp = self.expense_from_row(row)
+            for sink in (data['rollups'], data['aggregates']):
+                sink.add_expense(exp)
+    
+    def apply_appended_rows(self, data, appended_rows):
+        """Fold rows written by this process into the snapshot without re-parsing"""
+        for sheet_name, row in appended_rows:
+            if not row[0] or sheet_name not in SHEET_COLUMNS:
+                continue
+            self.id_allocator.observe(row[0])
+            self.fold_row(data, sheet_name, row)
+        data.update(data['aggregates'].summary())
+        return data
+    
+    def archive_cutoff(self, today):
+        """First day of the oldest month that stays live"""
+        month_number = today.year * 12 + today.month - 1 - (self.archive_keep_months - 1)
+        return date(month_number // 12, month_number % 12 + 1, 1)
+    
+    def row_day(self, sheet_name, row):
+        """Service or expense date of a sheet row, None if it has none"""
+        value = row[1] if sheet_name == 'Expenses' else row[2]
+        if isinstance(value, datetime):
+            return value.date()
+        return value if isinstance(value, date) else None
+    
+    def period_summary_rows(self, archived):
+        """Period_Summary rows for archived sheet rows: counts and amounts per week, sheet and group"""
+        groups = {}
+        for (year, month), rows_by_sheet in sorted(archived.items()):
+            for sheet_name, rows in rows_by_sheet.items():
+                for row in rows:
+                    if sheet_name == 'Operations':
+                        op = self.operation_from_row(row)
+                        key = (year, op['Month'], op['Week_Number'], sheet_name, '', op['Service_Completed'])
+                        amount, identifier = 0, ''
+                    elif sheet_name == 'Revenue':
+                        rev = self.revenue_from_row(row)
+                        key = (year, rev['Month'], rev['Week_Number'], sheet_name, rev['Service_Type'], rev['Payment_Status'])
+                        amount, identifier = rev['Amount'], rev['Transaction_Id']
+                    else:
+                        exp = self.expense_from_row(row)
+                        key = (year, exp['Month'], self.calculate_week_of_month(self.row_day(sheet_name, row)),
+                               sheet_name, exp['Category'], '')
+                        amount, identifier = exp['Amount'], exp['Transaction_ID']
+                    group = groups.setdefault(key, [0, 0, ''])
+                    group[0] += 1
+                    group[1] += amount
+                    if self.id_allocator.number_of(identifier) > self.id_allocator.number_of(group[2]):
+                        group[2] = identifier
+        return [list(key) + [count, round(amount, 2), last_id] for key, (count, amount, last_id) in groups.items()]
+    
+    def customer_summary_rows(self, customer_summaries, archived):
+        """Customer_Summary rows: the existing ones with the newly archived visits and spend added"""
+        customers = {customer['Customer_ID']: dict(customer, Service_Types=list(customer['Service_Types']))
+                     for customer in customer_summaries}
         
-        # Extract supplier
-        supplier_patterns = [
-            r'(?:paid|pay|from|to|bought from|purchased from)\s+([A-Za-z][A-Za-z\s]+?)(?:\s|$|for|,|\d)',
-            r'([A-Za-z][A-Za-z\s]+(?:suppliers?|store|shop|company|ltd|pty|co))',
-            r'(?:supplier|vendor):\s*([A-Za-z][A-Za-z\s]+)',
-        ]
+        def customer(customer_id, name=''):
+            return customers.setdefault(customer_id, {'Customer_ID': customer_id, 'Customer_Name': name, 'Services': 0,
+                                                      'Service_Types': [], 'Total_Spent': 0, 'Last_Service_Date': None})
         
-        supplier = None
-        for pattern in supplier_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                potential_supplier = match.group(1).strip()
-                potential_supplier = re.sub(r'\s+', ' ', potential_supplier)
-                if len(potential_supplier) > 1 and not potential_supplier.isdigit():
-                    supplier = potential_supplier
-                    break
+        for key, rows_by_sheet in sorted(archived.items()):
+            for row in rows_by_sheet.get('Operations', []):
+                op = self.operation_from_row(row)
+                entry = customer(op['Customer_ID'], op['Customer_Name'])
+                entry['Services'] += 1
+                entry['Customer_Name'] = entry['Customer_Name'] or op['Customer_Name']
+                if entry['Last_Service_Date'] is None or op['Service_Date'] > entry['Last_Service_Date']:
+                    entry['Last_Service_Date'] = op['Service_Date']
+            for row in rows_by_sheet.get('Revenue', []):
+                rev = self.revenue_from_row(row)
+                entry = customer(rev['Customer_id'])
+                entry['Total_Spent'] += rev['Amount']
+                if rev['Service_Type'] not in entry['Service_Types']:
+                    entry['Service_Types'].append(rev['Service_Type'])
+        return [[entry['Customer_ID'], entry['Customer_Name'], entry['Services'], ';'.join(entry['Service_Types']),
+                 round(entry['Total_Spent'], 2), entry['Last_Service_Date']] for entry in customers.values()]
+    
+    def rewrite_sheet(self, sheet, rows):
+        """Replace a sheet's data rows, styling each column like its first data row was"""
+        styles = [copy(cell._style) for cell in sheet[2]] if sheet.max_row >= 2 else []
+        if sheet.max_row >= 2:
+            sheet.delete_rows(2, sheet.max_row - 1)
+        for row_number, row in enumerate(rows, start=2):
+            for column, value in enumerate(row, start=1):
+                cell = sheet.cell(row=row_number, column=column, value=value)
+                if column <= len(styles):
+                    cell._style = copy(styles[column - 1])
+    
+    def archive_closed_months(self):
+        """Move closed months out of the live workbook into per-month archives, leaving summary rows behind"""
+        try:
+            with self.metrics.span('archive'), self.write_lock:
+                # Journaled rows must be on Drive before the workbook is rewritten
+                if self.journal and not self.flush_pending_writes():
+                    return None
+                return self._archive_closed_months()
+        except Exception as e:
+            logger.error(f"Error archiving closed months: {str(e)}")
+            return None
+    
+    def _archive_closed_months(self):
+        """Archive every row dated before the cutoff, then upload the trimmed workbook if Drive hasn't moved"""
+        self.invalidate_snapshot()
+        revision = self.get_drive_revision()
+        content = self.download_workbook_content()
+        if not content:
+            return None
+        workbook = openpyxl.load_workbook(io.BytesIO(content))
+        data = self.parse_business_workbook(workbook)
+        if not data:
+            return None
         
-        # Category detection
-        category_keywords = {
-            'Supplies': ['soap', 'chemical', 'detergent', 'wax', 'towel', 'bucket', 'supplies', 'cleaning', 'brushes'],
-            'Equipment': ['hose', 'machine', 'vacuum', 'pressure', 'equipment', 'tool', 'replacement'],
-            'Utilities': ['water', 'electricity', 'power', 'utility', 'bill'],
-            'Staff': ['salary', 'wage', 'pay', 'employee', 'worker', 'staff'],
-            'Marketing': ['advert', 'marketing', 'promotion', 'flyer', 'social media'],
-            'Fuel': ['petrol', 'diesel', 'fuel', 'gas'],
-            'Maintenance': ['repair', 'fix', 'service', 'maintenance', 'upkeep']
-        }
+        cutoff = self.archive_cutoff(self.get_sa_datetime().date())
+        archived = {}
+        kept = {}
+        for sheet_name, columns in SHEET_COLUMNS.items():
+            kept[sheet_name] = []
+            for row in workbook[sheet_name].iter_rows(min_row=2, max_col=len(columns), values_only=True):
+                day = self.row_day(sheet_name, row)
+                if row[0] and day and day < cutoff:
+                    archived.setdefault((day.year, day.month), {}).setdefault(sheet_name, []).append(row)
+                elif any(value is not None for value in row):
+                    kept[sheet_name].append(row)
+        if not archived:
+            return {'archived_months': [], 'archived_rows': 0,
+                    'live_rows': sum(len(rows) for rows in kept.values()), 'revision': revision}
         
-        category = 'Other'
-        message_lower = message.lower()
-        for cat, keywords in category_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                category = cat
-                break
+        # Archives first: if the live upload fails the rows are still live, and a rerun skips what is already archived
+        for (year, month), rows_by_sheet in sorted(archived.items()):
+            if not self.archive.store(year, month, rows_by_sheet):
+                logger.error(f"Could not store the archive for {year}-{month:02d}")
+                return None
         
-        return {
-            'amount': amount,
-            'supplier': supplier,
-            'category': category,
-            'description': message[:100].strip()
-        }
+        for sheet_name in SHEET_COLUMNS:
+            self.rewrite_sheet(workbook[sheet_name], kept[sheet_name])
+        for sheet_name, columns in SUMMARY_SHEET_COLUMNS.items():
+            if sheet_name not in workbook.sheetnames:
+                workbook.create_sheet(sheet_name).append(columns)
+        for row in self.period_summary_rows(archived):
+            workbook['Period_Summary'].append(row)
+        self.rewrite_sheet(workbook['Customer_Summary'],
+                           self.customer_summary_rows(data['customer_summaries'], archived))
+        
+        new_revision = self.save_workbook_if_unchanged(workbook, revision)
+        self.invalidate_snapshot()
+        if new_revision is False:
+            logger.warning("Workbook changed on Google Drive while archiving; will retry on the next run")
+            return None
+        if not new_revision:
+            return None
+        
+        archived_rows = sum(len(rows) for rows_by_sheet in archived.values() for rows in rows_by_sheet.values())
+        logger.info(f"Archived {archived_rows} rows from {len(archived)} closed months")
+        return {'archived_months': [f"{year}-{month:02d}" for year, month in sorted(archived)],
+                'archived_rows': archived_rows, 'live_rows': sum(len(rows) for rows in kept.values()),
+                'revision': new_revision}
     
-    def ask_for_missing_info(self, data_type, extracted_info, phone_number):
-        """Ask for missing information in column order"""
+    def find_customer(self, customer_name, data_context):
+        """(Customer_ID, Customer_Name) of the existing customer a logged name refers to, or None for a new one"""
+        with self.metrics.span('customer_lookup'):
+            customers = data_context.customer_index()
+            match = customers.lookup(customer_name) if customers is not None else None
+        self.metrics.increment('customer_matches_total', result=match[2] if match else 'new')
+        return match[:2] if match else None
+    
+    def generate_customer_id(self, data_context=None):
+        """Generate next customer ID"""
+        try:
+            return self.open_data_context(data_context).allocate_id('CW')
+        except:
+            return f"CW{str(random.randint(100, 999))}"
+    
+    def extract_service_info(self, message):
+        """Extract comprehensive service information with intelligent prompting"""
+        return self.extractor.extract_service(message)
+    
+    def extract_expense_info(self, message):
+        """Intelligently extract expense information"""
+        return self.extractor.extract_expense(message)
+    
+    def missing_info_questions(self, data_type, extracted_info):
+        """Questions for the fields a service or expense still needs, in column order"""
+        missing_info = []
         if data_type == 'service':
-            missing_info = []
-            
             if not extracted_info.get('customer_name'):
                 missing_info.append("What's the customer's name?")
             
@@ -394,12 +3119,7 @@ class IntelligentBusinessAssistant:
             if not extracted_info.get('amount'):
                 missing_info.append("What's the service amount in Rand?")
             
-            if missing_info:
-                return f"I need a few more details, Moloi: {' '.join(missing_info)}"
-            
         elif data_type == 'expense':
-            missing_info = []
-            
             if not extracted_info.get('amount'):
                 missing_info.append("How much was the expense in Rand?")
                 
@@ -408,130 +3128,243 @@ class IntelligentBusinessAssistant:
                 
             if not extracted_info.get('category') or extracted_info.get('category') == 'Other':
                 missing_info.append("What category? (Supplies, Equipment, Utilities, Staff, Marketing, Fuel, or Maintenance)")
-            
-            if missing_info:
-                return f"I need more details for the expense, Moloi: {' '.join(missing_info)}"
         
-        return None
+        return missing_info
+    
+    def ask_for_missing_info(self, data_type, extracted_info, phone_number):
+        """Ask for missing information in column order"""
+        missing_info = self.missing_info_questions(data_type, extracted_info)
+        if not missing_info:
+            return None
+        if data_type == 'service':
+            return f"I need a few more details, {self.owner_name}: {' '.join(missing_info)}"
+        return f"I need more details for the expense, {self.owner_name}: {' '.join(missing_info)}"
     
-    def save_complete_service(self, service_data):
+    def save_complete_service(self, service_data, data_context=None):
         """Save service to both Operations and Revenue sheets with updated structure"""
-        try:
-            local_file = self.download_excel_from_drive()
-            if not local_file:
+        data_context = self.open_data_context(data_context)
+        # Still under the write lock on failure, so no other writer picks up the half-written workbook
+        with self.write_lock:
+            try:
+                with self.metrics.span('save_service'):
+                    return self._save_complete_service(service_data, data_context)
+            except Exception as e:
+                logger.error(f"Error saving complete service: {str(e)}")
+                self.discard_writes(data_context)
                 return None
-                
-            workbook = openpyxl.load_workbook(local_file)
-            
-            # Generate customer ID
-            customer_id = self.generate_customer_id()
-            
-            # Get SA date and time
-            sa_now = self.get_sa_datetime()
-            current_date = sa_now.date()
-            current_week = self.calculate_week_of_month(current_date)
-            current_month = sa_now.strftime('%B')
-            
-            # Save to Operations sheet (9 columns)
-            operations_sheet = workbook['Operations']
-            ops_row = operations_sheet.max_row + 1
-            
-            operations_sheet.cell(row=ops_row, column=1, value=customer_id)  # Customer_ID
-            operations_sheet.cell(row=ops_row, column=2, value=service_data['customer_name'] or 'Walk-in Customer')  # Customer_Name
-            operations_sheet.cell(row=ops_row, column=3, value=current_date)  # Service_Date
-            operations_sheet.cell(row=ops_row, column=4, value=current_week)  # Week_Number
-            operations_sheet.cell(row=ops_row, column=5, value=current_month)  # Month
-            operations_sheet.cell(row=ops_row, column=6, value='Yes')  # Service_Completed
-            operations_sheet.cell(row=ops_row, column=7, value=service_data['service_type'] or 'General Service')  # Service_Type
-            operations_sheet.cell(row=ops_row, column=8, value='Logged via WhatsApp')  # Notes
-            operations_sheet.cell(row=ops_row, column=9, value='Completed')  # Status
-            
-            # Save to Revenue sheet (10 columns with new structure)
-            revenue_sheet = workbook['Revenue']
-            rev_row = revenue_sheet.max_row + 1
-            transaction_id = f"REV{str(rev_row-1).zfill(3)}"
-            
-            revenue_sheet.cell(row=rev_row, column=1, value=transaction_id)  # Transaction_Id
-            revenue_sheet.cell(row=rev_row, column=2, value=customer_id)  # Customer_id
-            revenue_sheet.cell(row=rev_row, column=3, value=current_date)  # Service_Date
-            revenue_sheet.cell(row=rev_row, column=4, value=current_month)  # Month
-            revenue_sheet.cell(row=rev_row, column=5, value=service_data['service_type'] or 'General Service')  # Service_Type
-            revenue_sheet.cell(row=rev_row, column=6, value=float(service_data['amount']))  # Amount
-            revenue_sheet.cell(row=rev_row, column=7, value=service_data.get('payment_status', 'Paid'))  # Payment Status
-            revenue_sheet.cell(row=rev_row, column=8, value=service_data['payment_method'])  # Payment_Method
-            revenue_sheet.cell(row=rev_row, column=9, value='Washed' if service_data.get('payment_status') == 'Paid' else 'Not yet Washed')  # Status
-            revenue_sheet.cell(row=rev_row, column=10, value=current_week)  # Week_Number (Column 10)
-            
-            workbook.save(local_file)
-            upload_success = self.upload_excel_to_drive(local_file)
-            os.unlink(local_file)
-            
-            return {
-                'customer_id': customer_id,
-                'transaction_id': transaction_id,
-                'success': upload_success
-            }
-        except Exception as e:
-            logger.error(f"Error saving complete service: {str(e)}")
+    
+    def _save_complete_service(self, service_data, data_context):
+        """Append one service through the request's data context and commit once"""
+        if not data_context.load():
             return None
+        
+        # Returning customers keep their ID and name as first logged; only new names get a fresh ID
+        existing = self.find_customer(service_data['customer_name'], data_context)
+        if existing:
+            customer_id, customer_name = existing
+            service_data = dict(service_data, customer_name=customer_name)
+        else:
+            customer_id = self.generate_customer_id(data_context)
+        transaction_id = data_context.allocate_id('REV')
+        
+        self.append_service_rows(service_data, data_context, customer_id, transaction_id, self.get_sa_datetime())
+        
+        upload_revision = data_context.commit()
+        
+        return {
+            'customer_id': data_context.final_id(customer_id),
+            'customer_name': service_data['customer_name'],
+            'returning': existing is not None,
+            'transaction_id': data_context.final_id(transaction_id),
+            'success': upload_revision is not None
+        }
+    
+    def append_service_rows(self, service_data, data_context, customer_id, transaction_id, sa_now):
+        """Operations and Revenue rows for one service, without committing"""
+        current_date = sa_now.date()
+        current_week = self.calculate_week_of_month(current_date)
+        current_month = sa_now.strftime('%B')
+        
+        # Save to Operations sheet (9 columns)
+        data_context.append_row('Operations', (
+            customer_id,  # Customer_ID
+            service_data['customer_name'] or 'Walk-in Customer',  # Customer_Name
+            current_date,  # Service_Date
+            current_week,  # Week_Number
+            current_month,  # Month
+            'Yes',  # Service_Completed
+            service_data['service_type'] or 'General Service',  # Service_Type
+            'Logged via WhatsApp',  # Notes
+            'Completed'  # Status
+        ))
+        
+        # Save to Revenue sheet (10 columns with new structure)
+        data_context.append_row('Revenue', (
+            transaction_id,  # Transaction_Id
+            customer_id,  # Customer_id
+            current_date,  # Service_Date
+            current_month,  # Month
+            service_data['service_type'] or 'General Service',  # Service_Type
+            float(service_data['amount']),  # Amount
+            service_data.get('payment_status', 'Paid'),  # Payment Status
+            service_data['payment_method'],  # Payment_Method
+            'Washed' if service_data.get('payment_status') == 'Paid' else 'Not yet Washed',  # Status
+            current_week  # Week_Number (Column 10)
+        ))
     
-    def save_expense(self, expense_data):
+    def save_expense(self, expense_data, data_context=None):
         """Save expense with updated structure"""
-        try:
-            local_file = self.download_excel_from_drive()
-            if not local_file:
+        data_context = self.open_data_context(data_context)
+        with self.write_lock:
+            try:
+                with self.metrics.span('save_expense'):
+                    return self._save_expense(expense_data, data_context)
+            except Exception as e:
+                logger.error(f"Error saving expense: {str(e)}")
+                self.discard_writes(data_context)
                 return None
-                
-            workbook = openpyxl.load_workbook(local_file)
-            sheet = workbook['Expenses']
-            
-            next_row = sheet.max_row + 1
-            transaction_id = f"EXP{str(next_row-1).zfill(3)}"
-            
-            # Get SA date
-            sa_now = self.get_sa_datetime()
-            current_date = sa_now.date()
-            current_month = sa_now.strftime('%B')
-            
-            sheet.cell(row=next_row, column=1, value=transaction_id)  # Transaction_ID
-            sheet.cell(row=next_row, column=2, value=current_date)  # Date
-            sheet.cell(row=next_row, column=3, value=current_month)  # Month
-            sheet.cell(row=next_row, column=4, value=expense_data['category'])  # Category
-            sheet.cell(row=next_row, column=5, value=expense_data['description'])  # Description
-            sheet.cell(row=next_row, column=6, value=-abs(float(expense_data['amount'])))  # Amount (negative)
-            sheet.cell(row=next_row, column=7, value=expense_data['supplier'] or 'Unknown')  # Supplier/Receiver
-            sheet.cell(row=next_row, column=8, value='Recorded')  # Status
-            sheet.cell(row=next_row, column=9, value='Added via WhatsApp')  # Notes
-            
-            workbook.save(local_file)
-            upload_success = self.upload_excel_to_drive(local_file)
-            os.unlink(local_file)
-            
-            return transaction_id if upload_success else None
-        except Exception as e:
-            logger.error(f"Error saving expense: {str(e)}")
+    
+    def _save_expense(self, expense_data, data_context):
+        """Append one expense through the request's data context and commit once"""
+        if not data_context.load():
+            return None
+        
+        transaction_id = data_context.allocate_id('EXP')
+        
+        self.append_expense_row(expense_data, data_context, transaction_id, self.get_sa_datetime())
+        
+        upload_revision = data_context.commit()
+        
+        return data_context.final_id(transaction_id) if upload_revision else None
+    
+    def append_expense_row(self, expense_data, data_context, transaction_id, sa_now):
+        """Expenses row for one expense, without committing"""
+        current_date = sa_now.date()
+        current_month = sa_now.strftime('%B')
+        
+        data_context.append_row('Expenses', (
+            transaction_id,  # Transaction_ID
+            current_date,  # Date
+            current_month,  # Month
+            expense_data['category'],  # Category
+            expense_data['description'],  # Description
+            -abs(float(expense_data['amount'])),  # Amount (negative)
+            expense_data['supplier'] or 'Unknown',  # Supplier/Receiver
+            'Recorded',  # Status
+            'Added via WhatsApp'  # Notes
+        ))
+    
+    def save_bulk_records(self, records, data_context=None):
+        """Log a batch of services and expenses with one load, one save and one upload"""
+        data_context = self.open_data_context(data_context)
+        with self.write_lock:
+            try:
+                with self.metrics.span('save_bulk'):
+                    return self._save_bulk_records(records, data_context)
+            except Exception as e:
+                logger.error(f"Error saving bulk records: {str(e)}")
+                self.discard_writes(data_context)
+                return None
+    
+    def _save_bulk_records(self, records, data_context):
+        """Append every record through one data context, with IDs reserved per prefix up front, and commit once"""
+        if not data_context.load():
+            return None
+        
+        services = [record for record in records if record['kind'] == 'service']
+        # Returning customers keep their ID; repeats of one new name within the batch share a fresh one
+        existing = [self.find_customer(record['info']['customer_name'], data_context) for record in services]
+        new_keys = [CustomerIndex.key(record['info']['customer_name']) or ('unnamed', position)
+                    for position, (record, match) in enumerate(zip(services, existing)) if match is None]
+        new_ids = dict(zip(dict.fromkeys(new_keys), data_context.allocate_ids('CW', len(set(new_keys)))))
+        customers = iter(existing)
+        new_keys = iter(new_keys)
+        revenue_ids = iter(data_context.allocate_ids('REV', len(services)))
+        expense_ids = iter(data_context.allocate_ids('EXP', len(records) - len(services)))
+        
+        # One timestamp for the batch, as if every record had been sent in the same minute
+        sa_now = self.get_sa_datetime()
+        saved = []
+        for record in records:
+            if record['kind'] == 'service':
+                match = next(customers)
+                if match:
+                    record = dict(record, info=dict(record['info'], customer_name=match[1]))
+                ids = (match[0] if match else new_ids[next(new_keys)], next(revenue_ids))
+                self.append_service_rows(record['info'], data_context, ids[0], ids[1], sa_now)
+            else:
+                ids = (next(expense_ids),)
+                self.append_expense_row(record['info'], data_context, ids[0], sa_now)
+            saved.append({**record, 'ids': ids})
+        
+        if data_context.commit() is None:
             return None
+        for record in saved:
+            record['ids'] = tuple(data_context.final_id(identifier) for identifier in record['ids'])
+        return saved
+    
+    def import_records(self, bulk, data_context=None):
+        """Save the complete records of a parsed batch; incomplete and unrecognised lines are reported back"""
+        complete = []
+        incomplete = []
+        for record in bulk['records']:
+            questions = self.missing_info_questions(record['kind'], record['info'])
+            if questions:
+                incomplete.append({'line': record['line'], 'text': record['text'], 'missing': questions})
+            else:
+                complete.append(record)
+        
+        saved = self.save_bulk_records(complete, data_context) if complete else []
+        return {'saved': saved, 'incomplete': incomplete, 'skipped': bulk['skipped'], 'success': saved is not None}
+    
+    def bulk_summary(self, result):
+        """One WhatsApp reply covering every line of a bulk message"""
+        if not result['success']:
+            return f"Sorry {self.owner_name}, I couldn't save those records. Please send them again."
+        
+        lines = []
+        services = [record for record in result['saved'] if record['kind'] == 'service']
+        expenses = [record for record in result['saved'] if record['kind'] == 'expense']
+        if result['saved']:
+            lines.append(f"Logged {len(result['saved'])} records in one go, {self.owner_name}:")
+        for record in result['saved']:
+            info = record['info']
+            if record['kind'] == 'service':
+                lines.append(f"{record['ids'][0]} ({info['customer_name']}) - {info['service_type']} "
+                             f"R{info['amount']:,.0f} ({info['payment_status']})")
+            else:
+                lines.append(f"{record['ids'][0]} - R{info['amount']:,.0f} to {info['supplier']} for {info['category']}")
+        if services or expenses:
+            lines.append(f"Services R{sum(record['info']['amount'] for record in services):,.0f} from {len(services)} jobs, "
+                         f"expenses R{sum(record['info']['amount'] for record in expenses):,.0f}.")
+        if result['incomplete']:
+            lines.append("Not logged, I need more details:")
+            lines.extend(f"Line {record['line']} ({record['text'][:40]}): {' '.join(record['missing'])}"
+                         for record in result['incomplete'])
+        if result['skipped']:
+            lines.append("Not a service or expense: " + ', '.join(f"line {record['line']}" for record in result['skipped']))
+        return '\n'.join(lines)
     
-    def analyze_cash_flow(self):
+    def analyze_cash_flow(self, data_context=None):
         """Simple cash flow analysis"""
-        data = self.load_business_data()
+        data = self.load_business_data(data_context)
         if not data:
-            return "Can't access business data right now, Moloi."
+            return f"Can't access business data right now, {self.owner_name}."
         
         cash_in = data['total_revenue']
         cash_out = data['total_expenses']
         net_cash_flow = cash_in - cash_out
         
         if net_cash_flow > 0:
-            return f"Cash flow is positive, Moloi. R{cash_in:,.0f} coming in, R{cash_out:,.0f} going out. Net cash flow: R{net_cash_flow:,.0f}."
+            return f"Cash flow is positive, {self.owner_name}. R{cash_in:,.0f} coming in, R{cash_out:,.0f} going out. Net cash flow: R{net_cash_flow:,.0f}."
         else:
-            return f"Cash flow is negative, Moloi. R{cash_in:,.0f} coming in, R{cash_out:,.0f} going out. You're short R{abs(net_cash_flow):,.0f}."
+            return f"Cash flow is negative, {self.owner_name}. R{cash_in:,.0f} coming in, R{cash_out:,.0f} going out. You're short R{abs(net_cash_flow):,.0f}."
     
-    def create_simple_income_statement(self):
+    def create_simple_income_statement(self, data_context=None):
         """Basic income statement"""
-        data = self.load_business_data()
+        data = self.load_business_data(data_context)
         if not data:
-            return "Can't access business data, Moloi."
+            return f"Can't access business data, {self.owner_name}."
         
         revenue = data['total_revenue']
         expenses = data['total_expenses'] 
@@ -566,19 +3399,19 @@ class IntelligentBusinessAssistant:
         if term_lower in explanations:
             return f"{term.title()}: {explanations[term_lower]}"
         else:
-            return f"Not sure about that term, Moloi. Ask me about profit, revenue, expenses, cash flow, or margins."
+            return f"Not sure about that term, {self.owner_name}. Ask me about profit, revenue, expenses, cash flow, or margins."
     
-    def generate_enhanced_report(self):
+    def generate_enhanced_report(self, data_context=None):
         """Generate business insights with new metrics"""
-        data = self.load_business_data()
+        data = self.load_business_data(data_context)
         if not data:
-            return "Sorry Moloi, can't access business data right now. Try again in a moment."
+            return f"Sorry {self.owner_name}, can't access business data right now. Try again in a moment."
         
         # Financial summary
         if data['net_profit'] > 0:
-            report = f"Business is profitable, Moloi. Revenue R{data['total_revenue']:,.0f}, expenses R{data['total_expenses']:,.0f}. You made R{data['net_profit']:,.0f} profit."
+            report = f"Business is profitable, {self.owner_name}. Revenue R{data['total_revenue']:,.0f}, expenses R{data['total_expenses']:,.0f}. You made R{data['net_profit']:,.0f} profit."
         else:
-            report = f"Business is making a loss, Moloi. Revenue R{data['total_revenue']:,.0f}, expenses R{data['total_expenses']:,.0f}. Loss of R{abs(data['net_profit']):,.0f}."
+            report = f"Business is making a loss, {self.owner_name}. Revenue R{data['total_revenue']:,.0f}, expenses R{data['total_expenses']:,.0f}. Loss of R{abs(data['net_profit']):,.0f}."
         
         # Payment status
         report += f" Payment rate: {data['payment_rate']:.1f}% (R{data['paid_revenue']:,.0f} collected)."
@@ -599,16 +3432,298 @@ class IntelligentBusinessAssistant:
         
         return report
     
-    def process_natural_message(self, message, phone_number):
-        """Enhanced message processing with updated column awareness"""
-        context = self.conversations.get(phone_number, {'history': []})
-        context['history'].append({'user': message, 'timestamp': datetime.now()})
+    def resolve_periods(self, periods, rollups):
+        """(year, month, week) for each period in a message; a bare week takes the month before it"""
+        today = self.get_sa_datetime()
+        resolved = []
+        for period in periods:
+            if period[0] == 'relative':
+                kind, which, unit = period
+                if unit == 'week':
+                    day = today if which == 'this' else today - timedelta(days=7)
+                    resolved.append((day.year, day.strftime('%B'), self.calculate_week_of_month(day)))
+                else:
+                    day = today if which == 'this' else today.replace(day=1) - timedelta(days=1)
+                    resolved.append((day.year, day.strftime('%B'), None))
+            else:
+                kind, month, year, week = period
+                if month is None:
+                    year, month = resolved[-1][:2] if resolved else (today.year, today.strftime('%B'))
+                elif year is None:
+                    year = rollups.latest_year(month, today.year)
+                resolved.append((year, month, week))
+        return resolved
+    
+    def period_label(self, period, sentence_start=False):
+        """Readable name for a (year, month, week) period"""
+        year, month, week = period
+        if week:
+            return f"{'Week' if sentence_start else 'week'} {week} of {month} {year}"
+        return f"{month} {year}"
+    
+    def period_change(self, current, previous):
+        """Change between two period totals, in words"""
+        if previous == current:
+            return "no change"
+        if not previous:
+            return "up from nothing"
+        change = (current - previous) / abs(previous) * 100
+        return f"{'up' if change > 0 else 'down'} {abs(change):.1f}%"
+    
+    def load_period_totals(self, periods, data_context):
+        """Resolved periods with their rollup totals, or None when business data is unavailable"""
+        data = self.load_business_data(data_context)
+        if not data:
+            return None
+        rollups = data['rollups']
+        return [(period, rollups.period(*period)) for period in self.resolve_periods(periods, rollups)]
+    
+    def generate_period_report(self, periods, data_context=None):
+        """Report for one period, or the first period compared with the second"""
+        totals = self.load_period_totals(periods, data_context)
+        if not totals:
+            return f"Sorry {self.owner_name}, can't access business data right now. Try again in a moment."
         
-        business_data = self.load_business_data()
+        (period, current), rest = totals[0], totals[1:]
+        profit = current['revenue'] - current['expenses']
+        if rest:
+            previous_period, previous = rest[0]
+            previous_profit = previous['revenue'] - previous['expenses']
+            report = (f"{self.period_label(period, True)} vs {self.period_label(previous_period)}, {self.owner_name}: "
+                      f"revenue R{current['revenue']:,.0f} vs R{previous['revenue']:,.0f} ({self.period_change(current['revenue'], previous['revenue'])}), "
+                      f"expenses R{current['expenses']:,.0f} vs R{previous['expenses']:,.0f} ({self.period_change(current['expenses'], previous['expenses'])}), "
+                      f"profit R{profit:,.0f} vs R{previous_profit:,.0f} ({self.period_change(profit, previous_profit)}). "
+                      f"{current['services']} services vs {previous['services']}.")
+        else:
+            report = (f"{self.period_label(period, True)}, {self.owner_name}: revenue R{current['revenue']:,.0f} from "
+                      f"{current['services']} services, expenses R{current['expenses']:,.0f}. "
+                      f"{'Profit' if profit >= 0 else 'Loss'} R{abs(profit):,.0f}.")
         
-        # Get SA date for context
-        sa_now = self.get_sa_datetime()
-        today_sa = sa_now.strftime('%d %B %Y')
+        if not current['services'] and not current['expenses']:
+            return report + " Nothing was recorded in that period."
+        
+        # Payment status and best service / biggest expense within the period
+        if current['revenue'] > 0:
+            report += f" Payment rate: {current['paid_revenue'] / current['revenue'] * 100:.1f}%."
+        if current['by_service']:
+            best_service = max(current['by_service'].items(), key=lambda x: x[1]['revenue'])
+            report += f" Best service: {best_service[0]} with R{best_service[1]['revenue']:,.0f} from {best_service[1]['count']} jobs."
+        if current['by_category']:
+            category = max(current['by_category'].items(), key=lambda x: x[1])
+            report += f" Biggest expense: {category[0]} (R{category[1]:,.0f})."
+        return report
+    
+    def analyze_period_cash_flow(self, periods, data_context=None):
+        """Cash flow for one period, with the second period's net flow for comparison"""
+        totals = self.load_period_totals(periods, data_context)
+        if not totals:
+            return f"Can't access business data right now, {self.owner_name}."
+        
+        (period, current), rest = totals[0], totals[1:]
+        cash_in = current['revenue']
+        cash_out = current['expenses']
+        net_cash_flow = cash_in - cash_out
+        
+        label = self.period_label(period)
+        if net_cash_flow > 0:
+            report = f"Cash flow for {label} is positive, {self.owner_name}. R{cash_in:,.0f} coming in, R{cash_out:,.0f} going out. Net cash flow: R{net_cash_flow:,.0f}."
+        else:
+            report = f"Cash flow for {label} is negative, {self.owner_name}. R{cash_in:,.0f} coming in, R{cash_out:,.0f} going out. You're short R{abs(net_cash_flow):,.0f}."
+        if rest:
+            previous_period, previous = rest[0]
+            previous_net = previous['revenue'] - previous['expenses']
+            report += f" {self.period_label(previous_period, True)} net cash flow was R{previous_net:,.0f} ({self.period_change(net_cash_flow, previous_net)})."
+        return report
+    
+    def create_period_income_statement(self, periods, data_context=None):
+        """Income statement for one period, side by side with the second when given"""
+        totals = self.load_period_totals(periods, data_context)
+        if not totals:
+            return f"Can't access business data, {self.owner_name}."
+        
+        labels = ' vs '.join(self.period_label(period) for period, bucket in totals[:2])
+        columns = [bucket for period, bucket in totals[:2]]
+        
+        report = f"INCOME STATEMENT ({labels}):\n"
+        report += "Revenue: " + ' | '.join(f"R{bucket['revenue']:,.0f}" for bucket in columns) + "\n"
+        report += "Expenses: " + ' | '.join(f"R{bucket['expenses']:,.0f}" for bucket in columns) + "\n"
+        for category in sorted(set().union(*(bucket['by_category'] for bucket in columns))):
+            report += f"  {category}: " + ' | '.join(f"R{bucket['by_category'].get(category, 0):,.0f}" for bucket in columns) + "\n"
+        report += "Net Income: " + ' | '.join(f"R{bucket['revenue'] - bucket['expenses']:,.0f}" for bucket in columns) + "\n"
+        
+        net_income = columns[0]['revenue'] - columns[0]['expenses']
+        if net_income > 0:
+            report += f"You made a profit of R{net_income:,.0f}"
+        else:
+            report += f"You made a loss of R{abs(net_income):,.0f}"
+        return report
+    
+    def generate_week_digest(self, data_context=None, day=None):
+        """Report for the last completed week of the month, compared with the week before it"""
+        ended = self.previous_week(day or self.get_sa_datetime())
+        periods = [('month', week_day.strftime('%B'), week_day.year, self.calculate_week_of_month(week_day))
+                   for week_day in (ended, self.previous_week(ended))]
+        return self.generate_period_report(periods, data_context)
+    
+    def data_changed(self):
+        """Note a local write so digests built before it are no longer served"""
+        with self.digest_lock:
+            self.data_version += 1
+    
+    def build_digests(self, day=None):
+        """Load the business data once and store the report, cash flow, income statement and digest of the week before `day`"""
+        with self.digest_lock:
+            version = self.data_version
+        data_context = self.open_data_context()
+        try:
+            with self.metrics.span('digest_build'):
+                if not data_context.load():
+                    self.metrics.increment('digests_total', kind='build', result='failed')
+                    return False
+                built = {
+                    'report': self.generate_enhanced_report(data_context),
+                    'cash_flow': self.analyze_cash_flow(data_context),
+                    'income_statement': self.create_simple_income_statement(data_context),
+                    'week': self.generate_week_digest(data_context, day)
+                }
+        except Exception as e:
+            logger.error(f"Error building digests: {str(e)}")
+            self.metrics.increment('digests_total', kind='build', result='failed')
+            return False
+        
+        # SQLite ledgers have no Drive revision; the data version alone covers their writes
+        revision = data_context.snapshot.get('revision')
+        built_at = time.time()
+        with self.digest_lock:
+            for kind, text in built.items():
+                self.digests[kind] = {'text': text, 'built_at': built_at, 'data_version': version, 'revision': revision}
+        self.metrics.increment('digests_total', kind='build', result='built')
+        return True
+    
+    def stored_digest(self, kind):
+        """A stored report still matching the business data, or None to build the answer on demand"""
+        with self.digest_lock:
+            digest = self.digests.get(kind)
+            if digest is None:
+                return None
+            current = digest['data_version'] == self.data_version and time.time() - digest['built_at'] <= self.digest_max_age
+        # One metadata call instead of a workbook download: an edit made straight on Drive also makes it stale
+        if current and digest['revision']:
+            current = self.drive_revision_matches(digest['revision'])
+        self.metrics.increment('digests_total', kind=kind, result='served' if current else 'stale')
+        return digest['text'] if current else None
+    
+    def digest_message(self, kind):
+        """Body of a scheduled daily or weekly digest from the stored reports, None if they were never built"""
+        with self.digest_lock:
+            texts = {name: digest['text'] for name, digest in self.digests.items()}
+        if not texts:
+            return None
+        today = self.get_sa_datetime().strftime('%d %B %Y')
+        if kind == 'weekly':
+            return f"Weekly digest, {today}:\n{texts['week']}"
+        return f"Daily digest, {today}:\n{texts['report']}\n\n{texts['cash_flow']}\n\n{texts['income_statement']}"
+    
+    def send_digest(self, kind, bucket=None):
+        """Queue a daily or weekly digest for every DIGEST_RECIPIENTS number, paced by `bucket`; returns how many were queued"""
+        message = self.digest_message(kind)
+        if message is None:
+            return 0
+        queued = 0
+        for number in self.digest_recipients:
+            if bucket:
+                bucket.acquire()
+            if self.send_whatsapp_message(number, message):
+                queued += 1
+            else:
+                self.metrics.increment('digests_total', kind=kind, result='failed')
+        self.metrics.increment('digests_total', queued, kind=kind, result='sent')
+        logger.info(f"{kind.title()} digest for {self.tenant_id} queued for {queued} of {len(self.digest_recipients)} numbers")
+        return queued
+    
+    def digest_stats(self):
+        """Stored digests with their age and the schedule, for the /digests endpoint"""
+        now = time.time()
+        with self.digest_lock:
+            stored = {kind: {'text': digest['text'], 'age_seconds': round(now - digest['built_at'], 1),
+                             'current': digest['data_version'] == self.data_version and now - digest['built_at'] <= self.digest_max_age}
+                      for kind, digest in self.digests.items()}
+        schedule = {name: [f"{hour:02d}:{minute:02d}" for hour, minute in slots]
+                    for name, slots in (('refresh', self.digest_refresh_times), ('daily', self.digest_daily_times),
+                                        ('weekly', self.digest_weekly_times))}
+        return {'digests': stored, 'schedule': schedule, 'recipients': len(self.digest_recipients)}
+    
+    def record_route(self, route, llm_called):
+        """Count routes taken and Claude calls made or avoided"""
+        with self.route_lock:
+            self.route_counts[route] = self.route_counts.get(route, 0) + 1
+            if llm_called:
+                self.llm_calls += 1
+            else:
+                self.llm_calls_saved += 1
+        self.metrics.increment('routes_total', route=route)
+        self.metrics.increment('claude_requests_total', result='called' if llm_called else 'avoided')
+    
+    def route_stats(self):
+        """Route counters for the /routes endpoint"""
+        with self.route_lock:
+            stats = {'routes': dict(self.route_counts), 'llm_calls': self.llm_calls,
+                     'llm_calls_saved': self.llm_calls_saved}
+        stats['llm_cache'] = self.response_cache.stats()
+        return stats
+    
+    def handle_routed_message(self, parsed, phone_number, data_context):
+        """Answer a routed message without Claude; None means fall back to conversation"""
+        route = parsed['route']
+        
+        if route == 'bulk':
+            return self.bulk_summary(self.import_records(parsed, data_context))
+        
+        elif route == 'expense':
+            expense_info = parsed['expense']
+            missing_info_msg = self.ask_for_missing_info('expense', expense_info, phone_number)
+            
+            if missing_info_msg:
+                return missing_info_msg
+            elif expense_info['amount']:
+                transaction_id = self.save_expense(expense_info, data_context)
+                if transaction_id:
+                    return f"Expense logged: {transaction_id} - R{expense_info['amount']:,.0f} to {expense_info['supplier']} for {expense_info['category']}."
+        
+        elif route == 'service':
+            service_info = parsed['service']
+            missing_info_msg = self.ask_for_missing_info('service', service_info, phone_number)
+            
+            if missing_info_msg:
+                return missing_info_msg
+            elif service_info['amount']:
+                service_result = self.save_complete_service(service_info, data_context)
+                if service_result and service_result['success']:
+                    return f"Service logged: {service_result['customer_id']} ({service_result['customer_name']}{', returning customer' if service_result['returning'] else ''}) - {service_info['service_type']} R{service_info['amount']:,.0f} ({service_info['payment_status']})."
+        
+        elif 'periods' in parsed:
+            # Period-scoped report, cash flow or income statement straight from the rollups
+            if route == 'cash_flow':
+                return self.analyze_period_cash_flow(parsed['periods'], data_context)
+            elif route == 'income_statement':
+                return self.create_period_income_statement(parsed['periods'], data_context)
+            return self.generate_period_report(parsed['periods'], data_context)
+        elif route == 'report':
+            return self.stored_digest('report') or self.generate_enhanced_report(data_context)
+        elif route == 'cash_flow':
+            return self.stored_digest('cash_flow') or self.analyze_cash_flow(data_context)
+        elif route == 'income_statement':
+            return self.stored_digest('income_statement') or self.create_simple_income_statement(data_context)
+        elif route == 'explain':
+            term = parsed['finance_term']
+            if term:
+                return self.explain_finance_term(term)
+        
+        return None
+    
+    def volatile_prompt_context(self, business_data):
+        """Date and live metrics, sent after the cacheable static system prompt"""
+        today_sa = self.get_sa_datetime().strftime('%d %B %Y')
         
         business_context = ""
         if business_data:
@@ -616,141 +3731,398 @@ class IntelligentBusinessAssistant:
 REAL-TIME BUSINESS STATUS:
 Financial: R{business_data['total_revenue']:,.0f} revenue | R{business_data['total_expenses']:,.0f} expenses | R{business_data['net_profit']:,.0f} profit
 Payment Status: {business_data['payment_rate']:.1f}% payments collected (R{business_data['paid_revenue']:,.0f})
-Operations: {len(business_data['operations_data'])} services | {business_data['completion_rate']:.1f}% completion rate
+Operations: {business_data['operations_count']} services | {business_data['completion_rate']:.1f}% completion rate
 """
         
-        system_prompt = f"""You are Moloi's business assistant for MR Banks Car Detailing in South Africa.
-
-CONTEXT AWARENESS:
-- Today's date in South Africa: {today_sa}
-- Currency: South African Rand (R)
-- Business location: South Africa
-- Week numbers: 1-4 within each month
-
-COMMUNICATION STYLE:
-- Always call him "Moloi"
-- Keep responses SHORT and practical 
-- Use simple, clear English
-- Be direct and helpful
-- Use "Rand" or "R" for currency
-
-SMART DATA COLLECTION:
-- Services: Customer Name, Service Type, Amount (Rand), Payment Method, Payment Status
-- Expenses: Amount (Rand), Supplier, Category
-- Extract from full sentences when possible
-- Auto-generate IDs and calculate dates/weeks
-- Track payment status (Paid/Unpaid)
+        return f"""Today's date in South Africa: {today_sa}
 
 CURRENT BUSINESS DATA:
-{business_context}
-
-DETECTION RULES:
-- Service: served, customer, wash, service, finished, completed
-- Expense: paid, bought, spent, cost, expense, bill, salary
-- NEVER log purchases as services
-- Track both service completion AND payment status
+{business_context}"""
 
-Be conversational but focused on accurate data collection."""
+    def ask_claude(self, message, data_context, route='conversation'):
+        """Free-form conversation through Claude, cached per data version; returns (reply, called Claude)"""
+        business_data = data_context.load()
+        volatile_context = self.volatile_prompt_context(business_data)
         
-        try:
+        # Any change to the metrics or date misses the cache, and so does any local write
+        cache_key = (ResponseCache.normalize(message), route, volatile_context, self.data_version)
+        cached = self.response_cache.get(cache_key)
+        self.metrics.increment('llm_cache_total', result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            return cached, False
+        
+        with self.metrics.span('claude'):
             response = self.anthropic_client.messages.create(
                 model="claude-3-haiku-20240307",
                 max_tokens=200,
-                system=system_prompt,
+                system=[
+                    {"type": "text", "text": self.system_prompt, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": volatile_context}
+                ],
                 messages=[{"role": "user", "content": message}]
             )
-            
-            ai_response = response.content[0].text.strip()
-            
-            message_lower = message.lower()
-            
-            # Expense detection
-            expense_indicators = ['paid', 'bought', 'spent', 'cost', 'expense', 'bill', 'salary']
-            service_indicators = ['served', 'customer', 'wash', 'service', 'finished', 'completed']
-            
-            if (any(indicator in message_lower for indicator in expense_indicators) and
-                not any(indicator in message_lower for indicator in service_indicators) and
-                any(char.isdigit() for char in message)):
-                
-                expense_info = self.extract_expense_info(message)
-                missing_info_msg = self.ask_for_missing_info('expense', expense_info, phone_number)
+        
+        reply = response.content[0].text.strip()
+        self.response_cache.put(cache_key, reply, getattr(response, 'usage', None))
+        return reply, True
+    
+    def process_natural_message(self, message, phone_number):
+        """Enhanced message processing with updated column awareness"""
+        self.conversations.append(phone_number, 'user', message)
+        
+        data_context = self.open_data_context()
+        parsed = self.extractor.parse(message)
+        route = parsed['route']
+        
+        try:
+            with self.metrics.span('process_message'):
+                # Deterministic routes first; Claude only when nothing else answers
+                ai_response = None
+                if route != 'conversation':
+                    ai_response = self.handle_routed_message(parsed, phone_number, data_context)
+                llm_called = False
+                if ai_response is None:
+                    ai_response, llm_called = self.ask_claude(message, data_context, route)
                 
-                if missing_info_msg:
-                    ai_response = missing_info_msg
-                elif expense_info['amount']:
-                    transaction_id = self.save_expense(expense_info)
-                    if transaction_id:
-                        ai_response = f"Expense logged: {transaction_id} - R{expense_info['amount']:,.0f} to {expense_info['supplier']} for {expense_info['category']}."
-            
-            # Service detection
-            elif (any(indicator in message_lower for indicator in service_indicators) and
-                  any(char.isdigit() for char in message) and
-                  ('customer' in message_lower or 'client' in message_lower)):
+                self.record_route(route, llm_called)
+                logger.info(f"Message from {phone_number} routed to {route} (Claude called: {llm_called})")
                 
-                service_info = self.extract_service_info(message)
-                missing_info_msg = self.ask_for_missing_info('service', service_info, phone_number)
+                self.conversations.append(phone_number, 'assistant', ai_response)
                 
-                if missing_info_msg:
-                    ai_response = missing_info_msg
-                elif service_info['amount']:
-                    service_result = self.save_complete_service(service_info)
-                    if service_result and service_result['success']:
-                        ai_response = f"Service logged: {service_result['customer_id']} ({service_info['customer_name']}) - {service_info['service_type']} R{service_info['amount']:,.0f} ({service_info['payment_status']})."
-            
-            # Business reporting
-            elif any(trigger in message_lower for trigger in ['business', 'report', 'numbers', 'performance']):
-                ai_response = self.generate_enhanced_report()
-            
-            # Financial analysis
-            elif 'cash flow' in message_lower:
-                ai_response = self.analyze_cash_flow()
-            elif any(term in message_lower for term in ['income statement', 'profit and loss']):
-                ai_response = self.create_simple_income_statement()
-            elif any(term in message_lower for term in ['what is', 'explain']) and any(finance_term in message_lower for finance_term in ['profit', 'loss', 'revenue', 'margin']):
-                finance_terms = ['profit', 'loss', 'revenue', 'income', 'expenses', 'cash flow', 'margin']
-                for term in finance_terms:
-                    if term in message_lower:
-                        ai_response = self.explain_finance_term(term)
-                        break
-            
-            context['history'].append({'assistant': ai_response, 'timestamp': datetime.now()})
-            self.conversations[phone_number] = context
-            
-            return ai_response
+                return ai_response
             
         except Exception as e:
             logger.error(f"Error in Anthropic processing: {str(e)}")
-            return "Sorry Moloi, I'm having a technical moment. Could you repeat that?"
+            return f"Sorry {self.owner_name}, I'm having a technical moment. Could you repeat that?"
     
     def send_whatsapp_message(self, to_number, message):
-        """Send WhatsApp message"""
-        try:
+        """Queue a WhatsApp reply for the background sender; False if it could not be queued or sent"""
+        delivery_id = self.outbound.submit(to_number, message)
+        if delivery_id is None:
+            logger.error(f"Send queue full, dropping reply to {to_number}")
+            return False
+        if self.outbound.dispatcher.workers <= 0:
+            return self.outbound.delivery(delivery_id)['status'] == 'sent'
+        return True
+    
+    def deliver_whatsapp_message(self, to_number, body):
+        """One Twilio send; returns the message SID and lets errors through so the sender can retry"""
+        options = {'status_callback': self.status_callback_url} if self.status_callback_url else {}
+        with self.metrics.span('twilio_send'):
             sent_message = self.twilio_client.messages.create(
-                body=message, 
+                body=body, 
                 from_=self.twilio_whatsapp_number, 
-                to=to_number
+                to=to_number,
+                **options
             )
-            logger.info(f"Message sent to {to_number}")
-            return True
-        except Exception as e:
-            logger.error(f"Error sending WhatsApp: {str(e)}")
-            return False
+        return getattr(sent_message, 'sid', None)
+
+class TenantRegistry:
+    """Businesses served by one process, found by WhatsApp number; each tenant's assistant is built on its first message"""
+    
+    def __init__(self, default, config_path=None, max_warm=50):
+        self.default = default
+        self.configs = {}
+        self.by_number = {}
+        self.by_sender = {}
+        self.assistants = {default.tenant_id: default}
+        # Send rate limiters by Twilio account SID, handed to each tenant built on that account
+        self.send_buckets = {default.twilio_account_sid: default.outbound.bucket}
+        self.lock = threading.Lock()
+        # Tenants holding a parsed workbook, least recently used first; past max_warm the coldest drop theirs
+        self.warm = OrderedDict()
+        self.max_warm = max_warm
+        # Digest slots by tenant, parsed from the configs on the scheduler's first tick
+        self.digest_schedules = None
+        if config_path:
+            self.load(config_path)
+        self.by_number.setdefault(default.twilio_whatsapp_number, default.tenant_id)
+    
+    def load(self, path):
+        """Read a JSON list (or {"tenants": [...]}) of tenants: 'id', 'GOOGLE_DRIVE_FILE_ID', optional 'sender_numbers', then setting overrides"""
+        with open(path, encoding='utf-8') as config_file:
+            configs = json.load(config_file)
+        if isinstance(configs, dict):
+            configs = configs.get('tenants', [])
+        for config in configs:
+            tenant_id = str(config.get('id', ''))
+            if not TENANT_ID_PATTERN.fullmatch(tenant_id) or tenant_id in self.assistants or tenant_id in self.configs:
+                raise ValueError(f"Tenant ids must be unique and use only letters, digits, '-' or '_': {tenant_id!r}")
+            # Falling back to the environment's file id would hand this tenant the default business's workbook
+            if not config.get('GOOGLE_DRIVE_FILE_ID'):
+                raise ValueError(f"Tenant {tenant_id!r} needs its own GOOGLE_DRIVE_FILE_ID")
+            self.configs[tenant_id] = config
+            number = config.get('TWILIO_WHATSAPP_NUMBER')
+            if number in self.by_number:
+                logger.warning(f"Tenants {self.by_number[number]} and {tenant_id} share {number}; "
+                               f"route {tenant_id} by sender_numbers")
+            elif number:
+                self.by_number[number] = tenant_id
+            # Owner/staff numbers pick the tenant when several share one Twilio number
+            for sender in config.get('sender_numbers', []):
+                self.by_sender[sender] = tenant_id
+        logger.info(f"Loaded {len(self.configs)} tenants from {path}")
+    
+    def resolve(self, from_number, to_number):
+        """Tenant id for an inbound message: the sender's tenant, else the number it was sent to, else the default"""
+        return self.by_sender.get(from_number) or self.by_number.get(to_number) or self.default.tenant_id
+    
+    def get(self, tenant_id):
+        """The tenant's assistant, built on first use with shared metrics, clients and send rate; None for an unknown id"""
+        with self.lock:
+            tenant_assistant = self.assistants.get(tenant_id)
+            if tenant_assistant is None and tenant_id in self.configs:
+                tenant_assistant = IntelligentBusinessAssistant(tenant=self.configs[tenant_id],
+                                                                metrics=self.default.metrics,
+                                                                client_source=self.default,
+                                                                send_buckets=self.send_buckets)
+                self.assistants[tenant_id] = tenant_assistant
+            return tenant_assistant
+    
+    def find(self, tenant_id):
+        """The tenant's assistant if it has been built already, else None; never builds one"""
+        with self.lock:
+            return self.assistants.get(tenant_id)
+    
+    def touch(self, tenant_id):
+        """Mark a tenant as recently served and drop the workbook snapshots of the least recently served"""
+        with self.lock:
+            self.warm.pop(tenant_id, None)
+            self.warm[tenant_id] = True
+            cold = []
+            while self.max_warm > 0 and len(self.warm) > self.max_warm:
+                cold_id, _ = self.warm.popitem(last=False)
+                cold.append(self.assistants[cold_id])
+        # A request already holding the snapshot keeps using it; the next one re-downloads
+        for tenant_assistant in cold:
+            tenant_assistant.invalidate_snapshot()
+    
+    def park(self, tenant_id):
+        """Keep a snapshot a background job loaded only while a warm slot is free, as the coldest; else drop it"""
+        with self.lock:
+            if tenant_id in self.warm or self.max_warm <= 0:
+                return
+            if len(self.warm) < self.max_warm:
+                self.warm[tenant_id] = True
+                self.warm.move_to_end(tenant_id, last=False)
+                return
+            tenant_assistant = self.assistants[tenant_id]
+        tenant_assistant.invalidate_snapshot()
+    
+    def active(self):
+        """Assistants built so far"""
+        with self.lock:
+            return list(self.assistants.values())
+    
+    def schedules(self, names=(('refresh', 'DIGEST_REFRESH_TIMES'), ('daily', 'DIGEST_DAILY_TIME'),
+                               ('weekly', 'DIGEST_WEEKLY_TIME'))):
+        """Digest slots by kind of every tenant that has any, read from its config or the environment without building it"""
+        with self.lock:
+            if self.digest_schedules is None:
+                self.digest_schedules = {}
+                for tenant_id, config in [(self.default.tenant_id, {})] + list(self.configs.items()):
+                    try:
+                        schedule = {kind: self.default.parse_slot_times(os.getenv(name, '') if config.get(name) is None
+                                                                        else str(config[name]))
+                                    for kind, name in names}
+                    except ValueError as e:
+                        logger.error(f"No scheduled digests for {tenant_id}: {str(e)}")
+                        continue
+                    if any(schedule.values()):
+                        self.digest_schedules[tenant_id] = schedule
+            return self.digest_schedules
+    
+    def stats(self):
+        """Configured, built and warm tenants"""
+        with self.lock:
+            return {'tenants': len(self.configs) + 1, 'active': len(self.assistants),
+                    'warm': len(self.warm), 'max_warm': self.max_warm, 'twilio_accounts': len(self.send_buckets),
+                    'numbers': len(self.by_number), 'sender_numbers': len(self.by_sender)}
+
+class DigestScheduler:
+    """Background thread rebuilding each tenant's digests at its SA-time slots, then pushing the due ones in one paced batch"""
+    
+    def __init__(self, registry, clock, tick_seconds=30, send_rate=5):
+        self.registry = registry
+        self.clock = clock
+        self.tick_seconds = tick_seconds
+        # Shared by every tenant's pushes and never banked, so a batch of hundreds of owners goes out evenly paced
+        self.bucket = TokenBucket(send_rate, 1)
+        self.last_tick = None
+        self.lock = threading.Lock()
+        self.runs = {'ticks': 0, 'built': 0, 'failed': 0, 'sent': 0}
+    
+    def start(self):
+        """Start ticking; slots that passed before now don't fire"""
+        self.last_tick = self.clock()
+        threading.Thread(target=self.run, name='digest-scheduler', daemon=True).start()
+    
+    def run(self):
+        """Tick every tick_seconds for the life of the process"""
+        while True:
+            time.sleep(self.tick_seconds)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Error running scheduled digests: {str(e)}")
+    
+    def crossed(self, slots, previous, now):
+        """Instants of the (hour, minute) slots falling after `previous` and up to `now`"""
+        instants = []
+        day = previous.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day <= now:
+            for hour, minute in slots:
+                instant = day.replace(hour=hour, minute=minute)
+                if previous < instant <= now:
+                    instants.append(instant)
+            day += timedelta(days=1)
+        return instants
+    
+    def due(self, schedule, previous, now):
+        """Digest jobs whose slot fell since the last tick; weekly ones only on the first day of a week of the month"""
+        week_of_month = self.registry.default.calculate_week_of_month
+        kinds = []
+        if self.crossed(schedule['refresh'], previous, now):
+            kinds.append('refresh')
+        if self.crossed(schedule['daily'], previous, now):
+            kinds.append('daily')
+        if any(week_of_month(instant) != week_of_month(instant - timedelta(days=1))
+               for instant in self.crossed(schedule['weekly'], previous, now)):
+            kinds.append('weekly')
+        return kinds
+    
+    def tick(self, now=None):
+        """Build the digests of every tenant with a slot due, then queue the due pushes; returns the messages queued"""
+        now = now or self.clock()
+        with self.lock:
+            previous, self.last_tick = self.last_tick or now, now
+            self.runs['ticks'] += 1
+        
+        # Only tenants with a slot due get an assistant built, one at a time so workbook loads
+        # don't pile onto Drive or the webhook workers
+        sends = []
+        for tenant_id, schedule in self.registry.schedules().items():
+            kinds = self.due(schedule, previous, now)
+            if not kinds:
+                continue
+            tenant_assistant = self.registry.get(tenant_id)
+            built = tenant_assistant.build_digests(now)
+            self.registry.park(tenant_assistant.tenant_id)
+            with self.lock:
+                self.runs['built' if built else 'failed'] += 1
+            if not built:
+                logger.error(f"Skipping scheduled digests for {tenant_assistant.tenant_id}: business data unavailable")
+                continue
+            sends.extend((tenant_assistant, kind) for kind in kinds if kind != 'refresh')
+        
+        queued = sum(tenant_assistant.send_digest(kind, self.bucket) for tenant_assistant, kind in sends)
+        with self.lock:
+            self.runs['sent'] += queued
+        return queued
+    
+    def stats(self):
+        """Ticks, digest builds and pushes so far"""
+        with self.lock:
+            return {**self.runs, 'tick_seconds': self.tick_seconds, 'send_rate': self.bucket.rate,
+                    'last_tick': self.last_tick.isoformat() if self.last_tick else None}
 
 # Flask app
 app = Flask(__name__)
 assistant = IntelligentBusinessAssistant()
 
+# Businesses this process serves: the default one from the environment plus any listed in TENANTS_FILE
+tenants = TenantRegistry(assistant, os.getenv('TENANTS_FILE'), max_warm=int(os.getenv('TENANT_MAX_WARM', '50')))
+
+# Digests rebuilt and pushed at each tenant's DIGEST_* slots; DIGEST_SEND_PER_SECOND paces the pushes across tenants
+digests = DigestScheduler(tenants, assistant.get_sa_datetime,
+                          tick_seconds=float(os.getenv('DIGEST_TICK_SECONDS', '30')),
+                          send_rate=float(os.getenv('DIGEST_SEND_PER_SECOND', '5')))
+if os.getenv('DIGEST_SCHEDULER', 'true').lower() in ('1', 'true', 'yes'):
+    digests.start()
+
+# Serve straight away and build the SDK clients off the request path
+if os.getenv('CLIENT_PREWARM', 'true').lower() in ('1', 'true', 'yes'):
+    threading.Thread(target=assistant.prewarm_clients, name='client-prewarm', daemon=True).start()
+
+def handle_incoming_message(sender, incoming_msg):
+    """Process one queued (tenant id, number) message and hand the reply to that tenant's send queue"""
+    tenant_id, from_number = sender
+    tenant_assistant = tenants.get(tenant_id)
+    
+    started = time.monotonic()
+    response = tenant_assistant.process_natural_message(incoming_msg, from_number)
+    dispatcher.record('process', time.monotonic() - started)
+    
+    started = time.monotonic()
+    tenant_assistant.send_whatsapp_message(from_number, response)
+    dispatcher.record('send', time.monotonic() - started)
+    tenants.touch(tenant_id)
+
+# One pool for every tenant, taking tenants in turn; WEBHOOK_TENANT_QUEUE_SIZE caps any one tenant's share
+dispatcher = MessageDispatcher(
+    handle_incoming_message,
+    workers=int(os.getenv('WEBHOOK_WORKERS', '4')),
+    max_queue=int(os.getenv('WEBHOOK_QUEUE_SIZE', '200')),
+    metrics=assistant.metrics,
+    max_group_queue=int(os.getenv('WEBHOOK_TENANT_QUEUE_SIZE', '0'))
+)
+
+def with_tenant(view):
+    """Run an endpoint against the tenant named by ?tenant= (the default business when omitted), if it is already built"""
+    @wraps(view)
+    def tenant_view(*args, **kwargs):
+        # Open endpoints mustn't make a tenant download and parse its workbook just by being asked about it
+        tenant_assistant = tenants.find(request.values.get('tenant', DEFAULT_TENANT_ID))
+        if tenant_assistant is None:
+            return jsonify({'error': 'Unknown or inactive tenant'}), 404
+        return view(tenant_assistant, *args, **kwargs)
+    return tenant_view
+
+def with_configured_tenant(view):
+    """Like with_tenant, but builds a configured tenant that hasn't had a message yet; for admin endpoints only"""
+    @wraps(view)
+    def tenant_view(*args, **kwargs):
+        tenant_assistant = tenants.get(request.values.get('tenant', DEFAULT_TENANT_ID))
+        if tenant_assistant is None:
+            return jsonify({'error': 'Unknown tenant'}), 404
+        return view(tenant_assistant, *args, **kwargs)
+    return tenant_view
+
+# Shared secret for the endpoints that write, push or expose business data; they refuse every request while unset
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def requires_admin(view):
+    """Reject the request with 403 unless its X-Admin-Token header matches ADMIN_TOKEN"""
+    @wraps(view)
+    def admin_view(*args, **kwargs):
+        token = request.headers.get('X-Admin-Token', '')
+        if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            logger.error(f"Rejected unauthenticated {request.method} {request.path} from {request.remote_addr}")
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return admin_view
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Handle incoming WhatsApp messages"""
     try:
         incoming_msg = request.values.get('Body', '').strip()
         from_number = request.values.get('From', '')
+        tenant_id = tenants.resolve(from_number, request.values.get('To', ''))
+        
+        logger.info(f"Received from {from_number} for {tenant_id}: {incoming_msg}")
         
-        logger.info(f"Received from {from_number}: {incoming_msg}")
+        # Acknowledge straight away; the worker pool replies via the REST API
+        if dispatcher.workers > 0:
+            if not dispatcher.submit((tenant_id, from_number), incoming_msg, group=tenant_id):
+                logger.error(f"Webhook queue full, rejecting message from {from_number} for {tenant_id}")
+                return jsonify({'error': 'Queue full, retry later'}), 503
+            return jsonify({'status': 'queued'}), 200
         
-        response = assistant.process_natural_message(incoming_msg, from_number)
-        assistant.send_whatsapp_message(from_number, response)
+        tenant_assistant = tenants.get(tenant_id)
+        response = tenant_assistant.process_natural_message(incoming_msg, from_number)
+        tenant_assistant.send_whatsapp_message(from_number, response)
+        tenants.touch(tenant_id)
         
         return jsonify({'status': 'success'}), 200
         
@@ -758,6 +4130,137 @@ def webhook():
         logger.error(f"Webhook error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/queue', methods=['GET'])
+def queue_stats():
+    """Webhook worker pool status"""
+    return jsonify(dispatcher.stats())
+
+@app.route('/tenants', methods=['GET'])
+def tenant_stats():
+    """Tenants configured, built and holding a workbook snapshot"""
+    return jsonify(tenants.stats())
+
+@app.route('/routes', methods=['GET'])
+@with_tenant
+def route_stats(tenant_assistant):
+    """Which route messages took and how many Claude calls were skipped"""
+    return jsonify(tenant_assistant.route_stats())
+
+@app.route('/conversations', methods=['GET'])
+@with_tenant
+def conversation_stats(tenant_assistant):
+    """Conversation memory footprint and evictions"""
+    return jsonify(tenant_assistant.conversations.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: stage latency histograms, route/cache/error counters and queue gauges"""
+    queue_status = dispatcher.stats()
+    tenant_status = tenants.stats()
+    active = tenants.active()
+    body = assistant.metrics.render({
+        'webhook_queue_depth': ('Messages waiting for or being processed by the worker pool', queue_status['queue_depth']),
+        'webhook_busy_workers': ('Worker threads currently handling a message', queue_status['busy_workers']),
+        'outbound_queue_depth': ('Replies waiting for or being sent by the send queues',
+                                 sum(a.outbound.dispatcher.stats()['queue_depth'] for a in active)),
+        'conversation_numbers': ('Phone numbers with conversation history in memory',
+                                 sum(a.conversations.stats()['numbers'] for a in active)),
+        'tenants_active': ('Tenants with an assistant built in this process', tenant_status['active']),
+        'tenants_warm': ('Tenants holding a parsed workbook snapshot', tenant_status['warm'])
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/outbound', methods=['GET'])
+@requires_admin
+@with_tenant
+def outbound_stats(tenant_assistant):
+    """Send queue status, delivery counters and recent failures (with customer numbers, so admin only)"""
+    return jsonify(tenant_assistant.outbound.stats())
+
+@app.route('/outbound/<int:delivery_id>', methods=['GET'])
+@requires_admin
+@with_tenant
+def outbound_delivery(tenant_assistant, delivery_id):
+    """Outcome of one queued reply"""
+    delivery = tenant_assistant.outbound.delivery(delivery_id)
+    if delivery is None:
+        return jsonify({'error': 'Unknown delivery'}), 404
+    return jsonify(delivery)
+
+@app.route('/message-status', methods=['POST'])
+def message_status():
+    """Twilio status callback (set TWILIO_STATUS_CALLBACK_URL to this endpoint)"""
+    # The callback's From is the business number the reply went out on
+    tenant_assistant = tenants.find(request.values.get('tenant') or tenants.resolve(None, request.values.get('From', '')))
+    if tenant_assistant is None:
+        return jsonify({'error': 'Unknown tenant'}), 404
+    tenant_assistant.outbound.update_status(request.values.get('MessageSid', ''),
+                                            request.values.get('MessageStatus', ''),
+                                            request.values.get('ErrorCode'))
+    return '', 204
+
+@app.route('/digests', methods=['GET'])
+@requires_admin
+@with_tenant
+def digest_stats(tenant_assistant):
+    """Stored digests (revenue and profit figures, so admin only), their age and the tenant's digest schedule"""
+    return jsonify({**tenant_assistant.digest_stats(), 'scheduler': digests.stats()})
+
+@app.route('/digests', methods=['POST'])
+@requires_admin
+@with_configured_tenant
+def build_digests(tenant_assistant):
+    """Rebuild the tenant's digests now; ?send=daily or ?send=weekly also pushes that digest"""
+    kind = request.values.get('send')
+    if kind not in (None, 'daily', 'weekly'):
+        return jsonify({'error': "send must be 'daily' or 'weekly'"}), 400
+    if not tenant_assistant.build_digests():
+        return jsonify({'error': "Can't access business data right now"}), 502
+    queued = tenant_assistant.send_digest(kind, digests.bucket) if kind else 0
+    return jsonify({'status': 'built', 'sent': queued}), 200
+
+@app.route('/import', methods=['POST'])
+@requires_admin
+@with_configured_tenant
+def import_records(tenant_assistant):
+    """Bulk-log services and expenses from a CSV upload (form field 'file') or a text/csv body"""
+    upload = request.files.get('file')
+    text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+    bulk = tenant_assistant.extractor.parse_csv(text)
+    if not bulk['records']:
+        return jsonify({'error': 'No service or expense rows found', 'skipped': bulk['skipped']}), 400
+    result = tenant_assistant.import_records(bulk)
+    if not result['success']:
+        return jsonify({'error': 'Saving the import to Google Drive failed'}), 502
+    saved = [{'line': record['line'], 'type': record['kind'], 'ids': list(record['ids']),
+              'amount': record['info']['amount']} for record in result['saved']]
+    return jsonify({'status': 'imported', 'saved': saved, 'incomplete': result['incomplete'],
+                    'skipped': result['skipped']}), 200
+
+@app.route('/archive', methods=['POST'])
+@requires_admin
+@with_configured_tenant
+def archive(tenant_assistant):
+    """Move closed months out of the live Drive workbook"""
+    if tenant_assistant.ledger:
+        return jsonify({'error': 'Archiving applies to the Drive workbook, not STORAGE_BACKEND=sqlite'}), 400
+    result = tenant_assistant.archive_closed_months()
+    if result is None:
+        return jsonify({'error': 'Archiving failed or the workbook changed on Google Drive; retry later'}), 502
+    return jsonify({'status': 'archived', **result}), 200
+
+@app.route('/export', methods=['POST'])
+@requires_admin
+@with_configured_tenant
+def export(tenant_assistant):
+    """Export the SQLite ledger to the Drive workbook on demand"""
+    if not tenant_assistant.ledger:
+        return jsonify({'error': 'Export is only available with STORAGE_BACKEND=sqlite'}), 400
+    revision = tenant_assistant.export_ledger_to_drive()
+    if not revision:
+        return jsonify({'error': 'Export to Google Drive failed'}), 502
+    return jsonify({'status': 'exported'}), 200
+
 @app.route('/test', methods=['GET'])
 def test():
     """Test endpoint"""
@@ -782,5 +4285,5 @@ if __name__ == '__main__':
     print("   - South African Date/Time Context") 
     print("   - Smart Week Number Calculation (1-4 per month)")
     print("   - Enhanced Business Intelligence")
-
+    
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,35 @@
+"""Shared setup: import cardetail with no background threads or real SDK clients, runtime files in a temp dir."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='cardetail-tests-'))
+os.environ['DIGEST_SCHEDULER'] = 'false'
+os.environ['CLIENT_PREWARM'] = 'false'
+os.environ['WEBHOOK_WORKERS'] = '0'
+
+import cardetail  # noqa: E402
+from benchmarks.fakes import install_fakes  # noqa: E402
+from benchmarks.synthetic import workbook_bytes  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def content():
+    """A small synthetic workbook"""
+    return workbook_bytes(50)
+
+
+@pytest.fixture
+def make_assistant(content, tmp_path):
+    """Build assistants on the fake Drive, Anthropic and Twilio; settings are applied as tenant overrides"""
+    def make(workbook=None, **settings):
+        settings.setdefault('id', 'test')
+        settings.setdefault('GOOGLE_DRIVE_FILE_ID', 'workbook-test')
+        assistant = cardetail.IntelligentBusinessAssistant(tenant=settings)
+        assistant.fakes = install_fakes(assistant, workbook or content)
+        return assistant
+    return make
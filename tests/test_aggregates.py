@@ -0,0 +1,38 @@
+"""Running business totals: built in one pass and kept current as rows are appended."""
+import io
+
+import openpyxl
+
+SERVICE = {'customer_name': 'Thandi', 'service_type': 'Full Wash', 'amount': 180,
+           'payment_status': 'Paid', 'payment_method': 'Cash'}
+EXPENSE = {'category': 'Supplies', 'description': 'wax', 'amount': 250, 'supplier': 'CleanCo'}
+
+
+def sheet_rows(content, sheet_name):
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+    return [row for row in workbook[sheet_name].iter_rows(min_row=2, values_only=True) if row[0]]
+
+
+def test_totals_match_the_sheets(make_assistant, content):
+    data = make_assistant().load_business_data()
+    revenue = sheet_rows(content, 'Revenue')
+    expenses = sheet_rows(content, 'Expenses')
+    operations = sheet_rows(content, 'Operations')
+    assert data['total_revenue'] == sum(row[5] or 0 for row in revenue)
+    assert data['paid_revenue'] == sum(row[5] or 0 for row in revenue if row[6] == 'Paid')
+    assert data['total_expenses'] == sum(abs(row[5] or 0) for row in expenses)
+    assert data['operations_count'] == len(operations)
+    assert data['total_customers'] == len({row[0] for row in operations})
+
+
+def test_appended_rows_match_a_fresh_parse(make_assistant):
+    assistant = make_assistant()
+    assistant.load_business_data()
+    assert assistant.save_complete_service(SERVICE)['success']
+    assert assistant.save_expense(EXPENSE)
+    updated = assistant.load_business_data()
+
+    fresh = make_assistant(workbook=assistant.fakes[0].content).load_business_data()
+    for key in ('total_revenue', 'total_expenses', 'paid_revenue', 'operations_count', 'total_customers',
+                'repeat_customers', 'service_performance', 'expense_analysis'):
+        assert updated[key] == fresh[key], key
@@ -0,0 +1,65 @@
+"""Archiving closed months: rows move to per-month archives, totals survive through the summary sheets."""
+import io
+import os
+from datetime import timedelta
+
+import openpyxl
+
+from benchmarks.synthetic import workbook_bytes
+
+TOTALS = ('total_revenue', 'total_expenses', 'paid_revenue', 'operations_count', 'total_customers',
+          'repeat_customers', 'service_performance', 'expense_analysis')
+SERVICE = {'customer_name': 'Customer 001', 'service_type': 'Full Wash', 'amount': 180,
+           'payment_status': 'Paid', 'payment_method': 'Cash'}
+
+
+def archiving_assistant(make_assistant, tmp_path, workbook=None):
+    return make_assistant(workbook=workbook, ARCHIVE_DIR=str(tmp_path / 'archives'), ARCHIVE_KEEP_MONTHS='1')
+
+
+def totals(data):
+    # Archiving reorders each service's customer list, so compare it as a set
+    performance = {service: dict(totals, customers=set(totals['customers']))
+                   for service, totals in data['service_performance'].items()}
+    return dict({key: data[key] for key in TOTALS}, service_performance=performance)
+
+
+def live_rows(content, sheet_name):
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+    return [row for row in workbook[sheet_name].iter_rows(min_row=2, values_only=True) if row[0]]
+
+
+def test_closed_months_move_out_and_totals_survive(make_assistant, tmp_path):
+    assistant = archiving_assistant(make_assistant, tmp_path)
+    before = totals(assistant.load_business_data())
+
+    result = assistant.archive_closed_months()
+    assert result['archived_months'] == ['2023-01']
+    assert result['live_rows'] == 0
+    assert os.path.exists(assistant.archive.path(2023, 1))
+    assert live_rows(assistant.fakes[0].content, 'Revenue') == []
+
+    after = assistant.load_business_data()
+    assert totals(after) == before
+    assert after['customer_journey']['CW001']['total_spent'] > 0
+
+
+def test_rerun_archives_nothing(make_assistant, tmp_path):
+    assistant = archiving_assistant(make_assistant, tmp_path)
+    assistant.archive_closed_months()
+    assert assistant.archive_closed_months()['archived_rows'] == 0
+
+
+def test_current_month_stays_live(make_assistant, tmp_path):
+    today = make_assistant().get_sa_datetime().date()
+    content = workbook_bytes(20, start=today - timedelta(days=today.day - 1))
+    assistant = archiving_assistant(make_assistant, tmp_path, content)
+    assert assistant.archive_closed_months()['archived_rows'] == 0
+    assert len(live_rows(assistant.fakes[0].content, 'Revenue')) == 20
+
+
+def test_returning_customer_keeps_their_id_after_archiving(make_assistant, tmp_path):
+    assistant = archiving_assistant(make_assistant, tmp_path)
+    assistant.archive_closed_months()
+    result = assistant.save_complete_service(SERVICE)
+    assert result['customer_id'] == 'CW001' and result['returning']
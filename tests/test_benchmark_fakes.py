@@ -0,0 +1,41 @@
+"""The synthetic workbooks and the Drive/Anthropic/Twilio stand-ins the benchmarks and tests run on."""
+import io
+
+import openpyxl
+import pytest
+
+from benchmarks.fakes import FakeTwilioError
+from benchmarks.synthetic import HEADERS, synthetic_messages, workbook_bytes
+
+SENDER = 'whatsapp:+27000000000'
+
+
+def test_synthetic_workbook_has_the_expected_layout():
+    workbook = openpyxl.load_workbook(io.BytesIO(workbook_bytes(40, expenses=12)), read_only=True)
+    for sheet_name, header in HEADERS.items():
+        assert next(workbook[sheet_name].iter_rows(max_row=1, values_only=True)) == tuple(header)
+    assert workbook['Revenue'].max_row == 41
+    assert workbook['Expenses'].max_row == 13
+
+
+def test_synthetic_data_is_repeatable():
+    assert synthetic_messages(50) == synthetic_messages(50)
+    assert synthetic_messages(50) != synthetic_messages(50, seed=7)
+
+
+def test_fake_drive_tracks_revisions(make_assistant):
+    assistant = make_assistant()
+    drive = assistant.fakes[0]
+    revision = assistant.get_drive_revision()
+    drive.replace_content(workbook_bytes(60))
+    assert assistant.get_drive_revision() != revision
+    assert assistant.download_workbook_content() == drive.content
+
+
+def test_fake_twilio_fails_on_schedule(make_assistant):
+    twilio = make_assistant().fakes[2]
+    twilio.fail_every = 2
+    twilio.messages.create(body='one', from_='whatsapp:+1', to=SENDER)
+    with pytest.raises(FakeTwilioError):
+        twilio.messages.create(body='two', from_='whatsapp:+1', to=SENDER)
+    assert [body for to, body, sent_at in twilio.sent] == ['one']
@@ -0,0 +1,54 @@
+"""Bulk logging: many services and expenses saved with one workbook load and one upload."""
+import cardetail
+
+SENDER = 'whatsapp:+27000000000'
+CSV = """type,customer,service,amount,method,supplier,category
+service,Thabo Nkosi,full wash,180,card,,
+service,Lerato,premium,,cash,,
+expense,,,250,,CleanCo,wax
+,,,,,,
+service,,,,,,
+"""
+
+
+def test_multi_line_message_is_one_upload(make_assistant):
+    assistant = make_assistant()
+    reply = assistant.process_natural_message('Served customer Thabo full wash R180 cash\n'
+                                              'Paid R250 to CleanCo for wax\n'
+                                              'how are you', SENDER)
+    assert reply.startswith('Logged 2 records')
+    assert 'line 3' in reply
+    assert assistant.fakes[0].calls['update'] == 1
+    assert assistant.anthropic_client.calls == 0
+
+
+def test_csv_columns_win_over_extraction(make_assistant):
+    bulk = make_assistant().extractor.parse_csv(CSV)
+    services = [record['info'] for record in bulk['records'] if record['kind'] == 'service']
+    expenses = [record['info'] for record in bulk['records'] if record['kind'] == 'expense']
+    assert services[0]['customer_name'] == 'Thabo Nkosi' and services[0]['payment_method'] == 'Card'
+    assert services[1]['service_type'] == 'Premium Wash' and services[1]['amount'] == 280
+    assert expenses == [dict(expenses[0], amount=250, supplier='CleanCo', category='Supplies')]
+
+
+def test_repeated_new_customer_shares_one_id(make_assistant):
+    assistant = make_assistant()
+    bulk = assistant.extractor.parse_csv('customer,service,amount\nZanele Dube,full wash,180\nzanele dube,basic,120\n')
+    saved = assistant.import_records(bulk)['saved']
+    assert saved[0]['ids'][0] == saved[1]['ids'][0]
+    assert saved[0]['ids'][1] != saved[1]['ids'][1]
+
+
+def test_import_endpoint_needs_the_admin_token(make_assistant, monkeypatch):
+    assistant = make_assistant()
+    monkeypatch.setattr(cardetail, 'tenants', cardetail.TenantRegistry(assistant))
+    monkeypatch.setattr(cardetail, 'ADMIN_TOKEN', 'secret')
+    client = cardetail.app.test_client()
+    assert client.post('/import?tenant=test', data=CSV, content_type='text/csv').status_code == 403
+    response = client.post('/import?tenant=test', data=CSV, content_type='text/csv',
+                           headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body['saved']) == 3
+    assert [record['line'] for record in body['incomplete']] == [6]
+    assert assistant.fakes[0].calls['update'] == 1
@@ -0,0 +1,54 @@
+"""Conversation memory: capped turns, idle expiry, LRU eviction and spill to disk."""
+import cardetail
+
+
+def test_turns_are_capped_per_number():
+    store = cardetail.ConversationStore(max_turns=3, max_numbers=10, idle_ttl_seconds=3600)
+    for number in range(5):
+        store.append('a', 'user', f"message {number}")
+    assert [turn.text for turn in store.history('a')] == ['message 2', 'message 3', 'message 4']
+    assert store.stats()['turns_dropped'] == 2
+
+
+def test_idle_conversations_expire(monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(cardetail.time, 'time', lambda: clock[0])
+    store = cardetail.ConversationStore(max_turns=5, max_numbers=10, idle_ttl_seconds=60)
+    store.append('a', 'user', 'hi')
+    clock[0] += 30
+    store.append('b', 'user', 'hi')
+    clock[0] += 45
+    store.append('c', 'user', 'hi')
+    assert store.history('a') == []
+    assert len(store.history('b')) == 1
+    assert store.stats()['idle_evictions'] == 1
+
+
+def test_least_recent_number_is_spilled_and_restored(tmp_path):
+    store = cardetail.ConversationStore(max_turns=5, max_numbers=2, idle_ttl_seconds=3600,
+                                        spill_path=str(tmp_path / 'spill'))
+    store.append('a', 'user', 'first')
+    store.append('b', 'user', 'hi')
+    store.append('c', 'user', 'hi')
+    assert store.stats()['numbers'] == 2
+    assert [turn.text for turn in store.history('a')] == ['first']
+    assert store.stats()['lru_evictions'] >= 1 and store.stats()['restored'] == 1
+    store.close()
+
+
+def test_close_spills_for_the_next_process(tmp_path):
+    spill_path = str(tmp_path / 'spill')
+    store = cardetail.ConversationStore(max_turns=5, max_numbers=10, idle_ttl_seconds=3600, spill_path=spill_path)
+    store.append('a', 'user', 'remember me')
+    store.close()
+    restarted = cardetail.ConversationStore(max_turns=5, max_numbers=10, idle_ttl_seconds=3600, spill_path=spill_path)
+    assert [turn.text for turn in restarted.history('a')] == ['remember me']
+    restarted.close()
+
+
+def test_without_spill_evicted_history_is_gone():
+    store = cardetail.ConversationStore(max_turns=5, max_numbers=1, idle_ttl_seconds=3600)
+    store.append('a', 'user', 'hi')
+    store.append('b', 'user', 'hi')
+    assert store.history('a') == []
+    assert store.stats()['spill_enabled'] is False
@@ -0,0 +1,46 @@
+"""Customer lookup: repeat customers reuse their Customer_ID however the name is typed."""
+import cardetail
+
+SERVICE = {'customer_name': 'Thabo Nkosi', 'service_type': 'Full Wash', 'amount': 180,
+           'payment_status': 'Paid', 'payment_method': 'Cash'}
+
+
+def index(*customers):
+    customers_index = cardetail.CustomerIndex()
+    for customer_id, name in customers:
+        customers_index.add(customer_id, name)
+    return customers_index
+
+
+def test_exact_match_ignores_case_accents_and_titles():
+    customers = index(('CW007', 'Zoë Mokoena'))
+    assert customers.lookup('zoe MOKOENA') == ('CW007', 'Zoë Mokoena', 'exact')
+    assert customers.lookup('Mrs. Zoe Mokoena')[0] == 'CW007'
+
+
+def test_first_name_matches_only_when_unambiguous():
+    customers = index(('CW001', 'Thabo Nkosi'), ('CW002', 'Lerato Dube'), ('CW003', 'Lerato Khumalo'))
+    assert customers.lookup('Thabo') == ('CW001', 'Thabo Nkosi', 'prefix')
+    assert customers.lookup('Lerato') is None
+
+
+def test_one_typo_matches_long_names_only():
+    customers = index(('CW001', 'Johannes Smith'), ('CW002', 'Thabo'))
+    assert customers.lookup('Johanes Smith') == ('CW001', 'Johannes Smith', 'fuzzy')
+    assert customers.lookup('Thabi') is None
+
+
+def test_placeholders_and_duplicates():
+    customers = index(('CW010', 'Sipho'), ('CW9', 'sipho'), ('CW011', 'Walk-in Customer'))
+    assert customers.lookup('Sipho')[0] == 'CW9'
+    assert customers.lookup('walk in customer') is None
+    assert len(customers) == 1
+
+
+def test_logging_a_returning_customer_reuses_their_id(make_assistant):
+    assistant = make_assistant()
+    first = assistant.save_complete_service(SERVICE)
+    again = assistant.save_complete_service(dict(SERVICE, customer_name='thabo'))
+    assert not first['returning']
+    assert again['returning'] and again['customer_id'] == first['customer_id']
+    assert again['customer_name'] == 'Thabo Nkosi'
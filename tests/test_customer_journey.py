@@ -0,0 +1,49 @@
+"""Customer journeys grouped by Customer_ID in one pass."""
+from datetime import date
+
+import cardetail
+
+
+def operation(customer_id, name, day, service='Full Wash'):
+    return {'Customer_ID': customer_id, 'Customer_Name': name, 'Service_Date': day, 'Service_Type': service,
+            'Notes': f"{service} note"}
+
+
+def revenue(customer_id, amount, method='Cash'):
+    return {'Customer_id': customer_id, 'Amount': amount, 'Payment_Method': method}
+
+
+def test_each_revenue_row_counts_once():
+    index = cardetail.LedgerIndex()
+    index.add_operation(operation('CW1', 'Thabo', date(2026, 1, 2)))
+    index.add_operation(operation('CW1', 'Thabo', date(2026, 1, 9), 'Basic Wash'))
+    index.add_revenue(revenue('CW1', 180))
+    index.add_revenue(revenue('CW1', 120, 'Card'))
+    journey = index.customer_journey['CW1']
+    assert journey['services_completed'] == 2
+    assert journey['total_spent'] == 300
+    assert journey['service_types'] == ['Full Wash', 'Basic Wash']
+    assert journey['payment_methods'] == ['Cash', 'Card']
+    assert journey['last_service_date'] == date(2026, 1, 9)
+
+
+def test_revenue_before_the_first_operation_is_kept():
+    index = cardetail.LedgerIndex()
+    index.add_revenue(revenue('CW2', 150))
+    assert 'CW2' not in index.customer_journey
+    index.add_operation(operation('CW2', 'Lerato', date(2026, 2, 1)))
+    assert index.customer_journey['CW2']['total_spent'] == 150
+
+
+def test_archived_history_merges_into_the_journey():
+    index = cardetail.LedgerIndex()
+    index.add_customer_summary({'Customer_ID': 'CW3', 'Customer_Name': 'Sipho', 'Services': 4,
+                                'Service_Types': ['Full Wash'], 'Total_Spent': 720,
+                                'Last_Service_Date': date(2025, 12, 20)})
+    index.add_operation(operation('CW3', 'Sipho', date(2026, 1, 5)))
+    index.add_revenue(revenue('CW3', 180))
+    journey = index.customer_journey['CW3']
+    assert journey['services_completed'] == 5
+    assert journey['total_spent'] == 900
+    assert journey['last_service_date'] == date(2026, 1, 5)
+    assert index.customers.lookup('sipho')[0] == 'CW3'
@@ -0,0 +1,36 @@
+"""Request-scoped data context: one load and one upload per request."""
+EXPENSE = {'category': 'Supplies', 'description': 'wax', 'amount': 250, 'supplier': 'CleanCo'}
+SERVICE = {'customer_name': 'Thandi', 'service_type': 'Full Wash', 'amount': 180,
+           'payment_status': 'Paid', 'payment_method': 'Cash'}
+
+
+def test_context_loads_once(make_assistant):
+    assistant = make_assistant()
+    data_context = assistant.open_data_context()
+    assert data_context.load() is data_context.load()
+    assistant.generate_enhanced_report(data_context)
+    assistant.analyze_cash_flow(data_context)
+    assert assistant.fakes[0].calls['get'] == 1
+    assert assistant.fakes[0].calls['get_media'] == 1
+
+
+def test_writes_in_one_context_upload_once(make_assistant):
+    assistant = make_assistant()
+    data_context = assistant.open_data_context()
+    data_context.load()
+    assistant.append_service_rows(SERVICE, data_context, 'CW900', data_context.allocate_id('REV'),
+                                  assistant.get_sa_datetime())
+    assistant.append_expense_row(EXPENSE, data_context, data_context.allocate_id('EXP'), assistant.get_sa_datetime())
+    assert data_context.commit()
+    assert assistant.fakes[0].calls['update'] == 1
+    assert data_context.appended_rows == []
+
+
+def test_discard_drops_uncommitted_rows(make_assistant):
+    assistant = make_assistant()
+    data_context = assistant.open_data_context()
+    before = data_context.load()['total_expenses']
+    assistant.append_expense_row(EXPENSE, data_context, data_context.allocate_id('EXP'), assistant.get_sa_datetime())
+    assistant.discard_writes(data_context)
+    assert assistant.load_business_data()['total_expenses'] == before
+    assert assistant.fakes[0].calls['update'] == 0
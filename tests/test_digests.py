@@ -0,0 +1,46 @@
+"""Scheduled digests: which slots are due, building them, and the admin-only /digests endpoint."""
+from datetime import datetime
+
+import cardetail
+
+SCHEDULE = {'refresh': [(6, 0)], 'daily': [(7, 0)], 'weekly': [(7, 30)]}
+
+
+def scheduler(assistant):
+    return cardetail.DigestScheduler(cardetail.TenantRegistry(assistant), assistant.get_sa_datetime)
+
+
+def test_daily_and_refresh_slots_fire_once_crossed(make_assistant):
+    digests = scheduler(make_assistant())
+    assert digests.due(SCHEDULE, datetime(2026, 3, 10, 5, 0), datetime(2026, 3, 10, 6, 30)) == ['refresh']
+    assert digests.due(SCHEDULE, datetime(2026, 3, 10, 6, 30), datetime(2026, 3, 10, 7, 0)) == ['daily']
+    assert digests.due(SCHEDULE, datetime(2026, 3, 10, 7, 45), datetime(2026, 3, 10, 8, 0)) == []
+
+
+def test_weekly_slot_fires_only_when_a_week_of_the_month_starts(make_assistant):
+    digests = scheduler(make_assistant())
+    assert 'weekly' in digests.due(SCHEDULE, datetime(2026, 3, 8, 7, 15), datetime(2026, 3, 8, 7, 45))
+    assert 'weekly' not in digests.due(SCHEDULE, datetime(2026, 3, 9, 7, 15), datetime(2026, 3, 9, 7, 45))
+
+
+def test_bad_slot_time_is_rejected(make_assistant):
+    assistant = make_assistant()
+    assert assistant.parse_slot_times('18:30, 07:05,18:30') == [(7, 5), (18, 30)]
+    try:
+        assistant.parse_slot_times('25:00')
+    except ValueError:
+        return
+    raise AssertionError('25:00 accepted')
+
+
+def test_digests_endpoint_needs_the_admin_token(monkeypatch, make_assistant):
+    assistant = make_assistant(DIGEST_DAILY_TIME='07:00')
+    assert assistant.build_digests()
+    monkeypatch.setattr(cardetail, 'tenants', cardetail.TenantRegistry(assistant))
+    monkeypatch.setattr(cardetail, 'ADMIN_TOKEN', 'secret')
+    client = cardetail.app.test_client()
+    assert client.get('/digests?tenant=test').status_code == 403
+    response = client.get('/digests?tenant=test', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.get_json()['digests']['report']['text']
+    assert response.get_json()['schedule']['daily'] == ['07:00']
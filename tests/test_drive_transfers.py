@@ -0,0 +1,30 @@
+"""Drive downloads and uploads through in-memory buffers, against the fake Drive transport."""
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import workbook_bytes
+
+
+def test_chunked_download_returns_the_whole_file(make_assistant, content):
+    assistant = make_assistant(DRIVE_DOWNLOAD_CHUNK_BYTES=str(4096))
+    assert assistant.download_workbook_content() == content
+    assert assistant.fakes[0].calls['get_media'] > 1
+
+
+def test_downloads_dont_share_a_buffer(make_assistant, content):
+    assistant = make_assistant(DRIVE_DOWNLOAD_CHUNK_BYTES=str(4096))
+    first = assistant.download_workbook_content()
+    assistant.fakes[0].replace_content(workbook_bytes(80))
+    second = assistant.download_workbook_content()
+    assert first == content
+    assert second == assistant.fakes[0].content
+    with ThreadPoolExecutor(4) as pool:
+        downloads = list(pool.map(lambda _: assistant.download_workbook_content(), range(8)))
+    assert all(download == second for download in downloads)
+
+
+def test_large_upload_is_resumable_in_chunks(make_assistant, content):
+    assistant = make_assistant(DRIVE_RESUMABLE_THRESHOLD_BYTES='1', DRIVE_UPLOAD_CHUNK_BYTES=str(256 * 1024))
+    large = workbook_bytes(4000)
+    assert assistant.upload_workbook_content(large)
+    assert assistant.fakes[0].content == large
+    assert assistant.fakes[0].calls['upload_chunk'] > 1
@@ -0,0 +1,52 @@
+"""Single-pass extraction of services, expenses and periods from WhatsApp messages."""
+import cardetail
+
+PRICES = {'Basic Wash': 120, 'Full Wash': 180, 'Premium Wash': 280, 'Interior Only': 150}
+
+
+def extractor():
+    return cardetail.MessageExtractor(PRICES)
+
+
+def test_service_fields():
+    service = extractor().extract_service('Served client Thabo a full wash R180, paid by card')
+    assert service['service_type'] == 'Full Wash'
+    assert service['amount'] == 180
+    assert service['payment_method'] == 'Card'
+    assert service['payment_status'] == 'Paid'
+    assert 'Thabo' in service['customer_name']
+
+
+def test_missing_amount_falls_back_to_the_price_list():
+    service = extractor().extract_service('customer Sipho premium wash, he owes')
+    assert service['amount'] == 280
+    assert service['payment_status'] == 'Unpaid'
+
+
+def test_expense_fields():
+    expense = extractor().extract_expense('Bought diesel R1,250.50 from Engen')
+    assert expense == {'amount': 1250.5, 'supplier': 'Engen', 'category': 'Fuel',
+                       'description': 'Bought diesel R1,250.50 from Engen'}
+
+
+def test_longest_keyword_and_first_group_win():
+    found = extractor().scan('quick wash with a bank transfer')
+    assert found['service_type'] == 'Basic Wash'
+    assert found['payment_method'] == 'EFT'
+
+
+def test_periods():
+    periods, spans = extractor().extract_periods('compare week 1 of march 2025 and last month')
+    assert periods == [('month', 'March', 2025, 1), ('relative', 'last', 'month')]
+    assert len(spans) == 2
+    assert extractor().extract_periods('I may need the numbers')[0] == []
+    assert extractor().extract_periods('revenue in may')[0] == [('month', 'May', None, None)]
+
+
+def test_period_digits_are_not_amounts():
+    assert extractor().parse('how much revenue in March 2025')['route'] == 'period'
+
+
+def test_batch_matches_one_by_one():
+    messages = ['Paid R250 to CleanCo for wax', 'hello', 'business report']
+    assert extractor().parse_batch(messages) == [extractor().parse(message) for message in messages]
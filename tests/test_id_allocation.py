@@ -0,0 +1,60 @@
+"""ID allocation and the compare-and-swap upload that keeps concurrent writers from losing rows."""
+import io
+import threading
+
+import openpyxl
+
+import cardetail
+
+EXPENSE = {'category': 'Supplies', 'description': 'wax', 'amount': 250, 'supplier': 'CleanCo'}
+OTHER_EXPENSE = dict(EXPENSE, description='towels', amount=90)
+
+
+def expense_rows(content):
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+    return {row[0]: row[4] for row in workbook['Expenses'].iter_rows(min_row=2, values_only=True) if row[0]}
+
+
+def test_ids_are_unique_across_threads():
+    allocator = cardetail.IdAllocator()
+    allocator.observe('EXP041')
+    ids = []
+
+    def allocate():
+        for _ in range(200):
+            ids.append(allocator.allocate('EXP'))
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 800
+    assert min(ids, key=allocator.number_of) == 'EXP042'
+    assert allocator.allocate_block('EXP', 3) == ['EXP842', 'EXP843', 'EXP844']
+
+
+def test_concurrent_writer_is_merged_not_overwritten(make_assistant):
+    first = make_assistant()
+    second = make_assistant()
+    second.drive_service = first.drive_service
+
+    data_context = first.open_data_context()
+    data_context.load()
+    minted = data_context.allocate_id('EXP')
+    first.append_expense_row(EXPENSE, data_context, minted, first.get_sa_datetime())
+    other = second.save_expense(OTHER_EXPENSE)
+    assert other == minted
+
+    assert data_context.commit()
+    rows = expense_rows(first.fakes[0].content)
+    saved = data_context.final_id(minted)
+    assert saved != other
+    assert rows[other] == 'towels' and rows[saved] == 'wax'
+
+
+def test_unknown_revision_never_uploads(make_assistant, monkeypatch):
+    assistant = make_assistant()
+    assistant.load_business_data()
+    monkeypatch.setattr(assistant, 'get_drive_revision', lambda: None)
+    assert assistant.save_expense(EXPENSE) is None
+    assert assistant.fakes[0].calls['update'] == 0
@@ -0,0 +1,36 @@
+"""Deterministic intent routing: messages the assistant can answer itself never reach Claude."""
+import pytest
+
+SENDER = 'whatsapp:+27000000000'
+
+
+@pytest.mark.parametrize('message, route', [
+    ('Served customer Thabo full wash R180 cash', 'service'),
+    ('Paid R250 to CleanCo for wax', 'expense'),
+    ('business report please', 'report'),
+    ('show me the cash flow', 'cash_flow'),
+    ('what is profit', 'explain'),
+    ('how much revenue in March week 2', 'period'),
+    ('hello there', 'conversation'),
+])
+def test_routes(make_assistant, message, route):
+    assert make_assistant().extractor.parse(message)['route'] == route
+
+
+def test_routed_messages_skip_claude(make_assistant):
+    assistant = make_assistant()
+    assert assistant.process_natural_message('Served customer Thabo full wash R180 cash', SENDER).startswith(
+        'Service logged')
+    assert assistant.process_natural_message('Paid R250 to CleanCo for wax', SENDER).startswith('Expense logged')
+    assistant.process_natural_message('business report please', SENDER)
+    assistant.process_natural_message('what is profit', SENDER)
+    assert assistant.anthropic_client.calls == 0
+    stats = assistant.route_stats()
+    assert stats['llm_calls'] == 0 and stats['llm_calls_saved'] == 4
+
+
+def test_conversation_goes_to_claude(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=0)
+    assistant.process_natural_message('hello there', SENDER)
+    assert assistant.anthropic_client.calls == 1
+    assert assistant.route_stats()['routes'] == {'conversation': 1}
@@ -0,0 +1,56 @@
+"""Service clients built on first use, with failed builds remembered and clients shared across tenants."""
+import pytest
+
+import cardetail
+
+
+def test_clients_are_not_built_at_startup():
+    assistant = cardetail.IntelligentBusinessAssistant(tenant={'id': 'lazy', 'GOOGLE_DRIVE_FILE_ID': 'workbook-lazy'})
+    assert not {'anthropic_client', 'twilio_client', 'drive_service'} & set(vars(assistant))
+
+
+def test_client_is_built_once(monkeypatch):
+    assistant = cardetail.IntelligentBusinessAssistant(tenant={'id': 'lazy', 'GOOGLE_DRIVE_FILE_ID': 'workbook-lazy'})
+    built = []
+    monkeypatch.setattr(assistant, 'init_twilio', lambda: built.append(object()) or built[-1])
+    assert assistant.twilio_client is assistant.twilio_client
+    assert len(built) == 1
+
+
+def test_failed_build_is_not_retried_until_the_backoff_passes(monkeypatch):
+    assistant = cardetail.IntelligentBusinessAssistant(tenant={'id': 'lazy', 'GOOGLE_DRIVE_FILE_ID': 'workbook-lazy',
+                                                               'CLIENT_RETRY_SECONDS': '60'})
+    attempts = []
+
+    def init_anthropic():
+        attempts.append(1)
+        raise ConnectionError('no network')
+    monkeypatch.setattr(assistant, 'init_anthropic', init_anthropic)
+    with pytest.raises(ConnectionError):
+        assistant.anthropic_client
+    with pytest.raises(RuntimeError, match='retrying'):
+        assistant.anthropic_client
+    assert len(attempts) == 1
+
+    assistant.client_retry_seconds = 0
+    assistant.client_failures.clear()
+    monkeypatch.setattr(assistant, 'init_anthropic', lambda: 'client')
+    assert assistant.anthropic_client == 'client'
+
+
+def test_assigned_client_replaces_the_lazy_one():
+    assistant = cardetail.IntelligentBusinessAssistant(tenant={'id': 'lazy', 'GOOGLE_DRIVE_FILE_ID': 'workbook-lazy'})
+    assistant.drive_service = 'fake'
+    assert assistant.drive_service == 'fake'
+
+
+def test_tenants_with_the_same_credentials_share_clients():
+    default = cardetail.IntelligentBusinessAssistant(tenant={'id': 'shared', 'GOOGLE_DRIVE_FILE_ID': 'workbook-a'})
+    default.anthropic_client = 'pooled client'
+    same = cardetail.IntelligentBusinessAssistant(tenant={'id': 'same', 'GOOGLE_DRIVE_FILE_ID': 'workbook-b'},
+                                                  client_source=default)
+    other = cardetail.IntelligentBusinessAssistant(tenant={'id': 'other', 'GOOGLE_DRIVE_FILE_ID': 'workbook-c',
+                                                           'ANTHROPIC_API_KEY': 'another key'},
+                                                   client_source=default)
+    assert same.anthropic_client == 'pooled client'
+    assert other.shared_client('anthropic_client', 'anthropic_api_key') is None
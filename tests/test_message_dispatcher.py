@@ -0,0 +1,62 @@
+"""Webhook worker pool: ordered per sender, concurrent across senders, bounded per queue and per group."""
+import threading
+import time
+
+import cardetail
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_one_senders_messages_run_in_order():
+    handled = []
+    dispatcher = cardetail.MessageDispatcher(lambda sender, message: handled.append(message), workers=4, max_queue=50)
+    for number in range(20):
+        assert dispatcher.submit('whatsapp:+27000000001', number)
+    wait_for(lambda: dispatcher.stats()['processed'] == 20)
+    assert handled == list(range(20))
+
+
+def test_senders_are_handled_concurrently():
+    release = threading.Event()
+    started = []
+
+    def handler(sender, message):
+        started.append(sender)
+        release.wait(5)
+    dispatcher = cardetail.MessageDispatcher(handler, workers=2, max_queue=10)
+    dispatcher.submit('a', 1)
+    dispatcher.submit('b', 1)
+    wait_for(lambda: len(started) == 2)
+    release.set()
+    wait_for(lambda: dispatcher.stats()['processed'] == 2)
+
+
+def test_full_queue_and_full_group_reject():
+    release = threading.Event()
+    dispatcher = cardetail.MessageDispatcher(lambda sender, message: release.wait(5), workers=1, max_queue=3,
+                                             max_group_queue=2)
+    assert dispatcher.submit('a', 1, group='shop1')
+    assert dispatcher.submit('b', 1, group='shop1')
+    assert not dispatcher.submit('c', 1, group='shop1')
+    assert dispatcher.submit('d', 1, group='shop2')
+    assert not dispatcher.submit('e', 1, group='shop3')
+    assert dispatcher.stats()['rejected'] == 2
+    release.set()
+    wait_for(lambda: dispatcher.stats()['processed'] == 3)
+
+
+def test_handler_errors_are_counted_and_dont_stop_the_worker():
+    def handler(sender, message):
+        if message == 'bad':
+            raise RuntimeError('boom')
+    dispatcher = cardetail.MessageDispatcher(handler, workers=1, max_queue=10)
+    dispatcher.submit('a', 'bad')
+    dispatcher.submit('a', 'good')
+    wait_for(lambda: dispatcher.stats()['processed'] == 2)
+    assert dispatcher.stats()['failed'] == 1
+    assert dispatcher.stats()['active_senders'] == 0
@@ -0,0 +1,46 @@
+"""Stage latency histograms, counters and the Prometheus /metrics endpoint."""
+import pytest
+
+import cardetail
+
+SENDER = 'whatsapp:+27000000000'
+
+
+def test_span_records_a_histogram_and_errors():
+    metrics = cardetail.Metrics()
+    with metrics.span('parse'):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span('parse'):
+            raise ValueError('bad row')
+    text = metrics.render()
+    assert 'cardetail_stage_duration_seconds_count{stage="parse"} 2' in text
+    assert 'cardetail_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2' in text
+    assert 'cardetail_errors_total{stage="parse"} 1' in text
+
+
+def test_render_is_cumulative_with_help_and_type():
+    metrics = cardetail.Metrics(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5):
+        metrics.observe('stage_duration_seconds', seconds, stage='claude')
+    metrics.increment('routes_total', route='report')
+    lines = metrics.render({'queue_depth': ('Messages waiting', 3)}).splitlines()
+    assert '# TYPE cardetail_stage_duration_seconds histogram' in lines
+    assert [line.rsplit(' ', 1)[1] for line in lines if '_bucket' in line] == ['1', '2', '3']
+    assert 'cardetail_routes_total{route="report"} 1' in lines
+    assert lines[-3:] == ['# HELP cardetail_queue_depth Messages waiting', '# TYPE cardetail_queue_depth gauge',
+                          'cardetail_queue_depth 3']
+
+
+def test_messages_show_up_on_the_endpoint(make_assistant):
+    assistant = make_assistant()
+    # The endpoint renders the registry every tenant shares
+    assistant.metrics = cardetail.assistant.metrics
+    assistant.process_natural_message('business report please', SENDER)
+    response = cardetail.app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'cardetail_routes_total{route="report"}' in body
+    assert 'stage="load_business_data"' in body
+    assert 'cardetail_webhook_queue_depth' in body
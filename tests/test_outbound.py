@@ -0,0 +1,55 @@
+"""Outbound replies: splitting, retries, and the admin-only status endpoints."""
+import pytest
+
+import cardetail
+
+
+class SendError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def sender(send, max_attempts=3):
+    return cardetail.OutboundSender(send, workers=0, max_queue=10, rate=1000, burst=1000,
+                                    max_attempts=max_attempts, backoff=0, max_backoff=0)
+
+
+def test_long_reply_is_split_in_order():
+    body = '\n\n'.join(f"Paragraph {number} " + 'x' * 300 for number in range(12))
+    segments = cardetail.OutboundSender.split(body)
+    assert len(segments) > 1
+    assert all(len(segment) <= cardetail.OutboundSender.MAX_BODY for segment in segments)
+    assert segments[0].endswith(f"(1/{len(segments)})")
+    assert 'Paragraph 11' in segments[-1]
+
+
+def test_transient_errors_are_retried():
+    failures = [SendError(503), SendError(429)]
+
+    def send(to_number, body):
+        if failures:
+            raise failures.pop(0)
+        return 'SM1'
+    outbound = sender(send)
+    delivery = outbound.delivery(outbound.submit('whatsapp:+27000000000', 'hi'))
+    assert delivery['status'] == 'sent'
+    assert delivery['attempts'] == 3
+
+
+def test_client_errors_are_not_retried():
+    def send(to_number, body):
+        raise SendError(400)
+    outbound = sender(send)
+    delivery = outbound.delivery(outbound.submit('whatsapp:+27000000000', 'hi'))
+    assert delivery['status'] == 'failed'
+    assert delivery['attempts'] == 1
+
+
+@pytest.mark.parametrize('path', ['/outbound', '/outbound/1'])
+def test_status_endpoints_need_the_admin_token(monkeypatch, path):
+    monkeypatch.setattr(cardetail, 'ADMIN_TOKEN', 'secret')
+    client = cardetail.app.test_client()
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get(path, headers={'X-Admin-Token': 'secret'}).status_code in (200, 404)
@@ -0,0 +1,42 @@
+"""Per-week and per-month rollups, checked against sums over the sheet rows."""
+import io
+
+import openpyxl
+
+SERVICE = {'customer_name': 'Thandi', 'service_type': 'Full Wash', 'amount': 180,
+           'payment_status': 'Paid', 'payment_method': 'Cash'}
+
+
+def test_rollups_match_the_sheet_rows(make_assistant, content):
+    data = make_assistant().load_business_data()
+    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+    expected = {}
+    for row in workbook['Revenue'].iter_rows(min_row=2, values_only=True):
+        if not row[0]:
+            continue
+        for week in (row[9] or 1, None):
+            totals = expected.setdefault((row[2].year, row[3], week), {'revenue': 0, 'services': 0})
+            totals['revenue'] += row[5] or 0
+            totals['services'] += 1
+    assert expected
+    for (year, month, week), totals in expected.items():
+        bucket = data['rollups'].period(year, month, week)
+        assert (bucket['revenue'], bucket['services']) == (totals['revenue'], totals['services'])
+
+
+def test_unknown_period_is_empty(make_assistant):
+    bucket = make_assistant().load_business_data()['rollups'].period(1999, 'January')
+    assert bucket['revenue'] == 0 and bucket['by_service'] == {}
+
+
+def test_logged_service_lands_in_this_week_and_month(make_assistant):
+    assistant = make_assistant()
+    now = assistant.get_sa_datetime()
+    key = (now.year, now.strftime('%B'), assistant.calculate_week_of_month(now.date()))
+    before = {week: dict(assistant.load_business_data()['rollups'].period(key[0], key[1], week))
+              for week in (key[2], None)}
+    assert assistant.save_complete_service(SERVICE)['success']
+    rollups = assistant.load_business_data()['rollups']
+    for week in (key[2], None):
+        assert rollups.period(key[0], key[1], week)['revenue'] == before[week]['revenue'] + 180
+        assert rollups.period(key[0], key[1], week)['services'] == before[week]['services'] + 1
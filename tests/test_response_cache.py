@@ -0,0 +1,69 @@
+"""Claude response cache and the cacheable system prompt, counted at the stub Anthropic client."""
+import time
+
+from benchmarks.synthetic import workbook_bytes
+
+import cardetail
+
+SENDER = 'whatsapp:+27000000000'
+
+
+def test_repeat_question_is_a_hit(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=10)
+    assistant.process_natural_message('hello', SENDER)
+    assistant.process_natural_message('Hello!', SENDER)
+    assert assistant.anthropic_client.calls == 1
+    assert assistant.response_cache.stats()['hits'] == 1
+
+
+def test_static_prompt_is_the_cacheable_block(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=10)
+    assistant.process_natural_message('hello', SENDER)
+    system = assistant.anthropic_client.last_request['system']
+    assert system[0]['text'] == assistant.system_prompt
+    assert system[0].get('cache_control') == {'type': 'ephemeral'}
+    assert 'cache_control' not in system[1]
+    assert "Today's date" in system[1]['text']
+
+
+def test_local_write_misses(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=10)
+    assistant.process_natural_message('hello', SENDER)
+    assistant.data_changed()
+    assistant.process_natural_message('hello', SENDER)
+    assert assistant.anthropic_client.calls == 2
+
+
+def test_drive_edit_changing_the_metrics_misses(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=10)
+    assistant.process_natural_message('hello', SENDER)
+    assistant.fakes[0].replace_content(workbook_bytes(80))
+    assistant.process_natural_message('hello', SENDER)
+    assert assistant.anthropic_client.calls == 2
+
+
+def test_expired_reply_misses(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=10, LLM_CACHE_TTL_SECONDS=0.05)
+    assistant.process_natural_message('hello', SENDER)
+    time.sleep(0.1)
+    assistant.process_natural_message('hello', SENDER)
+    assert assistant.anthropic_client.calls == 2
+    assert assistant.response_cache.stats()['expired'] == 1
+
+
+def test_least_recently_used_reply_is_evicted(make_assistant):
+    assistant = make_assistant(LLM_CACHE_SIZE=2)
+    for message in ('hello', 'thanks', 'good morning', 'good morning', 'hello'):
+        assistant.process_natural_message(message, SENDER)
+    assert assistant.anthropic_client.calls == 4
+    assert assistant.response_cache.stats()['evictions'] == 2
+
+
+def test_disabled_cache_stores_nothing():
+    cache = cardetail.ResponseCache(0, 60)
+    cache.put('key', 'reply')
+    assert cache.get('key') is None
+
+
+def test_normalize_ignores_case_punctuation_and_spacing():
+    assert cardetail.ResponseCache.normalize('  What is  PROFIT?! ') == 'what is profit'
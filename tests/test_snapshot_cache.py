@@ -0,0 +1,29 @@
+"""Workbook snapshot cache: re-download only when the Drive revision moves."""
+from benchmarks.synthetic import workbook_bytes
+
+EXPENSE = {'category': 'Supplies', 'description': 'wax', 'amount': 250, 'supplier': 'CleanCo'}
+
+
+def test_unchanged_revision_reuses_the_snapshot(make_assistant):
+    assistant = make_assistant()
+    first = assistant.load_business_data()
+    second = assistant.load_business_data()
+    assert first is second
+    assert assistant.fakes[0].calls['get_media'] == 1
+
+
+def test_drive_edit_is_picked_up(make_assistant):
+    assistant = make_assistant()
+    before = assistant.load_business_data()['operations_count']
+    assistant.fakes[0].replace_content(workbook_bytes(80))
+    after = assistant.load_business_data()['operations_count']
+    assert after > before
+    assert assistant.fakes[0].calls['get_media'] == 2
+
+
+def test_own_write_updates_the_snapshot_without_a_download(make_assistant):
+    assistant = make_assistant()
+    before = assistant.load_business_data()['total_expenses']
+    assert assistant.save_expense(EXPENSE)
+    assert assistant.load_business_data()['total_expenses'] == before + 250
+    assert assistant.fakes[0].calls['get_media'] == 1
@@ -0,0 +1,41 @@
+"""SQLite ledger backend: imported once from the workbook, written locally, exported to Drive."""
+import io
+
+import openpyxl
+
+EXPENSE = {'category': 'Supplies', 'description': 'wax', 'amount': 250, 'supplier': 'CleanCo'}
+SERVICE = {'customer_name': 'Thandi', 'service_type': 'Full Wash', 'amount': 180,
+           'payment_status': 'Paid', 'payment_method': 'Cash'}
+
+
+def ledger_assistant(make_assistant, tmp_path):
+    return make_assistant(STORAGE_BACKEND='sqlite', SQLITE_PATH=str(tmp_path / 'ledger.db'))
+
+
+def test_imported_totals_match_the_workbook(make_assistant, tmp_path):
+    drive = make_assistant().load_business_data()
+    ledger = ledger_assistant(make_assistant, tmp_path).load_business_data()
+    for key in ('total_revenue', 'total_expenses', 'paid_revenue', 'operations_count', 'total_customers'):
+        assert ledger[key] == drive[key], key
+
+
+def test_writes_stay_local_until_exported(make_assistant, tmp_path):
+    assistant = ledger_assistant(make_assistant, tmp_path)
+    before = assistant.load_business_data()
+    assert assistant.save_expense(EXPENSE)
+    assert assistant.save_complete_service(SERVICE)['success']
+    after = assistant.load_business_data()
+    assert after['total_expenses'] == before['total_expenses'] + 250
+    assert after['total_revenue'] == before['total_revenue'] + 180
+    assert assistant.fakes[0].calls['update'] == 0
+
+    assert assistant.export_ledger_to_drive()
+    exported = openpyxl.load_workbook(io.BytesIO(assistant.fakes[0].content), read_only=True)
+    assert any(row[0] and row[4] == 'wax' for row in exported['Expenses'].iter_rows(min_row=2, values_only=True))
+
+
+def test_import_happens_once(make_assistant, tmp_path):
+    assistant = ledger_assistant(make_assistant, tmp_path)
+    assistant.load_business_data()
+    assistant.load_business_data()
+    assert assistant.fakes[0].calls['get_media'] == 1
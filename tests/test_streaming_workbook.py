@@ -0,0 +1,52 @@
+"""Streamed parsing into the totals, and saving by splicing rows into the sheet XML."""
+import io
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+
+import cardetail
+
+OPERATION = ('CW9001', 'Ann <b> & "co"', date(2026, 1, 2), 1, 'January', 'Yes', 'Full Wash', 'note', 'Completed')
+REVENUE = ('REV9001', 'CW9001', datetime(2026, 1, 2, 3, 4), 'January', 'Full Wash', 180.5, 'Paid', 'Cash', 'ok', 1)
+
+
+def test_streamed_parse_matches_full_parse(make_assistant, content):
+    assistant = make_assistant()
+    streamed = assistant.parse_business_workbook(cardetail.StreamingWorkbook(content))
+    full = assistant.parse_business_workbook(openpyxl.load_workbook(io.BytesIO(content)))
+    for key in ('total_revenue', 'total_expenses', 'operations_count', 'total_customers', 'row_counts'):
+        assert streamed[key] == full[key]
+    assert streamed['transaction_ids'] == full['transaction_ids']
+
+
+def test_parse_keeps_no_row_lists(make_assistant, content):
+    data = make_assistant().parse_business_workbook(cardetail.StreamingWorkbook(content))
+    assert not {'operations', 'revenue', 'expenses'} & set(data)
+    assert sum(data['row_counts'].values()) > 0
+
+
+@pytest.mark.parametrize('chunk_size', [1024, cardetail.StreamingWorkbook.CHUNK_SIZE])
+def test_splice_appends_rows_and_dimension(content, chunk_size):
+    workbook = cardetail.StreamingWorkbook(content)
+    workbook.CHUNK_SIZE = chunk_size
+    list(workbook.read_rows())
+    operation_row = workbook.append('Operations', OPERATION)
+    revenue_row = workbook.append('Revenue', REVENUE)
+    saved = openpyxl.load_workbook(io.BytesIO(workbook.append_sheet_xml()))
+    operations, revenue = saved['Operations'], saved['Revenue']
+    assert operations.max_row == operation_row
+    assert operations.calculate_dimension().endswith(str(operation_row))
+    assert [cell.value for cell in operations[operation_row][:2]] == list(OPERATION[:2])
+    assert revenue[revenue_row][0].value == 'REV9001'
+    assert revenue[revenue_row][5].value == 180.5
+
+
+def test_unchanged_sheets_are_copied_as_is(content):
+    workbook = cardetail.StreamingWorkbook(content)
+    list(workbook.read_rows())
+    workbook.append('Revenue', REVENUE)
+    saved = openpyxl.load_workbook(io.BytesIO(workbook.to_bytes()))
+    original = openpyxl.load_workbook(io.BytesIO(content))
+    for sheet_name in ('Operations', 'Expenses'):
+        assert list(saved[sheet_name].values) == list(original[sheet_name].values)
@@ -0,0 +1,58 @@
+"""Tenant registry: config validation, routing, and building tenants only where it is allowed."""
+import json
+
+import pytest
+
+import cardetail
+
+
+@pytest.fixture
+def registry(tmp_path):
+    def make(configs):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps(configs))
+        return cardetail.TenantRegistry(cardetail.assistant, str(path))
+    return make
+
+
+def shop(tenant_id, **settings):
+    return {'id': tenant_id, 'GOOGLE_DRIVE_FILE_ID': f"workbook-{tenant_id}", **settings}
+
+
+def test_tenant_without_a_workbook_is_rejected(registry):
+    with pytest.raises(ValueError, match='GOOGLE_DRIVE_FILE_ID'):
+        registry([{'id': 'shop1', 'TWILIO_WHATSAPP_NUMBER': 'whatsapp:+27110000001'}])
+
+
+def test_duplicate_and_malformed_ids_are_rejected(registry):
+    with pytest.raises(ValueError):
+        registry([shop('shop1'), shop('shop1')])
+    with pytest.raises(ValueError):
+        registry([shop('../shop')])
+
+
+def test_messages_route_by_sender_then_number(registry):
+    tenants = registry([shop('shop1', TWILIO_WHATSAPP_NUMBER='whatsapp:+27110000001'),
+                        shop('shop2', TWILIO_WHATSAPP_NUMBER='whatsapp:+27110000002',
+                             sender_numbers=['whatsapp:+27820000000'])])
+    assert tenants.resolve('whatsapp:+27830000000', 'whatsapp:+27110000001') == 'shop1'
+    assert tenants.resolve('whatsapp:+27820000000', 'whatsapp:+27110000001') == 'shop2'
+    assert tenants.resolve('whatsapp:+27830000000', 'whatsapp:+27119999999') == cardetail.DEFAULT_TENANT_ID
+
+
+def test_find_never_builds(registry):
+    tenants = registry([shop('shop1')])
+    assert tenants.find('shop1') is None
+    built = tenants.get('shop1')
+    assert built.google_drive_file_id == 'workbook-shop1'
+    assert tenants.find('shop1') is built
+
+
+def test_open_endpoints_dont_build_tenants(monkeypatch, registry):
+    tenants = registry([shop('shop1')])
+    monkeypatch.setattr(cardetail, 'tenants', tenants)
+    client = cardetail.app.test_client()
+    assert client.get('/routes?tenant=shop1').status_code == 404
+    assert client.get('/conversations?tenant=shop1').status_code == 404
+    assert tenants.stats()['active'] == 1
+    assert client.get('/routes').status_code == 200
@@ -0,0 +1,51 @@
+"""Write-behind journal: durable local log of rows not yet on Drive, flushed in one upload."""
+from datetime import date, datetime
+
+import cardetail
+
+EXPENSE = {'category': 'Supplies', 'description': 'wax', 'amount': 250, 'supplier': 'CleanCo'}
+ROWS = [('Expenses', ('EXP900', date(2026, 1, 2), 'January', 'Supplies', 'wax', -250.0, 'CleanCo', 'Recorded', '')),
+        ('Revenue', ('REV900', 'CW1', datetime(2026, 1, 2, 9, 30), 'January', 'Full Wash', 180.0, 'Paid', 'Cash',
+                     'Washed', 1))]
+
+
+def test_journal_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    cardetail.WriteJournal(path).append(ROWS)
+    recovered = cardetail.WriteJournal(path)
+    assert [entry['rows'] for entry in recovered.pending] == [ROWS]
+    assert recovered.pending[0]['keys'] == ['EXP900', 'REV900']
+
+
+def test_torn_line_is_skipped_and_flushed_entries_dropped(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = cardetail.WriteJournal(path)
+    first = journal.append(ROWS[:1])
+    journal.append(ROWS[1:])
+    with open(path, 'a', encoding='utf-8') as journal_file:
+        journal_file.write('{"seq": 3, "rows": [')
+    journal.mark_flushed(first['seq'])
+    assert [entry['keys'] for entry in cardetail.WriteJournal(path).pending] == [['REV900']]
+
+
+def test_writes_upload_once_on_flush(make_assistant, tmp_path):
+    assistant = make_assistant(WRITE_BEHIND='true', WRITE_BEHIND_DEBOUNCE_SECONDS='3600',
+                               WRITE_JOURNAL_PATH=str(tmp_path / 'journal.jsonl'))
+    before = assistant.load_business_data()['total_expenses']
+    assert assistant.save_expense(EXPENSE)
+    assert assistant.save_expense(EXPENSE)
+    assert assistant.fakes[0].calls['update'] == 0
+    assert assistant.load_business_data()['total_expenses'] == before + 500
+    assert assistant.flush_pending_writes()
+    assert assistant.fakes[0].calls['update'] == 1
+    assert assistant.journal.pending_entries() == []
+
+
+def test_unflushed_rows_are_merged_after_a_restart(make_assistant, tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    before = make_assistant().load_business_data()['total_expenses']
+    cardetail.WriteJournal(path).append(ROWS[:1])
+    restarted = make_assistant(WRITE_BEHIND='true', WRITE_BEHIND_DEBOUNCE_SECONDS='3600', WRITE_JOURNAL_PATH=path)
+    assert restarted.load_business_data()['total_expenses'] == before + 250
+    assert restarted.flush_pending_writes()
+    assert restarted.journal.pending_entries() == []